@@ -0,0 +1,178 @@
+"""
+Benchmarks offline das funções de cálculo e rateio.
+
+Mede tempo (melhor de N repetições) e pico de memória (tracemalloc) de
+`calcular_materiais`, `calcular_custo_craft`, `calcular_custo_de_materiais`,
+`calcular_necessidades_intermediarios` e `gerar_blocos_de_rateio_para_lista`
+para vários tamanhos de encomenda, em grafos sintéticos e no data.json real.
+
+Uso (na raiz do repositório):
+    python -m bench.bench_calculator                  # imprime as curvas de escala
+    python -m bench.bench_calculator --salvar         # grava bench/baselines.json
+    python -m bench.bench_calculator --comparar       # falha se regredir além da tolerância
+
+Os baselines dependem da máquina: grave-os no mesmo host em que serão comparados.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from bench.synthetic import gerar_dados, gerar_encomenda
+from cogs.calculator import calcular_custo_craft, calcular_custo_de_materiais, calcular_materiais
+from cogs.price_index import PriceIndex
+from cogs.rateio import calcular_necessidades_intermediarios, gerar_blocos_de_rateio_para_lista
+from cogs.recipe_graph import RecipeGraph
+
+ARQUIVO_BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+TAMANHOS_DE_ENCOMENDA = (1, 4, 16, 64)
+
+CENARIOS = {
+    "pequeno": dict(tamanho_catalogo=50, profundidade=3, fan_out=3, compartilhamento=0.3),
+    "profundo": dict(tamanho_catalogo=200, profundidade=10, fan_out=3, compartilhamento=0.5),
+    "largo": dict(tamanho_catalogo=1000, profundidade=4, fan_out=8, compartilhamento=0.3),
+    "catalogo-grande": dict(tamanho_catalogo=5000, profundidade=6, fan_out=4, compartilhamento=0.6),
+}
+
+
+def _carregar_data_json():
+    caminho = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data.json")
+    with open(caminho, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _medir(funcao, repeticoes):
+    """Melhor tempo (s) entre `repeticoes` execuções e pico de memória (bytes) de uma execução."""
+    funcao()  # aquecimento
+    melhor = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            melhor = min(melhor, time.perf_counter() - inicio)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return melhor, pico
+
+
+def _casos(dados, encomenda):
+    """Funções medidas, já com grafo e índice de preços compilados (como em produção)."""
+    grafo = RecipeGraph(dados["receitas_crafting"])
+    precos = PriceIndex(dados["precos"], dados.get("settings", {}).get("precos-fallback"), craftaveis=grafo.produz)
+    craft_size = dados.get("settings", {}).get("craft-size", 300)
+    brutos = grafo.expandir(encomenda).brutos
+
+    def materiais():
+        acumulador = None
+        for produto in encomenda:
+            acumulador = calcular_materiais(produto["name"], produto["quantity"], grafo, acumulador)
+
+    def custo_craft():
+        memo = {}
+        for produto in encomenda:
+            calcular_custo_craft(produto["name"], produto["quantity"], grafo, precos, memo)
+
+    return {
+        "calcular_materiais": materiais,
+        "calcular_custo_craft": custo_craft,
+        "calcular_custo_de_materiais": lambda: calcular_custo_de_materiais(brutos, precos),
+        "calcular_necessidades_intermediarios": lambda: calcular_necessidades_intermediarios(encomenda, grafo),
+        "gerar_blocos_de_rateio_para_lista": lambda: gerar_blocos_de_rateio_para_lista(encomenda, grafo, craft_size),
+    }
+
+
+def executar(repeticoes=9, cenarios=None):
+    """Retorna `{cenario: {funcao: {tamanho: {"tempo_ms", "pico_kb"}}}}`."""
+    todos = {nome: gerar_dados(**params) for nome, params in CENARIOS.items()}
+    todos["data.json"] = _carregar_data_json()
+    if cenarios:
+        todos = {nome: dados for nome, dados in todos.items() if nome in cenarios}
+
+    resultados = {}
+    for nome, dados in todos.items():
+        resultados[nome] = {}
+        for tamanho in TAMANHOS_DE_ENCOMENDA:
+            encomenda = gerar_encomenda(dados["receitas_crafting"], tamanho, seed=tamanho)
+            for funcao, caso in _casos(dados, encomenda).items():
+                tempo, pico = _medir(caso, repeticoes)
+                resultados[nome].setdefault(funcao, {})[str(tamanho)] = {
+                    "tempo_ms": round(tempo * 1000, 4),
+                    "pico_kb": round(pico / 1024, 1),
+                }
+    return resultados
+
+
+def imprimir(resultados):
+    for cenario, funcoes in resultados.items():
+        print(f"\n== {cenario} ==")
+        cabecalho = "".join(f"{f'{t} prod.':>20}" for t in TAMANHOS_DE_ENCOMENDA)
+        print(f"{'função':<40}{cabecalho}")
+        for funcao, por_tamanho in funcoes.items():
+            celulas = "".join(
+                f"{f'{m['tempo_ms']:.3f}ms/{m['pico_kb']:.0f}KB':>20}" for m in por_tamanho.values()
+            )
+            print(f"{funcao:<40}{celulas}")
+
+
+def comparar(resultados, baselines, tolerancia):
+    """Lista de regressões: tempo acima de `tolerancia` vezes o baseline salvo."""
+    regressoes = []
+    for cenario, funcoes in resultados.items():
+        for funcao, por_tamanho in funcoes.items():
+            for tamanho, medida in por_tamanho.items():
+                base = baselines.get(cenario, {}).get(funcao, {}).get(tamanho)
+                # Medidas muito pequenas são dominadas por ruído
+                if not base or base["tempo_ms"] < 0.05:
+                    continue
+                razao = medida["tempo_ms"] / base["tempo_ms"]
+                if razao > tolerancia:
+                    regressoes.append(f"{cenario} / {funcao} / {tamanho} prod.: {base['tempo_ms']:.3f}ms -> "
+                                      f"{medida['tempo_ms']:.3f}ms ({razao:.2f}x)")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=9)
+    parser.add_argument("--cenario", action="append", help="Roda só os cenários informados (pode repetir).")
+    parser.add_argument("--salvar", action="store_true", help="Grava os resultados como novo baseline.")
+    parser.add_argument("--comparar", action="store_true", help="Compara com o baseline salvo.")
+    parser.add_argument("--tolerancia", type=float, default=2.0, help="Razão máxima aceita sobre o baseline.")
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.repeticoes, args.cenario)
+    imprimir(resultados)
+
+    if args.salvar:
+        with open(ARQUIVO_BASELINES, "w", encoding="utf-8") as file:
+            json.dump(resultados, file, indent=2, ensure_ascii=False)
+        print(f"\n[BENCH] Baseline salvo em {ARQUIVO_BASELINES}")
+
+    if args.comparar:
+        if not os.path.exists(ARQUIVO_BASELINES):
+            print("\n[BENCH] Nenhum baseline salvo. Rode com --salvar primeiro.")
+            return 1
+        with open(ARQUIVO_BASELINES, "r", encoding="utf-8") as file:
+            baselines = json.load(file)
+        regressoes = comparar(resultados, baselines, args.tolerancia)
+        if regressoes:
+            print("\n[BENCH] Regressões encontradas:")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            return 1
+        print("\n[BENCH] Nenhuma regressão em relação ao baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Memória e tempo do cache da guild no modo completo e no modo enxuto do gateway.
+
+Sem conexão real: monta um GUILD_CREATE sintético e o entrega ao estado do
+cliente, como o gateway faria. No modo completo o payload traz membros e
+presenças (o que o Discord envia com os intents privilegiados) e o cliente
+guarda todos no cache; no modo enxuto o payload só tem cargos e canais. O
+chunking de membros que o modo completo ainda faria depois do READY não é
+simulado, então a diferença real é maior que a medida aqui.
+
+Uso (na raiz do repositório):
+    python -m bench.bench_gateway --membros 20000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import discord
+from discord.ext import commands
+
+import metrics
+
+
+def _guild_create(n_membros, com_membros):
+    cargos = [
+        {"id": str(1000 + i), "name": f"cargo {i}", "permissions": "0", "position": i, "color": 0,
+         "hoist": False, "managed": False, "mentionable": False}
+        for i in range(40)
+    ]
+    canais = [
+        {"id": str(5000 + i), "type": 0, "name": f"canal-{i}", "position": i, "permission_overwrites": []}
+        for i in range(60)
+    ]
+    membros, presencas = [], []
+    if com_membros:
+        for i in range(n_membros):
+            usuario = {"id": str(10**17 + i), "username": f"usuario{i}", "discriminator": "0", "avatar": None}
+            membros.append({"user": usuario, "roles": [str(1000 + i % 40)], "joined_at": "2024-01-01T00:00:00+00:00",
+                            "deaf": False, "mute": False, "flags": 0})
+            presencas.append({"user": {"id": usuario["id"]}, "status": "online", "activities": [],
+                              "client_status": {"desktop": "online"}})
+    return {
+        "id": "1145126424248848514", "name": "guild", "icon": None, "owner_id": "1", "large": True,
+        "member_count": n_membros, "roles": cargos, "channels": canais, "members": membros, "presences": presencas,
+        "emojis": [], "stickers": [], "features": [], "threads": [], "stage_instances": [],
+        "guild_scheduled_events": [], "voice_states": [],
+    }
+
+
+def medir(enxuto, n_membros):
+    """(bytes retidos pelo cache da guild, segundos para processar o GUILD_CREATE, membros em cache)."""
+    os.environ["GATEWAY_LEAN"] = "1" if enxuto else "0"
+    from main import opcoes_do_gateway
+
+    bot = commands.Bot(command_prefix=".", **opcoes_do_gateway())
+    estado = bot._connection
+    payload = _guild_create(n_membros, com_membros=not enxuto)
+
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    guild = estado._get_create_guild(payload)
+    decorrido = time.perf_counter() - inicio
+    del payload
+    gc.collect()
+    retido, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retido, decorrido, len(guild.members)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--membros", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    rss_inicial = metrics.memoria_rss()
+    print(f"{'modo':<10}{'membros em cache':>18}{'cache retido':>16}{'GUILD_CREATE':>16}")
+    for enxuto in (False, True):
+        retido, decorrido, membros = medir(enxuto, args.membros)
+        modo = "enxuto" if enxuto else "completo"
+        print(f"{modo:<10}{membros:>18}{retido / 1e6:>13.1f} MB{decorrido * 1000:>13.1f} ms")
+    print(f"\nRSS do processo: {rss_inicial / 1e6:.1f} MB -> {metrics.memoria_rss() / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
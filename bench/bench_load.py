@@ -0,0 +1,266 @@
+"""
+Carga de ponta a ponta do fluxo de encomendas, sem Discord.
+
+Monta o bot de verdade (stores em SQLite, pool de cálculo, fila de saída,
+EncomendaCog) em um diretório temporário e dispara ciclos completos de
+encomenda com objetos falsos (bench/fake_discord.py):
+
+  botão "Nova Encomenda" -> selects de produto (+ "Adicionar Item") ->
+  "Continuar..." -> modal NewOrder -> Confirmar -> publicação no canal.
+
+Cada etapa é uma interação cronometrada. Ao final imprime interações por
+segundo, p50/p99 por etapa, o atraso máximo do event loop e a série de
+amostras do tamanho do `button_data` e da memória alocada (tracemalloc).
+Uma fração dos ciclos pode ser abandonada antes da confirmação, para ver as
+encomendas pendentes acumulando.
+
+Uso (na raiz do repositório):
+    python -m bench.bench_load --encomendas 500 --concorrencia 32
+    python -m bench.bench_load --catalogo 2000 --latencia 0.05 --abandono 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from bench.fake_discord import FakeChannel, FakeGuild, FakeInteraction, FakeMessage, FakeUser
+from bench.synthetic import gerar_dados
+
+DIRETORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _preparar_ambiente(diretorio, args):
+    """Aponta todos os arquivos do bot para `diretorio` e escolhe os dados (data.json ou sintéticos)."""
+    for variavel, arquivo in (
+        ("PENDING_DB", "pending_orders.db"), ("INVENTORY_DB", "inventory.db"), ("OUTBOX_DB", "outbox.db"),
+        ("PUBLISHED_DB", "published_orders.db"), ("STARTUP_STATE", "startup_state.json"),
+        ("HISTORY_DB", "order_history.db"), ("SNAPSHOT_CACHE_DIR", "snapshot_cache"),
+        # Sem guilds.json no diretório temporário: só a guild padrão
+        ("GUILDS_CONFIG", "guilds.json"),
+    ):
+        os.environ[variavel] = os.path.join(diretorio, arquivo)
+    os.environ.pop("API_URL", None)
+    os.environ.setdefault("WORKER_MODE", args.modo)
+    # Sem limite de taxa real: a fila é esvaziada tão rápido quanto o canal falso aceita
+    os.environ.setdefault("OUTBOX_RATE", str(args.taxa_publicacao))
+    os.environ.setdefault("OUTBOX_RATE_WINDOW", "1")
+
+    if args.catalogo:
+        dados = gerar_dados(tamanho_catalogo=args.catalogo, profundidade=5, fan_out=4, compartilhamento=0.4)
+        dados["permission"] = ["1"]
+        caminho = os.path.join(diretorio, "data.json")
+        with open(caminho, "w", encoding="utf-8") as file:
+            json.dump(dados, file, ensure_ascii=False)
+        return caminho
+    return os.path.join(DIRETORIO_RAIZ, "data.json")
+
+
+async def _montar_bot(arquivo_dados, latencia):
+    from cogs import encomendas
+    from main import MyBot
+
+    bot = MyBot(servidor_http=False)
+    bot.dados.arquivo_local = arquivo_dados
+    await bot._async_setup_hook()
+    await bot.dados.iniciar()
+
+    canal_encomenda = FakeChannel(encomendas.ID_CANAL_ENCOMENDA, latencia, encomendas.ID_GUILD)
+    canal_publico = FakeChannel(encomendas.ID_CANAL_PUBLICO, latencia, encomendas.ID_GUILD)
+    guild = FakeGuild(encomendas.ID_GUILD, [canal_encomenda, canal_publico])
+    # O cache do gateway está vazio: os canais falsos entram no lugar dele
+    bot.get_guild = lambda guild_id: guild if guild_id == guild.id else None
+    bot.get_channel = guild.get_channel
+
+    cog = encomendas.EncomendaCog(bot, bot.button_data, bot.particoes, bot.estado)
+    await bot.add_cog(cog)
+    bot._handle_ready()
+    mensagem_botao = await canal_encomenda.send(content="Criar nova encomenda")
+    return bot, cog, canal_publico, mensagem_botao
+
+
+class Carga:
+    def __init__(self, bot, cog, mensagem_botao, args):
+        from ui.dropdown import ProdutoDropdown, ProdutoDropdownView
+
+        self.bot = bot
+        self.cog = cog
+        self.mensagem_botao = mensagem_botao
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.confirmadas = 0
+        self.abandonadas = 0
+        self._ProdutoDropdown = ProdutoDropdown
+        self._ProdutoDropdownView = ProdutoDropdownView
+
+        snapshot = bot.particoes.catalogo(mensagem_botao.guild_id)
+        self.cargos = list(snapshot.permissoes)
+        # Só os produtos que aparecem nos selects (limite de opções do Discord)
+        self.produtos = list(snapshot.grafo.produz)[:25]
+
+    async def _etapa(self, nome, corrotina):
+        inicio = time.perf_counter()
+        try:
+            return await corrotina
+        except Exception as e:
+            self.erros[f"{nome}: {type(e).__name__}"] += 1
+            raise
+        finally:
+            self.latencias[nome].append(time.perf_counter() - inicio)
+
+    async def ciclo(self, n):
+        latencia = self.args.latencia
+        usuario = FakeUser(f"usuario{n}", self.cargos)
+
+        clique = FakeInteraction.componente(usuario, self.mensagem_botao, "botao_encomenda", latencia)
+        await self._etapa("botao_encomenda", self.cog.on_interaction(clique))
+        view = clique.response.view
+        if not isinstance(view, self._ProdutoDropdownView):
+            raise RuntimeError("o botão não abriu a seleção de produtos")
+        mensagem_efemera = FakeMessage(clique.channel_id, latencia, view=view, guild_id=clique.guild_id)
+
+        escolhidos = self.rng.sample(self.produtos, min(self.rng.randint(1, 4), len(self.produtos)))
+        for i, produto in enumerate(escolhidos):
+            if i > 0:
+                adicionar = next(item for item in view.children if isinstance(item, view.AdicionarItem))
+                await self._etapa("adicionar_item", adicionar.callback(FakeInteraction.componente(usuario, mensagem_efemera, latencia=latencia)))
+            select = [item for item in view.children if isinstance(item, self._ProdutoDropdown)][i]
+            select._values = [produto]
+            await self._etapa("select_produto", select.callback(FakeInteraction.componente(usuario, mensagem_efemera, select.custom_id, latencia)))
+
+        continuar = next(item for item in view.children if isinstance(item, view.EnviarEncomenda))
+        interacao_continuar = FakeInteraction.componente(usuario, mensagem_efemera, latencia=latencia)
+        await self._etapa("continuar", continuar.callback(interacao_continuar))
+        modal = interacao_continuar.response.modal
+
+        modal.name._value = f"Comprador {n}"
+        modal.pombo._value = str(n)
+        modal.prazo._value = "amanhã"
+        modal.quantidades._value = "\n".join(f"{produto}: {self.rng.choice((1, 10, 50, 200))}" for produto in escolhidos)
+        envio = FakeInteraction.modal(usuario, clique.channel_id, latencia, clique.guild_id)
+        await self._etapa("novo_pedido", modal.on_submit(envio))
+        # Com defer a prévia sai como follow-up; sem defer, é a resposta original
+        previa = envio.followup.mensagens[-1] if envio.followup.mensagens else envio._original
+        if previa is None or previa.id not in self.bot.button_data:
+            raise RuntimeError("a prévia não foi registrada no button_data")
+
+        if self.rng.random() < self.args.abandono:
+            self.abandonadas += 1
+            return
+        custom_id = "cancelar_encomenda" if self.rng.random() < self.args.cancelamento else "confirmar_encomenda"
+        confirmacao = FakeInteraction.componente(usuario, previa, custom_id, latencia)
+        await self._etapa(custom_id, self.cog.on_interaction(confirmacao))
+        if custom_id == "confirmar_encomenda":
+            self.confirmadas += 1
+
+    async def executar(self):
+        semaforo = asyncio.Semaphore(self.args.concorrencia)
+
+        async def limitado(n):
+            async with semaforo:
+                try:
+                    await self.ciclo(n)
+                except Exception as e:
+                    self.erros[f"ciclo: {e}"] += 1
+
+        await asyncio.gather(*(limitado(n) for n in range(self.args.encomendas)))
+
+
+async def _amostrar(bot, monitor, amostras, intervalo, inicio):
+    while True:
+        await asyncio.sleep(intervalo)
+        atual, _ = tracemalloc.get_traced_memory()
+        amostras.append((time.perf_counter() - inicio, len(bot.button_data), len(bot.outbox), atual, monitor.lag))
+
+
+async def executar(args):
+    import webserver
+
+    with tempfile.TemporaryDirectory(prefix="gepeto-carga-") as diretorio:
+        arquivo_dados = _preparar_ambiente(diretorio, args)
+        bot, cog, canal_publico, mensagem_botao = await _montar_bot(arquivo_dados, args.latencia)
+        carga = Carga(bot, cog, mensagem_botao, args)
+
+        monitor = webserver.MonitorDoLoop(intervalo=0.05)
+        monitor.iniciar()
+        tracemalloc.start()
+        amostras = []
+        inicio = time.perf_counter()
+        amostrador = asyncio.create_task(_amostrar(bot, monitor, amostras, args.amostragem, inicio))
+
+        await carga.executar()
+        duracao_interacoes = time.perf_counter() - inicio
+        # Espera a fila de saída publicar tudo o que foi confirmado
+        while len(bot.outbox) and time.perf_counter() - inicio < duracao_interacoes + args.espera_publicacao:
+            await asyncio.sleep(0.05)
+        duracao_total = time.perf_counter() - inicio
+
+        amostrador.cancel()
+        monitor.parar()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        publicadas = len(canal_publico.mensagens)
+        planos = bot.planos
+        await bot.close()
+
+    total_interacoes = sum(len(v) for v in carga.latencias.values())
+    print(f"Encomendas: {args.encomendas} (concorrência {args.concorrencia}, latência simulada {args.latencia * 1000:.0f} ms, "
+          f"pool {os.environ['WORKER_MODE']})")
+    print(f"Confirmadas: {carga.confirmadas}  abandonadas: {carga.abandonadas}  publicadas: {publicadas}  "
+          f"pendentes no fim: {amostras[-1][1] if amostras else '-'}")
+    print(f"Interações: {total_interacoes} em {duracao_interacoes:.2f}s = {total_interacoes / duracao_interacoes:.1f}/s "
+          f"(publicação concluída em {duracao_total:.2f}s)")
+    print(f"Pico de memória alocada: {pico / 1e6:.1f} MB  atraso máximo do event loop: "
+          f"{max((a[4] for a in amostras), default=0.0) * 1000:.1f} ms")
+    print(f"Cache de planos: {planos.hits} hit(s), {planos.misses} miss(es), {planos.evictions} eviction(s)\n")
+
+    print(f"{'etapa':<22}{'n':>7}{'p50 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+    for nome, valores in sorted(carga.latencias.items()):
+        print(f"{nome:<22}{len(valores):>7}{_percentil(valores, 50) * 1000:>10.1f}"
+              f"{_percentil(valores, 99) * 1000:>10.1f}{max(valores) * 1000:>10.1f}")
+
+    print(f"\n{'t (s)':>7}{'button_data':>13}{'fila':>7}{'memória MB':>12}{'lag ms':>9}")
+    passo = max(1, len(amostras) // 20)
+    for t, pendentes, fila, memoria, lag in amostras[::passo]:
+        print(f"{t:>7.1f}{pendentes:>13}{fila:>7}{memoria / 1e6:>12.1f}{lag * 1000:>9.1f}")
+
+    if carga.erros:
+        print("\nErros:")
+        for erro, quantidade in sorted(carga.erros.items(), key=lambda e: -e[1]):
+            print(f"  {quantidade:>5}  {erro}")
+    return 1 if carga.erros else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encomendas", type=int, default=200, help="ciclos completos de encomenda")
+    parser.add_argument("--concorrencia", type=int, default=16, help="ciclos simultâneos")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos de cada chamada REST simulada")
+    parser.add_argument("--abandono", type=float, default=0.0, help="fração de prévias nunca confirmadas")
+    parser.add_argument("--cancelamento", type=float, default=0.0, help="fração de prévias canceladas")
+    parser.add_argument("--catalogo", type=int, default=0, help="usa um catálogo sintético deste tamanho em vez do data.json")
+    parser.add_argument("--modo", choices=("thread", "processo"), default="thread", help="WORKER_MODE do pool de cálculo")
+    parser.add_argument("--taxa-publicacao", type=int, default=1000, help="publicações por segundo no canal falso")
+    parser.add_argument("--amostragem", type=float, default=0.25, help="intervalo (s) entre amostras")
+    parser.add_argument("--espera-publicacao", type=float, default=30.0, help="tempo máximo (s) para esvaziar a fila no fim")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    return asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
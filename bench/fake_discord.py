@@ -0,0 +1,179 @@
+"""
+Substitutos mínimos dos objetos do discord.py usados pelo fluxo de encomendas.
+
+Implementam só o que a cog, as views e o modal chamam (respostas, follow-ups,
+envio e edição de mensagens) e registram o que foi enviado. Cada chamada que
+seria uma requisição REST espera `latencia` segundos, para simular a rede.
+"""
+import asyncio
+import datetime
+import itertools
+
+import discord
+
+_ids = itertools.count(10**18)
+
+
+def novo_id():
+    return next(_ids)
+
+
+class FakeAvatar:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+
+class FakeUser:
+    def __init__(self, nome, cargos=()):
+        self.id = novo_id()
+        self.name = nome
+        self.mention = f"<@{self.id}>"
+        self.display_avatar = FakeAvatar()
+        # Ids de cargo como chegam no payload da interação (`Member._roles`)
+        self._roles = [int(cargo) for cargo in cargos]
+
+
+class FakeMessage:
+    def __init__(self, channel_id, latencia=0.0, embed=None, view=None, content=None, guild_id=None):
+        self.id = novo_id()
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.latencia = latencia
+        self.embed = embed
+        self.view = view
+        self.content = content
+        self.edicoes = 0
+
+    @property
+    def embeds(self):
+        return [self.embed] if self.embed is not None else []
+
+    @property
+    def jump_url(self):
+        return f"https://discord.com/channels/{self.guild_id or 0}/{self.channel_id}/{self.id}"
+
+    async def edit(self, **kwargs):
+        await asyncio.sleep(self.latencia)
+        self.edicoes += 1
+        for campo in ("embed", "view", "content"):
+            if campo in kwargs:
+                setattr(self, campo, kwargs[campo])
+        return self
+
+
+class FakeChannel:
+    def __init__(self, channel_id=None, latencia=0.0, guild_id=None):
+        self.id = channel_id or novo_id()
+        self.guild_id = guild_id
+        self.latencia = latencia
+        self.mensagens = []
+
+    async def send(self, content=None, *, embed=None, view=None, **kwargs):
+        await asyncio.sleep(self.latencia)
+        mensagem = FakeMessage(self.id, self.latencia, embed=embed, view=view, content=content, guild_id=self.guild_id)
+        self.mensagens.append(mensagem)
+        return mensagem
+
+
+class FakeGuild:
+    def __init__(self, guild_id, canais):
+        self.id = guild_id
+        self._canais = {canal.id: canal for canal in canais}
+
+    def get_channel(self, channel_id):
+        return self._canais.get(channel_id)
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._tipo = None
+        self.view = None
+        self.modal = None
+
+    @property
+    def type(self):
+        return self._tipo
+
+    def is_done(self):
+        return self._tipo is not None
+
+    def _responder(self, tipo):
+        if self._tipo is not None:
+            raise discord.InteractionResponded(self._interaction)
+        self._tipo = tipo
+
+    async def send_message(self, content=None, *, embed=None, view=None, ephemeral=False, **kwargs):
+        self._responder(discord.InteractionResponseType.channel_message)
+        await asyncio.sleep(self._interaction.latencia)
+        self.view = view
+        self._interaction._original = FakeMessage(
+            self._interaction.channel_id, self._interaction.latencia, embed=embed, view=view, content=content,
+            guild_id=self._interaction.guild_id,
+        )
+
+    async def defer(self, *, ephemeral=False, thinking=False):
+        componente = self._interaction.type == discord.InteractionType.component and not thinking
+        self._responder(
+            discord.InteractionResponseType.deferred_message_update if componente
+            else discord.InteractionResponseType.deferred_channel_message
+        )
+        await asyncio.sleep(self._interaction.latencia)
+        if not componente:
+            self._interaction._original = FakeMessage(
+                self._interaction.channel_id, self._interaction.latencia, guild_id=self._interaction.guild_id
+            )
+
+    async def edit_message(self, **kwargs):
+        self._responder(discord.InteractionResponseType.message_update)
+        await self._interaction.message.edit(**kwargs)
+
+    async def send_modal(self, modal):
+        self._responder(discord.InteractionResponseType.modal)
+        await asyncio.sleep(self._interaction.latencia)
+        self.modal = modal
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self.mensagens = []
+
+    async def send(self, content=None, *, embed=None, view=None, wait=False, **kwargs):
+        await asyncio.sleep(self._interaction.latencia)
+        mensagem = FakeMessage(
+            self._interaction.channel_id, self._interaction.latencia, embed=embed, view=view, content=content,
+            guild_id=self._interaction.guild_id,
+        )
+        self.mensagens.append(mensagem)
+        return mensagem if wait else None
+
+
+class FakeInteraction:
+    def __init__(self, tipo, user, channel_id, message=None, custom_id=None, latencia=0.0, guild_id=None):
+        self.id = novo_id()
+        self.type = tipo
+        self.user = user
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.message = message
+        self.data = {'custom_id': custom_id} if custom_id is not None else {}
+        self.latencia = latencia
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self._original = message
+
+    @classmethod
+    def componente(cls, user, message, custom_id=None, latencia=0.0):
+        return cls(discord.InteractionType.component, user, message.channel_id, message, custom_id, latencia, message.guild_id)
+
+    @classmethod
+    def modal(cls, user, channel_id, latencia=0.0, guild_id=None):
+        return cls(discord.InteractionType.modal_submit, user, channel_id, latencia=latencia, guild_id=guild_id)
+
+    async def original_response(self):
+        await asyncio.sleep(self.latencia)
+        return self._original
+
+    async def edit_original_response(self, **kwargs):
+        return await self._original.edit(**kwargs)
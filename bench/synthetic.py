@@ -0,0 +1,67 @@
+"""
+Gerador de grafos de receitas sintéticos para os benchmarks.
+
+O grafo é gerado em camadas: a camada 0 tem as matérias-primas (com preço) e
+cada item das camadas seguintes usa `fan_out` materiais das camadas abaixo.
+`compartilhamento` é a probabilidade de um material vir de um pequeno conjunto
+de intermediários compartilhados (como "Farelo de Minério" no data.json), em
+vez de um item qualquer da camada inferior.
+"""
+import random
+
+
+def gerar_dados(
+    tamanho_catalogo=100,
+    profundidade=4,
+    fan_out=3,
+    compartilhamento=0.3,
+    n_materias_primas=20,
+    seed=0,
+):
+    """Retorna um payload no mesmo formato do data.json (`precos` e `receitas_crafting`)."""
+    rng = random.Random(seed)
+
+    materias_primas = [f"Matéria {i}" for i in range(n_materias_primas)]
+    camadas = [materias_primas]
+    por_camada = max(1, tamanho_catalogo // profundidade)
+    for nivel in range(1, profundidade + 1):
+        camadas.append([f"Item N{nivel}-{i}" for i in range(por_camada)])
+
+    # Poucos intermediários de cada camada concentram o compartilhamento
+    compartilhados = [camada[: max(1, len(camada) // 10)] for camada in camadas]
+
+    receitas = {}
+    for nivel in range(1, len(camadas)):
+        for item in camadas[nivel]:
+            materiais = {}
+            while len(materiais) < fan_out:
+                nivel_material = rng.randrange(nivel)
+                if rng.random() < compartilhamento:
+                    nome = rng.choice(compartilhados[nivel_material])
+                else:
+                    nome = rng.choice(camadas[nivel_material])
+                materiais[nome] = rng.randint(1, 12)
+            receitas[item] = {
+                "produz": rng.choice((1, 4, 6, 8, 12, 24, 32, 64)),
+                "materiais": [{"nome": nome, "quantidade": qtd} for nome, qtd in materiais.items()],
+                "tempo": 15,
+            }
+
+    precos = {
+        "sintetico": {
+            "min": {nome: round(rng.uniform(0.2, 2.0), 2) for nome in materias_primas},
+            "range": {},
+        }
+    }
+    for nome, preco_min in precos["sintetico"]["min"].items():
+        precos["sintetico"]["range"][nome] = {"min": preco_min, "max": round(preco_min * 1.25, 2)}
+
+    return {"settings": {"craft-size": 400}, "precos": precos, "receitas_crafting": receitas}
+
+
+def gerar_encomenda(receitas, n_produtos, seed=0):
+    """Lista de produtos (formato `{'name', 'quantity'}`) escolhidos entre os itens do topo."""
+    rng = random.Random(seed)
+    produtos = list(receitas)[-max(n_produtos, 1) * 4:]
+    escolhidos = rng.sample(produtos, min(n_produtos, len(produtos)))
+    return [{"name": nome, "quantity": rng.choice((10, 50, 100, 250, 1000))} for nome in escolhidos]
@@ -1,24 +1,23 @@
 """
 Módulo para cálculos complexos de crafting e custos.
 """
-import math
 from collections import defaultdict
+import metrics
+from .price_index import PriceIndex
+from .recipe_graph import RecipeGraph
 
 def find_price(item_name, precos_data):
     """
-    Procura o preço de um item em todas as categorias de preços.
+    Procura o preço de um item no índice de preços.
+    `precos_data` pode ser o dicionário `precos` ou um `PriceIndex` já construído.
     Retorna uma tupla (min_price, max_price) ou (None, None) se não encontrado.
     """
-    for categoria in precos_data.values():
-        if isinstance(categoria, dict):
-            # Procura em 'min' e 'range' para abranger ambas as estruturas
-            if 'min' in categoria and isinstance(categoria.get('min'), dict) and item_name in categoria['min']:
-                return categoria['min'][item_name], categoria['min'][item_name]
-            if 'range' in categoria and isinstance(categoria.get('range'), dict) and item_name in categoria['range']:
-                price_info = categoria['range'][item_name]
-                return price_info.get('min'), price_info.get('max')
-    return None, None
+    preco = PriceIndex.de(precos_data).get(item_name)
+    if preco is None:
+        return None, None
+    return preco.min, preco.max
 
+@metrics.cronometrado("gepeto_calculo_seconds")
 def calcular_custo_craft(item_nome, quantidade, receitas, precos, memo=None):
     """
     Calcula o custo de craft de um item de forma recursiva, com memoization.
@@ -26,6 +25,7 @@ def calcular_custo_craft(item_nome, quantidade, receitas, precos, memo=None):
     """
     if memo is None:
         memo = {}
+    indice_precos = PriceIndex.de(precos)
 
     def get_custo_unitario(item):
         """
@@ -36,7 +36,7 @@ def calcular_custo_craft(item_nome, quantidade, receitas, precos, memo=None):
             return memo[item]
 
         # 1. Tenta encontrar um preço de compra direto (matéria-prima)
-        preco_min_direto, preco_max_direto = find_price(item, precos)
+        preco_min_direto, preco_max_direto = find_price(item, indice_precos)
         if preco_min_direto is not None:
             # Se encontrou um preço, usa como custo base.
             custo_max = preco_max_direto if preco_max_direto is not None else preco_min_direto
@@ -83,54 +83,49 @@ def calcular_custo_craft(item_nome, quantidade, receitas, precos, memo=None):
     return total_min, total_max
 
 def calcular_materiais(item_nome, quantidade_desejada, receitas, acumulador=None):
+    """
+    Calcula as matérias-primas de um item. `receitas` pode ser o dicionário
+    `receitas_crafting` ou um `RecipeGraph` já compilado.
+    """
     if acumulador is None:
         acumulador = defaultdict(float)
 
-    if item_nome not in receitas:
-        acumulador[item_nome] += quantidade_desejada
-        return acumulador
-
-    receita = receitas[item_nome]
-    produz_por_craft = receita['produz']
-    quantidade_de_crafts = math.ceil(quantidade_desejada / produz_por_craft)
-
-    for material in receita['materiais']:
-        nome_material = material['nome']
-        quantidade_por_craft = material['quantidade']
-        total_para_item = quantidade_por_craft * quantidade_de_crafts
-        calcular_materiais(nome_material, total_para_item, receitas, acumulador)
-
+    grafo = RecipeGraph.de(receitas)
+    for material, quantidade in grafo.expandir([(item_nome, quantidade_desejada)]).brutos.items():
+        acumulador[material] += quantidade
     return acumulador
 
-def calcular_materiais_para_lista(produtos_list, receitas):
-    materiais_agregados = defaultdict(float)
-    for produto in produtos_list:
-        calcular_materiais(
-            produto['name'],
-            produto['quantity'],
-            receitas,
-            materiais_agregados
-        )
-    return materiais_agregados
+@metrics.cronometrado("gepeto_calculo_seconds")
+def calcular_materiais_para_lista(produtos_list, receitas, estoque=None):
+    """
+    Expande a encomenda inteira de uma vez, somando a demanda de itens compartilhados.
+    Com `estoque`, só retorna as matérias-primas que faltam.
+    """
+    return RecipeGraph.de(receitas).expandir(produtos_list, estoque).brutos
 
+@metrics.cronometrado("gepeto_calculo_seconds")
 def calcular_custo_de_materiais(materiais_necessarios, precos):
+    """
+    Soma o custo mínimo das matérias-primas. Os preços (incluindo os fallbacks
+    de `settings.precos-fallback`) vêm do `PriceIndex`.
+    """
+    indice_precos = PriceIndex.de(precos)
     custo_total = 0
-    precos_min = {}
-    if precos:
-        for categoria in precos.values():
-            if isinstance(categoria, dict) and 'min' in categoria and isinstance(categoria['min'], dict):
-                precos_min.update(categoria['min'])
-
     for material, qtd in materiais_necessarios.items():
-        preco_unitario = 0.0
-        if material in precos_min:
-            preco_unitario = precos_min[material]
-        elif "Minério" in material or material == "Carvão":
-            if "mineradora" in precos and "min" in precos["mineradora"] and "Qualquer Minério" in precos["mineradora"]["min"]:
-                preco_unitario = precos["mineradora"]["min"]["Qualquer Minério"]
-        custo_total += float(qtd) * preco_unitario
+        custo_total += float(qtd) * indice_precos.custo_materia_prima(material)[0]
     return custo_total
 
+@metrics.cronometrado("gepeto_calculo_seconds")
+def calcular_faixa_de_custo(materiais_necessarios, precos):
+    """Retorna o custo (mínimo, máximo) das matérias-primas, com os fallbacks de preço."""
+    indice_precos = PriceIndex.de(precos)
+    custo_min = custo_max = 0
+    for material, qtd in materiais_necessarios.items():
+        preco_min, preco_max = indice_precos.custo_materia_prima(material)
+        custo_min += float(qtd) * preco_min
+        custo_max += float(qtd) * preco_max
+    return custo_min, custo_max
+
 def calcular_custo_minimo(item_final, quantidade, receitas, precos):
     materiais_necessarios = calcular_materiais(item_final, quantidade, receitas)
     return calcular_custo_de_materiais(materiais_necessarios, precos)
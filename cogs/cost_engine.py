@@ -0,0 +1,225 @@
+"""
+Motor vetorizado de custos do catálogo inteiro.
+
+As receitas viram uma matriz esparsa (formato COO: linhas, colunas, valores =
+quantidade / produz) e o índice de preços vira dois vetores (mínimo e máximo).
+O custo unitário de todos os itens é resolvido em lote, camada por camada da
+altura do grafo, com as mesmas regras de `calcular_custo_craft`:
+
+  * item com preço de compra direto usa esse preço;
+  * item sem preço e com receita custa a soma dos materiais / produz;
+  * item sem preço e sem receita custa 0.
+
+Quando só os preços mudam, `com_precos` usa o índice reverso do grafo para
+recalcular apenas os itens a jusante dos preços alterados e informa quais
+produtos tiveram o custo ou a margem alterados.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .price_index import PriceIndex
+from .recipe_graph import RecipeGraph
+
+LinhaTabela = namedtuple("LinhaTabela", ["item", "custo_min", "custo_max", "venda", "margem"])
+# Diferença de custo de fabricação / margem de um produto entre dois motores
+Alteracao = namedtuple("Alteracao", ["item", "custo_antes", "custo_depois", "margem_antes", "margem_depois"])
+
+
+def _difere(antes, depois):
+    if antes is None or depois is None:
+        return antes is not depois
+    return not np.isclose(antes, depois)
+
+
+class _EstruturaReceitas:
+    """Parte do motor que só depende das receitas (reaproveitada entre recargas de preço)."""
+
+    def __init__(self, grafo):
+        self.itens = tuple(grafo.ordem)
+        self.indice = {item: i for i, item in enumerate(self.itens)}
+        n = len(self.itens)
+
+        linhas, colunas, valores = [], [], []
+        for item, materiais in grafo.arestas.items():
+            i = self.indice[item]
+            produz = grafo.produz[item]
+            for nome_material, quantidade in materiais:
+                linhas.append(i)
+                colunas.append(self.indice[nome_material])
+                valores.append(quantidade / produz)
+        # Ordena as entradas por linha (CSR), para fatiar a receita de um item em O(1)
+        ordem = np.argsort(np.asarray(linhas, dtype=np.int64), kind="stable")
+        self.linhas = np.asarray(linhas, dtype=np.int64)[ordem]
+        self.colunas = np.asarray(colunas, dtype=np.int64)[ordem]
+        self.valores = np.asarray(valores, dtype=np.float64)[ordem]
+        self.ponteiros = np.searchsorted(self.linhas, np.arange(n + 1))
+
+        # Altura de cada nó: o nível do item no grafo (0 para matérias-primas)
+        altura = np.fromiter((grafo.niveis.get(item, 0) for item in self.itens), dtype=np.int64, count=n)
+        self.altura = altura
+
+        # Para cada camada: itens da camada e fatia da matriz com as suas linhas
+        self.camadas = []
+        altura_por_entrada = altura[self.linhas] if len(self.linhas) else np.zeros(0, dtype=np.int64)
+        for h in range(1, int(altura.max(initial=0)) + 1):
+            itens_camada = np.flatnonzero(altura == h)
+            entradas = np.flatnonzero(altura_por_entrada == h)
+            # Reindexa as linhas para posições locais dentro da camada
+            local = np.searchsorted(itens_camada, self.linhas[entradas])
+            self.camadas.append((itens_camada, entradas, local))
+
+        self.craftaveis = np.fromiter((item in grafo.produz for item in self.itens), dtype=bool, count=n)
+
+    def entradas_das_linhas(self, linhas):
+        """Posições na matriz das receitas dos itens `linhas` e a linha local de cada uma."""
+        inicios = self.ponteiros[linhas]
+        tamanhos = self.ponteiros[linhas + 1] - inicios
+        deslocamentos = np.cumsum(tamanhos) - tamanhos
+        entradas = np.arange(tamanhos.sum()) + np.repeat(inicios - deslocamentos, tamanhos)
+        local = np.repeat(np.arange(len(linhas)), tamanhos)
+        return entradas, local
+
+
+class CostEngine:
+    """Custos unitários (mínimo e máximo) de todo o catálogo, resolvidos em lote."""
+
+    def __init__(self, grafo, precos, estrutura=None):
+        self.grafo = RecipeGraph.de(grafo)
+        self.precos = PriceIndex.de(precos)
+        self.estrutura = estrutura or _EstruturaReceitas(self.grafo)
+        # Alterações em relação ao motor de origem (só preenchido por `com_precos`)
+        self.alteracoes = []
+        self._resolver()
+
+    def com_precos(self, precos):
+        """
+        Novo motor com outros preços, reaproveitando a matriz de receitas e
+        recalculando só o subgrafo afetado pelos preços que mudaram.
+        """
+        precos = PriceIndex.de(precos)
+        indice = self.estrutura.indice
+        candidatos = set(self.precos) | set(precos)
+        alterados = [
+            item for item in candidatos
+            if item in indice and self.precos.get(item) != precos.get(item)
+        ]
+
+        novo = CostEngine.__new__(CostEngine)
+        novo.grafo, novo.precos, novo.estrutura = self.grafo, precos, self.estrutura
+        novo.preco_min, novo.preco_max = self.preco_min.copy(), self.preco_max.copy()
+        novo.tem_preco = self.tem_preco.copy()
+        novo.custo, novo.custo_craft = self.custo.copy(), self.custo_craft.copy()
+
+        for item in alterados:
+            i = indice[item]
+            preco = precos.get(item)
+            novo.tem_preco[i] = preco is not None and preco.min is not None
+            novo.preco_min[i] = preco.min if novo.tem_preco[i] else 0.0
+            novo.preco_max[i] = (preco.max if preco.max is not None else preco.min) if novo.tem_preco[i] else 0.0
+
+        afetados = set(alterados) | self.grafo.dependentes(alterados)
+        novo._recalcular([indice[item] for item in afetados])
+        novo.alteracoes = novo._comparar(self, afetados)
+        return novo
+
+    def com_variacoes(self, variacoes):
+        """
+        Simulação "e se": aplica `variacoes` (item -> (min, max) ou None) sobre os
+        preços atuais. Retorna o novo motor; as diferenças ficam em `.alteracoes`.
+        """
+        return self.com_precos(self.precos.com_variacoes(variacoes))
+
+    def _recalcular(self, indices):
+        """Recalcula os itens informados, das camadas mais baixas para as mais altas."""
+        est = self.estrutura
+        indices = np.asarray(sorted(indices), dtype=np.int64)
+        alturas = est.altura[indices]
+        for h in np.unique(alturas):
+            linhas = indices[alturas == h]
+            entradas, local = est.entradas_das_linhas(linhas)
+            calculado = np.zeros((len(linhas), 2))
+            np.add.at(calculado, local, est.valores[entradas, None] * self.custo[est.colunas[entradas]])
+
+            craftaveis = est.craftaveis[linhas]
+            self.custo_craft[linhas[craftaveis]] = calculado[craftaveis]
+            preco_direto = np.stack([self.preco_min[linhas], self.preco_max[linhas]], axis=1)
+            self.custo[linhas] = np.where(self.tem_preco[linhas, None], preco_direto, calculado)
+
+    def _margem(self, i):
+        if not self.tem_preco[i]:
+            return None
+        return float(self.preco_min[i] - self.custo_craft[i, 0])
+
+    def _comparar(self, anterior, itens):
+        alteracoes = []
+        for item in sorted(itens):
+            i = self.estrutura.indice[item]
+            if not self.estrutura.craftaveis[i]:
+                continue
+            custo_antes = (float(anterior.custo_craft[i, 0]), float(anterior.custo_craft[i, 1]))
+            custo_depois = (float(self.custo_craft[i, 0]), float(self.custo_craft[i, 1]))
+            margem_antes, margem_depois = anterior._margem(i), self._margem(i)
+            if _difere(custo_antes[0], custo_depois[0]) or _difere(custo_antes[1], custo_depois[1]) \
+                    or _difere(margem_antes, margem_depois):
+                alteracoes.append(Alteracao(item, custo_antes, custo_depois, margem_antes, margem_depois))
+        return alteracoes
+
+    def _vetores_de_preco(self):
+        itens = self.estrutura.itens
+        n = len(itens)
+        preco_min = np.zeros(n)
+        preco_max = np.zeros(n)
+        tem_preco = np.zeros(n, dtype=bool)
+        for i, item in enumerate(itens):
+            preco = self.precos.get(item)
+            if preco is not None and preco.min is not None:
+                tem_preco[i] = True
+                preco_min[i] = preco.min
+                preco_max[i] = preco.max if preco.max is not None else preco.min
+        return preco_min, preco_max, tem_preco
+
+    def _resolver(self):
+        est = self.estrutura
+        self.preco_min, self.preco_max, self.tem_preco = self._vetores_de_preco()
+
+        # Custo efetivo: preço direto quando existe, senão o custo da receita
+        custo = np.where(self.tem_preco[:, None], np.stack([self.preco_min, self.preco_max], axis=1), 0.0)
+        for itens_camada, entradas, local in est.camadas:
+            contribuicao = est.valores[entradas, None] * custo[est.colunas[entradas]]
+            calculado = np.zeros((len(itens_camada), 2))
+            np.add.at(calculado, local, contribuicao)
+            sem_preco = ~self.tem_preco[itens_camada]
+            custo[itens_camada[sem_preco]] = calculado[sem_preco]
+        self.custo = custo
+
+        # Custo de fabricação de todo item craftável (mesmo os que têm preço de compra)
+        custo_craft = np.zeros_like(custo)
+        if len(est.linhas):
+            np.add.at(custo_craft, est.linhas, est.valores[:, None] * custo[est.colunas])
+        self.custo_craft = custo_craft
+
+    def custo_unitario(self, item):
+        """Custo unitário efetivo (mínimo, máximo), como em `calcular_custo_craft`."""
+        i = self.estrutura.indice.get(item)
+        if i is None:
+            return 0.0, 0.0
+        return float(self.custo[i, 0]), float(self.custo[i, 1])
+
+    def custo_de_fabricacao(self, item):
+        """Custo unitário (mínimo, máximo) de fabricar o item pela sua receita."""
+        i = self.estrutura.indice.get(item)
+        if i is None or not self.estrutura.craftaveis[i]:
+            return None
+        return float(self.custo_craft[i, 0]), float(self.custo_craft[i, 1])
+
+    def tabela(self):
+        """Custo de fabricação, preço de venda e margem unitária de cada produto craftável."""
+        linhas = []
+        for i in np.flatnonzero(self.estrutura.craftaveis):
+            item = self.estrutura.itens[i]
+            custo_min, custo_max = float(self.custo_craft[i, 0]), float(self.custo_craft[i, 1])
+            venda = float(self.preco_min[i]) if self.tem_preco[i] else None
+            margem = venda - custo_min if venda is not None else None
+            linhas.append(LinhaTabela(item, custo_min, custo_max, venda, margem))
+        return linhas
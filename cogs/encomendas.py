@@ -1,125 +1,410 @@
+import asyncio
+import io
+import time
 import discord
+from discord import app_commands
 from discord.ext import commands
-from ui.modals import NewOrder
+import metrics
+from ui.modals import NewOrder, enviar_previa
 from ui.embeds import EncomendaView
-import math
-from collections import defaultdict
+from collections import OrderedDict
 from ui.dropdown import ProdutoDropdownView
-from .calculator import calcular_materiais_para_lista, calcular_custo_de_materiais
-
-# ID do canal onde o botão de nova encomenda será enviado
-ID_CANAL_ENCOMENDA = 1402582869280292894
-# ID do canal onde as encomendas confirmadas serão publicadas
-ID_CANAL_PUBLICO = 1160775850334113852
-# ID do servidor (guild)
-ID_GUILD = 1145126424248848514
-
-def _formatar_bloco_individual(item, quantidade_desejada, receitas, craft_size):
-    if item not in receitas:
-        return ""
-    receita = receitas[item]
-    produz_por_craft = receita['produz']
-    ingredientes = receita['materiais']
-    total_crafts = math.ceil(quantidade_desejada / produz_por_craft)
-    soma_materiais_por_craft = sum(mat['quantidade'] for mat in ingredientes)
-    max_por_vez = math.floor(craft_size / soma_materiais_por_craft) if soma_materiais_por_craft > 0 else total_crafts
-    if max_por_vez == 0: max_por_vez = 1
-    repeticoes = total_crafts // max_por_vez
-    resto = total_crafts % max_por_vez
-    total_produzido = total_crafts * produz_por_craft
-    texto = f"Precisa: {quantidade_desejada} | Total a produzir: {total_produzido}\n\n"
-    if repeticoes > 0:
-        produz_por_lote = max_por_vez * produz_por_craft
-        texto += f"📋 Instruções de Lote:\n"
-        texto += f"   - Repetir {repeticoes} vezes\n"
-        texto += f"   - Produzir {produz_por_lote}\n"
-        texto += f"   - Solicita por Vez: {max_por_vez}\n"
-        texto += f"   - Materiais (para cada lote):\n"
-        for mat in ingredientes:
-            qtd_por_lote = mat['quantidade'] * max_por_vez
-            texto += f"      - {mat['nome']}: {qtd_por_lote}\n"
-        texto += "\n"
-    if resto > 0:
-        produz_no_final = resto * produz_por_craft
-        texto += f"📋 Instruções do Lote Final:\n"
-        texto += f"   - Repetir 1 vez\n"
-        texto += f"   - Produzir {produz_no_final}\n"
-        texto += f"   - Solicita por Vez: {max_por_vez}\n"
-        texto += f"   - Materiais (para cada lote):\n"
-        for mat in ingredientes:
-            qtd_final = mat['quantidade'] * resto
-            texto += f"      - {mat['nome']}: {qtd_final}\n"
-    return texto.strip()
-
-def dividir_em_blocos(texto, tamanho_max=1018):
-    blocos = []
-    bloco_atual = ""
-    for linha in texto.splitlines(keepends=True):
-        if len(bloco_atual) + len(linha) > tamanho_max:
-            blocos.append(bloco_atual.rstrip())
-            bloco_atual = linha
-        else:
-            bloco_atual += linha
-    if bloco_atual:
-        blocos.append(bloco_atual.rstrip())
-    return blocos
-
-def calcular_necessidades_intermediarios(produtos_list, receitas):
-    necessidades = defaultdict(float)
-    a_processar = [(p['name'], p['quantity']) for p in produtos_list]
-
-    while a_processar:
-        item, quantidade = a_processar.pop(0)
-
-        if item in receitas:
-            receita = receitas[item]
-            crafts_necessarios = math.ceil(quantidade / receita['produz'])
-            necessidades[item] += quantidade
-            for material in receita['materiais']:
-                a_processar.append((material['nome'], material['quantidade'] * crafts_necessarios))
-    return necessidades
-
-def gerar_blocos_de_rateio_para_lista(produtos_list, receitas, craft_size):
-    all_craft_needs = calcular_necessidades_intermediarios(produtos_list, receitas)
-    craft_order = []
-    visited = set()
-    def get_order(item):
-        if item in receitas and item not in visited:
-            visited.add(item)
-            craft_order.append(item)
-            for material in receitas[item]['materiais']:
-                get_order(material['nome'])
-    for produto in produtos_list:
-        get_order(produto['name'])
-
-    blocos_finais = []
-    for item in craft_order:
-        if item in all_craft_needs and all_craft_needs[item] > 0:
-            total_a_produzir = math.ceil(all_craft_needs[item])
-            bloco_str = _formatar_bloco_individual(item, total_a_produzir, receitas, craft_size)
-            if bloco_str:
-                blocos_finais.append((f"➡️ {item.upper()}", bloco_str))
-    return blocos_finais
+from ui.plano_paginado import (
+    ID_PLANO_COMPLETO,
+    PREFIXO_PAGINA,
+    PlanoPaginado,
+    PlanoPaginadoView,
+    formatar_valor as _formatar_valor,
+)
+# Os ids da guild padrão vivem em guilds.py (usados quando não há guilds.json) e continuam reexportados aqui
+from guilds import ID_CANAL_ENCOMENDA, ID_CANAL_PUBLICO, ID_GUILD
+from order_history import SEMANA, semana_de
+from outbox import Publicador
+from plan_cache import planejar_com_cache
+from workers import CalculoExcedeuPrazo, responder
+from .order_plan import OrderPlan
+from .importacao import MAX_BYTES_ARQUIVO, importar_do_snapshot, formatar_relatorio
+# As funções de rateio vivem em cogs/rateio.py e continuam reexportadas aqui
+from .rateio import (
+    dividir_em_blocos,
+    calcular_necessidades_intermediarios,
+    gerar_blocos_de_rateio_para_lista,
+)
+
+# custom_ids dos botões tratados em on_interaction
+RAMOS_DE_INTERACAO = ("botao_encomenda", "confirmar_encomenda", "cancelar_encomenda")
+
+# Pares produto/quantidade do comando /encomenda (3 + 2 * 10 opções, limite de 25 do Discord)
+MAX_PRODUTOS_ENCOMENDA = 10
+
+# Tamanho máximo do anexo aceito por /importar-encomendas (o mesmo da leitura em cogs/importacao.py)
+MAX_BYTES_IMPORTACAO = MAX_BYTES_ARQUIVO
+
+# Recálculos do plano na confirmação se o estoque mudar durante o cálculo
+TENTATIVAS_REPLANO = 3
+
+# Encomendas publicadas com as páginas renderizadas mantidas em memória
+MAX_PLANOS_PAGINADOS = 64
+
+# Dias de histórico usados na média diária de /previsao-materiais
+JANELA_PREVISAO = 14
+# Matérias-primas listadas na previsão (as de maior demanda)
+MAX_ITENS_PREVISAO = 25
+
+# Views persistentes (timeout=None) registradas na inicialização, por nome
+VIEWS_PERSISTENTES = {"EncomendaView": EncomendaView}
+
+def _ids_dos_cargos(user):
+    # `Member._roles` são os ids de cargo que vieram no payload da interação; não
+    # dependem do cache de cargos nem de membros (modo enxuto do gateway)
+    ids = getattr(user, '_roles', None)
+    if ids is None:
+        return {role.id for role in getattr(user, 'roles', ())}
+    return set(ids)
+
+def _tem_permissao(interaction, snapshot):
+    user_roles_ids = {str(role_id) for role_id in _ids_dos_cargos(interaction.user)}
+    return not user_roles_ids.isdisjoint(snapshot.permissoes)
+
+async def _snapshot_verificado(particoes, interaction):
+    """
+    Snapshot da guild da interação se o usuário tem permissão nela; senão
+    responde com o motivo e retorna None.
+    """
+    if particoes.config(interaction.guild_id) is None:
+        await interaction.response.send_message("❌ Este servidor não está configurado para encomendas.", ephemeral=True)
+        return None
+    snapshot = await particoes.obter(interaction.guild_id)
+    if snapshot is None:
+        await interaction.response.send_message("❌ Os dados da API não foram carregados.", ephemeral=True)
+        return None
+    if not _tem_permissao(interaction, snapshot):
+        await interaction.response.send_message("❌ Você não tem permissão.", ephemeral=True, delete_after=5)
+        return None
+    return snapshot
+
+def _formatar_tabela_de_precos(linhas):
+    cabecalho = f"{'Produto':<28} {'Custo (min-max)':>17} {'Venda':>8} {'Margem':>8}"
+    texto = [cabecalho, "-" * len(cabecalho)]
+    for linha in sorted(linhas, key=lambda l: l.item):
+        custo = f"{linha.custo_min:.2f}-{linha.custo_max:.2f}"
+        venda = f"{linha.venda:.2f}" if linha.venda is not None else "N/A"
+        margem = f"{linha.margem:.2f}" if linha.margem is not None else "N/A"
+        texto.append(f"{linha.item[:28]:<28} {custo:>17} {venda:>8} {margem:>8}")
+    return "\n".join(texto)
+
+def _formatar_previsao(previsao, estoque):
+    cabecalho = f"{'Matéria-prima':<28} {'Previsto':>10} {'Estoque':>10}"
+    texto = [cabecalho, "-" * len(cabecalho)]
+    maiores = sorted(previsao.items(), key=lambda par: (-par[1], par[0]))[:MAX_ITENS_PREVISAO]
+    for item, quantidade in maiores:
+        texto.append(f"{item[:28]:<28} {quantidade:>10,.0f} {estoque.saldo(item):>10,.0f}")
+    if len(previsao) > MAX_ITENS_PREVISAO:
+        texto.append(f"... e mais {len(previsao) - MAX_ITENS_PREVISAO} item(ns)")
+    return "\n".join(texto)
 
 class EncomendaCog(commands.Cog):
-    def __init__(self, bot: commands.Bot, button_data: dict, api_data: dict):
+    def __init__(self, bot: commands.Bot, button_data, particoes, estado):
         self.bot = bot
+        # Encomendas pendentes; cada guild usa o próprio namespace (`button_data.namespace(guild_id)`)
         self.button_data = button_data
-        self.api_data = api_data
-
-    @commands.Cog.listener()
-    async def on_ready(self):
-        guild = self.bot.get_guild(ID_GUILD)
-        if not guild: return
-        channel = guild.get_channel(ID_CANAL_ENCOMENDA)
-        if not channel: return
-
-        message_found = None
-        async for message in channel.history(limit=20):
-            if message.author == self.bot.user and message.embeds and message.embeds[0].title == "Criar nova encomenda":
+        # Snapshot de cada guild (catálogo base + sobreposições), compilado sob demanda
+        self.particoes = particoes
+        # Estado persistido entre restarts (views persistentes registradas)
+        self.estado = estado
+        self._paginados = OrderedDict()  # message_id -> PlanoPaginado
+        # Encomendas pendentes com Confirmar/Cancelar em andamento: a entrada só sai do store quando termina
+        self._em_andamento = set()
+        # Confirmações aguardando a publicação: chave -> (interaction, evento "já respondida")
+        self._confirmacoes = {}
+        # Edições das confirmações em andamento (fora do laço do publicador)
+        self._edicoes = set()
+        self.publicador = Publicador.do_ambiente(
+            self.bot.outbox, self._publicar_encomenda,
+            erros_permanentes=(discord.Forbidden, discord.NotFound),
+            ao_falhar=self._publicacao_falhou,
+            ao_publicar=self._encomenda_publicada,
+        )
+
+    async def cog_load(self):
+        """Registra as views persistentes antes da conexão, sem depender do on_ready."""
+        # Sem message_id: o botão "Nova Encomenda" de qualquer guild é atendido pelo custom_id
+        nomes = set(self.estado.views) | set(VIEWS_PERSISTENTES)
+        registradas = []
+        for nome in sorted(nomes):
+            view = VIEWS_PERSISTENTES.get(nome)
+            if view is None:
+                print(f"[SETUP] View persistente '{nome}' não existe mais; ignorada.")
+                continue
+            self.bot.add_view(view())
+            registradas.append(nome)
+        self.estado.registrar_views(registradas)
+        self.publicador.iniciar()
+
+    async def cog_unload(self):
+        await self.publicador.parar()
+
+    async def _plano_da_encomenda(self, interaction, data):
+        """
+        Plano salvo com a encomenda pendente. É recalculado no pool de workers
+        se o estoque mudou desde a prévia (outra encomenda confirmada, ajuste
+        manual) ou se a entrada é antiga e não tem plano.
+        """
+        estoque = self.bot.estoque.namespace(interaction.guild_id)
+        if data.get('plano'):
+            plano = OrderPlan.de_dict(data['plano'])
+            if plano.versao_estoque == estoque.versao:
+                return plano
+            print("[ESTOQUE] Estoque alterado desde a prévia; recalculando o plano da encomenda.")
+        snapshot = await self.particoes.obter(interaction.guild_id, data.get('versao'))
+        for _ in range(TENTATIVAS_REPLANO):
+            versao = estoque.versao
+            plano, _ = await planejar_com_cache(
+                interaction, self.bot, snapshot, data.get('produtos', []), ramo="confirmar_encomenda"
+            )
+            # O estoque pode ter mudado enquanto o plano era calculado fora do loop
+            if estoque.versao == versao:
                 break
+        return plano
+
+    def _lembrar_paginado(self, message_id, paginado):
+        self._paginados[message_id] = paginado
+        self._paginados.move_to_end(message_id)
+        while len(self._paginados) > MAX_PLANOS_PAGINADOS:
+            self._paginados.popitem(last=False)
+
+    def _paginado(self, message_id):
+        """Páginas da encomenda publicada na mensagem, ou None se ela não está no store."""
+        paginado = self._paginados.get(message_id)
+        if paginado is None:
+            entrada = self.bot.publicadas.get(message_id)
+            if entrada is None:
+                return None
+            paginado = PlanoPaginado(entrada)
+        self._lembrar_paginado(message_id, paginado)
+        return paginado
+
+    async def _publicar_encomenda(self, item):
+        """
+        Envia uma encomenda da fila de saída ao canal público (chamada pelo
+        `Publicador`). Retorna logo depois do envio, para que a fila marque a
+        publicação como feita antes de qualquer passo que possa falhar.
+        """
+        await self.bot.wait_until_ready()
+        canal = self.bot.get_channel(item['canal_id']) or await self.bot.fetch_channel(item['canal_id'])
+        paginado = PlanoPaginado(item['dados'])
+        mensagem = await canal.send(embed=paginado.pagina(0), view=PlanoPaginadoView(0, paginado.total))
+        self._lembrar_paginado(mensagem.id, paginado)
+
+        confirm_embed = discord.Embed(title='Encomenda Confirmada!', color=discord.Color.green())
+        confirm_embed.add_field(name='', value=f"✅ [Clique aqui para ver os detalhes]({mensagem.jump_url})")
+        self._editar_confirmacao(item['chave'], confirm_embed)
+        return mensagem.id
+
+    async def _encomenda_publicada(self, item, message_id):
+        # Guarda o plano para a navegação entre as páginas da mensagem pública
+        self.bot.publicadas[message_id] = item['dados']
+
+    async def _publicacao_falhou(self, item, erro):
+        erro_embed = discord.Embed(title='Encomenda Confirmada, mas não publicada', color=discord.Color.red())
+        erro_embed.add_field(name='', value=f"❌ Não foi possível publicar no canal de encomendas: {erro}")
+        self._editar_confirmacao(item['chave'], erro_embed)
+
+    def _editar_confirmacao(self, chave, embed):
+        """Edita a confirmação em uma tarefa própria: a espera e a chamada REST não seguram a fila."""
+        tarefa = asyncio.create_task(self._atualizar_confirmacao(chave, embed))
+        self._edicoes.add(tarefa)
+        tarefa.add_done_callback(self._edicoes.discard)
+
+    async def _atualizar_confirmacao(self, chave, embed):
+        # Depois de um restart a interação (e o token dela) não existe mais; a publicação segue sem aviso
+        confirmacao = self._confirmacoes.pop(chave, None)
+        if confirmacao is None:
+            return
+        interaction, respondida = confirmacao
+        try:
+            await asyncio.wait_for(respondida.wait(), 10)
+            await interaction.edit_original_response(embed=embed, view=None)
+        except (asyncio.TimeoutError, discord.HTTPException) as e:
+            print(f"[OUTBOX] Não foi possível atualizar a confirmação '{chave}': {e}")
+
+    @app_commands.command(name="tabela-precos", description="Custo de fabricação, preço de venda e margem de cada produto.")
+    async def tabela_precos(self, interaction: discord.Interaction):
+        snapshot = await _snapshot_verificado(self.particoes, interaction)
+        if snapshot is None:
+            return
+
+        tabela = _formatar_tabela_de_precos(snapshot.custos.tabela())
+        titulo = f"Tabela de Preços (dados v{snapshot.versao})"
+        if len(tabela) + 6 <= 4096:
+            embed = discord.Embed(title=titulo, description=f"```{tabela}```", color=discord.Color.blue())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        else:
+            arquivo = discord.File(io.BytesIO(tabela.encode("utf-8")), filename="tabela-precos.txt")
+            await interaction.response.send_message(f"📄 {titulo}", file=arquivo, ephemeral=True)
+
+    @app_commands.command(name="previsao-materiais", description="Previsão de compra de matérias-primas pelo histórico de encomendas.")
+    @app_commands.describe(dias="Horizonte da previsão, em dias")
+    async def previsao_materiais(self, interaction: discord.Interaction, dias: app_commands.Range[int, 1, 60] = 7):
+        if await _snapshot_verificado(self.particoes, interaction) is None:
+            return
 
-        self.bot.add_view(EncomendaView())
+        historico = self.bot.historico
+        agora = time.time()
+        previsao = historico.previsao(interaction.guild_id, dias, JANELA_PREVISAO, instante=agora)
+        semana = semana_de(agora)
+        esta_semana = historico.totais(interaction.guild_id, SEMANA, semana)
+        semana_passada = historico.totais(interaction.guild_id, SEMANA, semana - 1)
+
+        embed = discord.Embed(title=f"Previsão de Matérias-Primas ({dias} dia(s))", color=discord.Color.blue())
+        if previsao:
+            embed.description = f"```{_formatar_previsao(previsao, self.bot.estoque.namespace(interaction.guild_id))}```"
+        else:
+            embed.description = f"Nenhuma encomenda confirmada nos últimos {JANELA_PREVISAO} dias."
+        for titulo, totais in (("Esta semana", esta_semana), ("Semana passada", semana_passada)):
+            embed.add_field(
+                name=titulo,
+                value=f"```{totais['encomendas']} encomenda(s)\n"
+                      f"Custo: {_formatar_valor(totais['custo_max'])}\n"
+                      f"Venda: {_formatar_valor(totais['valor_venda'])}\n"
+                      f"Margem: {_formatar_valor(totais['margem'])}```",
+                inline=True,
+            )
+        embed.set_footer(text=f"Média diária dos últimos {JANELA_PREVISAO} dias × {dias} dia(s)")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="encomenda", description="Cria uma encomenda com até 10 produtos, com busca pelo nome.")
+    @app_commands.describe(nome="Nome do comprador", pombo="Pombo (ID)", prazo="Prazo de entrega")
+    async def encomenda(
+        self,
+        interaction: discord.Interaction,
+        nome: str,
+        pombo: str,
+        prazo: str,
+        produto_1: str, quantidade_1: app_commands.Range[int, 1],
+        produto_2: str = None, quantidade_2: app_commands.Range[int, 1] = None,
+        produto_3: str = None, quantidade_3: app_commands.Range[int, 1] = None,
+        produto_4: str = None, quantidade_4: app_commands.Range[int, 1] = None,
+        produto_5: str = None, quantidade_5: app_commands.Range[int, 1] = None,
+        produto_6: str = None, quantidade_6: app_commands.Range[int, 1] = None,
+        produto_7: str = None, quantidade_7: app_commands.Range[int, 1] = None,
+        produto_8: str = None, quantidade_8: app_commands.Range[int, 1] = None,
+        produto_9: str = None, quantidade_9: app_commands.Range[int, 1] = None,
+        produto_10: str = None, quantidade_10: app_commands.Range[int, 1] = None,
+    ):
+        snapshot = await _snapshot_verificado(self.particoes, interaction)
+        if snapshot is None:
+            return
+
+        pares = (
+            (produto_1, quantidade_1), (produto_2, quantidade_2), (produto_3, quantidade_3),
+            (produto_4, quantidade_4), (produto_5, quantidade_5), (produto_6, quantidade_6),
+            (produto_7, quantidade_7), (produto_8, quantidade_8), (produto_9, quantidade_9),
+            (produto_10, quantidade_10),
+        )
+        # Produto sem quantidade (ou quantidade sem produto) é recusado: nada vira 1 sem o usuário pedir
+        incompletos = [str(i) for i, (produto, quantidade) in enumerate(pares, start=1) if (produto is None) != (quantidade is None)]
+        if incompletos:
+            await interaction.response.send_message(
+                f"❌ Informe produto e quantidade juntos (par(es) {', '.join(incompletos)} incompleto(s)).", ephemeral=True
+            )
+            return
+
+        quantidades = {}
+        desconhecidos = []
+        for produto, quantidade in pares:
+            if produto is None:
+                continue
+            nome_produto = snapshot.produtos.resolver(produto)
+            if nome_produto is None:
+                desconhecidos.append(produto)
+                continue
+            quantidades[nome_produto] = quantidades.get(nome_produto, 0) + quantidade
+
+        if desconhecidos:
+            await interaction.response.send_message(
+                f"❌ Produto(s) não encontrado(s): {', '.join(desconhecidos)}. Escolha uma das sugestões.", ephemeral=True
+            )
+            return
+
+        produtos_list = [{'name': produto, 'quantity': quantidade} for produto, quantidade in quantidades.items()]
+        with metrics.medir("gepeto_interaction_seconds", ramo="encomenda"):
+            await enviar_previa(interaction, self.bot, self.button_data.namespace(interaction.guild_id), snapshot, nome, pombo, prazo, produtos_list, "encomenda")
+
+    async def _autocompletar_produto(self, interaction: discord.Interaction, atual: str):
+        snapshot = self.particoes.catalogo(interaction.guild_id)
+        if snapshot is None:
+            return []
+        return [app_commands.Choice(name=produto, value=produto) for produto in snapshot.produtos.buscar(atual)]
+
+    for _i in range(1, MAX_PRODUTOS_ENCOMENDA + 1):
+        encomenda.autocomplete(f"produto_{_i}")(_autocompletar_produto)
+    del _i
+
+    @app_commands.command(name="importar-encomendas", description="Importa várias encomendas de um CSV/JSON e calcula um plano único.")
+    @app_commands.describe(arquivo="CSV (pedido,produto,quantidade), JSON ou JSON Lines")
+    async def importar_encomendas(self, interaction: discord.Interaction, arquivo: discord.Attachment):
+        snapshot = await _snapshot_verificado(self.particoes, interaction)
+        if snapshot is None:
+            return
+        # O tamanho vem nos metadados do anexo: o arquivo grande nem chega a ser baixado
+        if arquivo.size > MAX_BYTES_IMPORTACAO:
+            await interaction.response.send_message(
+                f"❌ Arquivo muito grande (máximo de {MAX_BYTES_IMPORTACAO // (1024 * 1024)} MB).", ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(thinking=True)
+        metrics.incrementar("gepeto_interaction_deferred_total")
+        metrics.registrar_prazo_de_interacao(interaction, "importar_encomendas")
+
+        # Leitura, validação e plano rodam no pool de workers, fora do event loop
+        try:
+            conteudo = await arquivo.read()
+        except discord.HTTPException as e:
+            # Anexo removido ou falha do CDN (NotFound e Forbidden são subclasses)
+            print(f"[IMPORTACAO] Falha ao baixar o anexo '{arquivo.filename}': {e}")
+            await responder(interaction, content="❌ Não foi possível baixar o arquivo. Envie-o de novo.")
+            return
+        try:
+            resultado = await self.bot.workers.executar(
+                snapshot, importar_do_snapshot, conteudo, arquivo.filename, self.bot.estoque.saldos(interaction.guild_id)
+            )
+        except ValueError as e:
+            await interaction.followup.send(f"❌ Não foi possível ler o arquivo: {e}")
+            return
+        except CalculoExcedeuPrazo as e:
+            await interaction.followup.send(f"❌ {e}")
+            return
+
+        if resultado.plano is None:
+            detalhes = "\n".join(resultado.erros[:10])
+            await interaction.followup.send(f"❌ Nenhuma encomenda válida no arquivo.\n```{detalhes or 'Arquivo vazio.'}```")
+            return
+
+        plano = resultado.plano
+        custo_materiais_str = _formatar_valor(plano.custo_min)
+        if round(plano.custo_max) > round(plano.custo_min):
+            custo_materiais_str += f" - {_formatar_valor(plano.custo_max)}"
+        valor_venda_str = _formatar_valor(plano.valor_venda) if plano.valor_venda is not None else "N/A"
+        por_encomenda = "\n".join(
+            f"🔹 {r.pedido}: {_formatar_valor(r.custo_min)}" for r in resultado.pedidos[:15]
+        )
+        if len(resultado.pedidos) > 15:
+            por_encomenda += f"\n... e mais {len(resultado.pedidos) - 15} (ver arquivo)"
+
+        embed = discord.Embed(title='Importação de Encomendas', color=discord.Color.blue())
+        embed.add_field(name='Encomendas', value=f'```{len(resultado.pedidos)}```', inline=True)
+        embed.add_field(name='Linhas ignoradas', value=f'```{resultado.total_erros}```', inline=True)
+        embed.add_field(name='\u200B', value='', inline=False)
+        embed.add_field(name='Custo dos Materiais (plano único)', value=f'```{custo_materiais_str}```', inline=True)
+        embed.add_field(name='Valor Mínimo de Venda', value=f'```{valor_venda_str}```', inline=True)
+        embed.add_field(name='Custo por Encomenda', value=f'```{por_encomenda[:1000]}```', inline=False)
+        embed.set_footer(text=f'Importado por {interaction.user.name} • dados v{snapshot.versao}', icon_url=interaction.user.display_avatar.url)
+
+        relatorio = await asyncio.to_thread(formatar_relatorio, resultado)
+        anexo = discord.File(io.BytesIO(relatorio.encode("utf-8")), filename="plano-importacao.txt")
+        await interaction.followup.send(embed=embed, file=anexo)
 
     @commands.Cog.listener()
     async def on_interaction(self, interaction: discord.Interaction):
@@ -127,93 +412,141 @@ class EncomendaCog(commands.Cog):
             return
 
         custom_id = interaction.data.get('custom_id', '')
+        if custom_id.startswith(PREFIXO_PAGINA) or custom_id == ID_PLANO_COMPLETO:
+            with metrics.medir("gepeto_interaction_seconds", ramo="plano_paginado"):
+                await self._navegar_plano(interaction, custom_id)
+            metrics.registrar_prazo_de_interacao(interaction, "plano_paginado")
+            return
+        if custom_id not in RAMOS_DE_INTERACAO:
+            return
 
-        if custom_id == "botao_encomenda":
-            if not self.api_data:
-                await interaction.response.send_message("❌ Os dados da API não foram carregados.", ephemeral=True)
-                return
+        with metrics.medir("gepeto_interaction_seconds", ramo=custom_id):
+            await self._tratar_interacao(interaction, custom_id)
+        # Com defer, o prazo já foi registrado no momento do defer
+        if interaction.response.type != discord.InteractionResponseType.deferred_message_update:
+            metrics.registrar_prazo_de_interacao(interaction, custom_id)
+
+    async def _navegar_plano(self, interaction: discord.Interaction, custom_id: str):
+        paginado = self._paginado(interaction.message.id)
+        if paginado is None:
+            await interaction.response.send_message("❌ Os detalhes desta encomenda não estão mais disponíveis.", ephemeral=True, delete_after=10)
+            return
+
+        if custom_id == ID_PLANO_COMPLETO:
+            texto = paginado.texto_completo()
+            arquivo = discord.File(io.BytesIO(texto.encode("utf-8")), filename=f"plano-{interaction.message.id}.txt")
+            await interaction.response.send_message(file=arquivo, ephemeral=True)
+            return
 
-            allowed_roles_ids = self.api_data.get('permission', [])
-            user_roles_ids = {str(role.id) for role in interaction.user.roles}
-            if user_roles_ids.isdisjoint(allowed_roles_ids):
-                await interaction.response.send_message("❌ Você não tem permissão.", ephemeral=True, delete_after=5)
+        try:
+            pagina = int(custom_id[len(PREFIXO_PAGINA):])
+        except ValueError:
+            await interaction.response.defer()
+            return
+        pagina = max(0, min(pagina, paginado.total - 1))
+        await interaction.response.edit_message(embed=paginado.pagina(pagina), view=PlanoPaginadoView(pagina, paginado.total))
+
+    async def _tratar_interacao(self, interaction: discord.Interaction, custom_id: str):
+        if custom_id == "botao_encomenda":
+            snapshot = await _snapshot_verificado(self.particoes, interaction)
+            if snapshot is None:
                 return
 
-            receitas = self.api_data.get("receitas_crafting", {})
-            precos = self.api_data.get("precos", {})
-            view = ProdutoDropdownView(self.bot, self.button_data, receitas, precos)
+            view = ProdutoDropdownView(self.bot, self.button_data.namespace(interaction.guild_id), snapshot)
             await interaction.response.send_message("🛠️ Selecione os produtos que deseja encomendar:", view=view, ephemeral=True)
             return
 
         if custom_id in ["confirmar_encomenda", "cancelar_encomenda"]:
             message_id = interaction.message.id
-            data = self.button_data.get(message_id)
-            if not data: return
-
-            if custom_id == "confirmar_encomenda":
-                guild = self.bot.get_guild(ID_GUILD)
-                public_channel = guild.get_channel(ID_CANAL_PUBLICO)
-
-                name, pombo, produtos_list, prazo, preco_min_str = data.get('name'), data.get('pombo'), data.get('produtos', []), data.get('prazo'), data.get('venda')
-
-                receitas = self.api_data.get('receitas_crafting', {})
-                precos = self.api_data.get('precos', {})
-
-                # 1. Calcular os materiais brutos para o custo
-                materiais_brutos_para_custo = calcular_materiais_para_lista(produtos_list, receitas)
-                custo_total = calcular_custo_de_materiais(materiais_brutos_para_custo, precos)
-                custo_materiais_str = f"$ {custo_total:.0f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-                # 2. Preparar a lista de materiais para exibição
-                materiais_para_exibir = calcular_materiais_para_lista(produtos_list, receitas)
-                necessidades_intermediarios = calcular_necessidades_intermediarios(produtos_list, receitas)
-                if 'Farelo de Minério' in necessidades_intermediarios:
-                    materiais_para_exibir['Farelo de Minério'] = necessidades_intermediarios['Farelo de Minério']
-
-                # 3. Obter o craft_size das configurações
-                craft_size = self.api_data.get('settings', {}).get('craft-size', 300)
-
-                # 4. Gerar o embed
-                produtos_str = "\n".join([f"🔹 {p['name']}: {p['quantity']}" for p in produtos_list])
-
-                public_embed = discord.Embed(title='Nova Encomenda Confirmada!', color=discord.Color.green())
-                public_embed.add_field(name='Nome', value=f'```{name}```', inline=False)
-                public_embed.add_field(name='Pombo', value=f'```{pombo}```', inline=False)
-                public_embed.add_field(name='Prazo', value=f'```{prazo}```', inline=False)
-                public_embed.add_field(name='Valor Mínimo de Venda', value=f'```{preco_min_str}```', inline=True)
-                public_embed.add_field(name='Custo dos Materiais', value=f'```{custo_materiais_str}```', inline=True)
-                public_embed.add_field(name='\u200B', value='', inline=False)
-                public_embed.set_footer(text=f'Encomenda criada por {interaction.user.name}', icon_url=interaction.user.display_avatar.url)
-
-                public_embed.add_field(name='Produtos', value=f'```{produtos_str}```', inline=False)
-                materiais_formatados_str = "\n".join([f"🔹 {item}: {math.ceil(quant)}" for item, quant in sorted(materiais_para_exibir.items())])
-                if materiais_formatados_str:
-                    public_embed.add_field(name='Materiais Necessários (Total)', value=f"```{materiais_formatados_str}```", inline=False)
-                    public_embed.add_field(name='\u200B', value='', inline=False)
-
-                blocos_rateio = gerar_blocos_de_rateio_para_lista(produtos_list, receitas, craft_size)
-                craft_size = self.api_data.get('settings', {}).get('craft-size', 300)
-                blocos_rateio = gerar_blocos_de_rateio_para_lista(produtos_list, receitas, craft_size)
-
-                for i, (titulo, conteudo) in enumerate(blocos_rateio[:23]):
-                    if len(conteudo) > 1024:
-                        partes = dividir_em_blocos(conteudo)
-                        for j, parte in enumerate(partes):
-                            titulo_parte = titulo if j == 0 else f"{titulo} (cont.)"
-                            public_embed.add_field(name=titulo_parte, value=f"```{parte}```", inline=False)
-                    else:
-                        public_embed.add_field(name=titulo, value=f"```{conteudo}```", inline=False)
-
-                if len(blocos_rateio) > 23:
-                    print("[WARNING] Rateio truncado por exceder limite de campos do embed.")
-
-                pubic_message = await public_channel.send(embed=public_embed)
-                public_message_link = f"https://discord.com/channels/{ID_GUILD}/{ID_CANAL_PUBLICO}/{pubic_message.id}"
-
-                confirm_embed = discord.Embed(title='Encomenda Confirmada!', color=discord.Color.green())
-                confirm_embed.add_field(name='', value=f"✅ [Clique aqui para ver os detalhes]({public_message_link})")
-                await interaction.response.edit_message(embed=confirm_embed, view=None)
+            pendentes = self.button_data.namespace(interaction.guild_id)
+            if message_id in self._em_andamento:
+                await interaction.response.send_message("⏳ Esta encomenda já está sendo processada.", ephemeral=True, delete_after=10)
+                return
+            data = pendentes.get(message_id)
+            if not data:
+                await interaction.response.send_message("❌ Esta encomenda expirou. Crie uma nova encomenda.", ephemeral=True, delete_after=10)
+                return
 
-            elif custom_id == "cancelar_encomenda":
-                cancel_embed = discord.Embed(title='Encomenda Cancelada', color=discord.Color.red())
-                await interaction.response.edit_message(embed=cancel_embed, view=None)
+            # A entrada fica no store (e sobrevive a um restart) até a confirmação terminar;
+            # um segundo clique enquanto isso é recusado acima
+            self._em_andamento.add(message_id)
+            try:
+                if custom_id == "confirmar_encomenda":
+                    await self._confirmar_encomenda(interaction, pendentes, message_id, data)
+                else:
+                    pendentes.pop(message_id)
+                    cancel_embed = discord.Embed(title='Encomenda Cancelada', color=discord.Color.red())
+                    await interaction.response.edit_message(embed=cancel_embed, view=None)
+            finally:
+                self._em_andamento.discard(message_id)
+
+    async def _confirmar_encomenda(self, interaction, pendentes, message_id, data):
+        """
+        Confirma a encomenda pendente: baixa o estoque, enfileira a publicação
+        e grava o histórico. Se qualquer passo falhar (cálculo, pool, SQLite),
+        os anteriores são desfeitos e a encomenda continua pendente, para que o
+        usuário possa confirmar de novo.
+        """
+        name, pombo, prazo, preco_min_str = data.get('name'), data.get('pombo'), data.get('prazo'), data.get('venda')
+
+        # O plano já foi calculado no envio do modal; aqui ele só é renderizado
+        try:
+            plano = await self._plano_da_encomenda(interaction, data)
+        except CalculoExcedeuPrazo as e:
+            await responder(interaction, content=f"❌ {e}", ephemeral=True)
+            return
+        except Exception as e:
+            print(f"[ENCOMENDAS] Falha ao calcular o plano da encomenda {message_id}: {e!r}")
+            await responder(interaction, content="❌ Não foi possível calcular a encomenda. Tente confirmar de novo.", ephemeral=True)
+            return
+
+        # A mensagem pública é paginada; só a página de resumo é renderizada agora
+        entrada = {
+            'name': name,
+            'pombo': pombo,
+            'prazo': prazo,
+            'venda': preco_min_str,
+            'criado_por': interaction.user.name,
+            'avatar': interaction.user.display_avatar.url,
+            'plano': plano.para_dict(),
+        }
+        # A publicação vai para a fila de saída; o publicador envia e edita esta mensagem com o link
+        chave = f"encomenda:{message_id}"
+        estoque = self.bot.estoque.namespace(interaction.guild_id)
+        motivo = f"encomenda {message_id}"
+        # Os três registros acontecem em seguida, sem await no meio: o publicador não vê a
+        # publicação antes de o histórico ser gravado (ou de ela ser retirada da fila)
+        try:
+            estoque.registrar_encomenda(plano.consumo_estoque, plano.sobras, motivo)
+            try:
+                config = self.particoes.config(interaction.guild_id)
+                self.bot.outbox.enfileirar(chave, config.canal_publico, entrada)
+                try:
+                    self.bot.historico.registrar(
+                        plano, interaction.guild_id, message_id, criado_por=interaction.user.name, nome=name, prazo=prazo
+                    )
+                except Exception:
+                    self.bot.outbox.cancelar(chave)
+                    raise
+            except Exception:
+                # Devolve o que foi consumido e retira as sobras lançadas
+                estoque.registrar_encomenda(plano.sobras, plano.consumo_estoque, f"estorno da {motivo}")
+                raise
+        except Exception as e:
+            print(f"[ENCOMENDAS] Falha ao registrar a encomenda {message_id}: {e!r}")
+            await responder(interaction, content="❌ Não foi possível registrar a encomenda. Tente confirmar de novo.", ephemeral=True)
+            return
+        pendentes.pop(message_id)
+
+        respondida = asyncio.Event()
+        self._confirmacoes[chave] = (interaction, respondida)
+        confirm_embed = discord.Embed(title='Encomenda Confirmada!', color=discord.Color.green())
+        confirm_embed.add_field(name='', value="⏳ Publicando no canal de encomendas...")
+        try:
+            if interaction.response.is_done():
+                await interaction.edit_original_response(embed=confirm_embed, view=None)
+            else:
+                await interaction.response.edit_message(embed=confirm_embed, view=None)
+        finally:
+            respondida.set()
+            self.publicador.avisar()
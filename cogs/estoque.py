@@ -0,0 +1,106 @@
+import io
+import discord
+from discord import app_commands
+from discord.ext import commands
+from .encomendas import _snapshot_verificado
+
+def _pode_alterar_estoque(interaction):
+    # Permissões resolvidas que vêm no payload da interação (sem depender do cache de membros)
+    permissoes = interaction.permissions
+    return permissoes.manage_guild or permissoes.administrator
+
+
+class EstoqueCog(commands.Cog):
+    """
+    Comandos para consultar e corrigir o livro de estoque.
+
+    Cada guild vê e altera só o próprio estoque, o mesmo que as encomendas
+    dela consomem e repõem. Consultar exige a permissão de encomendas da
+    guild; ajustar e definir saldos exige também "Gerenciar Servidor".
+    """
+
+    estoque = app_commands.Group(name="estoque", description="Consulta e ajuste do estoque de itens.")
+
+    def __init__(self, bot: commands.Bot, particoes, ledger):
+        self.bot = bot
+        self.particoes = particoes
+        self.ledger = ledger
+
+    async def _verificar(self, interaction: discord.Interaction):
+        return await _snapshot_verificado(self.particoes, interaction)
+
+    async def _verificar_gerente(self, interaction: discord.Interaction):
+        """Como `_verificar`, mas só para quem pode gerenciar a guild."""
+        snapshot = await self._verificar(interaction)
+        if snapshot is None:
+            return None
+        if not _pode_alterar_estoque(interaction):
+            await interaction.response.send_message(
+                "❌ Só quem pode gerenciar o servidor altera o estoque.", ephemeral=True, delete_after=5
+            )
+            return None
+        return snapshot
+
+    def _nome_do_item(self, snapshot, item):
+        """Nome canônico do item (sem diferenciar maiúsculas), ou None se ele não existe nas receitas."""
+        item = item.strip()
+        if item in snapshot.grafo.posicao:
+            return item
+        procurado = item.casefold()
+        return next((nome for nome in snapshot.grafo.posicao if nome.casefold() == procurado), None)
+
+    async def _autocompletar_item(self, interaction: discord.Interaction, atual: str):
+        snapshot = self.particoes.catalogo(interaction.guild_id)
+        if snapshot is None:
+            return []
+        procurado = atual.casefold()
+        nomes = sorted(nome for nome in snapshot.grafo.posicao if procurado in nome.casefold())
+        return [app_commands.Choice(name=nome, value=nome) for nome in nomes[:25]]
+
+    @estoque.command(name="ver", description="Mostra o saldo atual de todos os itens em estoque.")
+    async def ver(self, interaction: discord.Interaction):
+        if await self._verificar(interaction) is None:
+            return
+        saldos = self.ledger.saldos(interaction.guild_id)
+        if not saldos:
+            await interaction.response.send_message("📦 O estoque está vazio.", ephemeral=True)
+            return
+
+        texto = "\n".join(f"{item[:32]:<32} {quantidade:>10.0f}" for item, quantidade in sorted(saldos.items()))
+        if len(texto) + 6 <= 4096:
+            embed = discord.Embed(title="Estoque", description=f"```{texto}```", color=discord.Color.blue())
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        else:
+            arquivo = discord.File(io.BytesIO(texto.encode("utf-8")), filename="estoque.txt")
+            await interaction.response.send_message("📦 Estoque", file=arquivo, ephemeral=True)
+
+    @estoque.command(name="ajustar", description="Soma (ou subtrai, com valor negativo) uma quantidade ao saldo de um item.")
+    @app_commands.describe(item="Item do estoque", quantidade="Quantidade a somar; use negativo para retirar")
+    async def ajustar(self, interaction: discord.Interaction, item: str, quantidade: int):
+        snapshot = await self._verificar_gerente(interaction)
+        if snapshot is None:
+            return
+        nome = self._nome_do_item(snapshot, item)
+        if nome is None:
+            await interaction.response.send_message(f"❌ Item '{item}' não existe nas receitas.", ephemeral=True)
+            return
+
+        saldo = self.ledger.namespace(interaction.guild_id).ajustar(nome, quantidade, f"ajuste por {interaction.user.name}")
+        await interaction.response.send_message(f"📦 {nome}: {quantidade:+d} → saldo {saldo:.0f}", ephemeral=True)
+
+    @estoque.command(name="definir", description="Define o saldo de um item (ex.: após uma contagem).")
+    @app_commands.describe(item="Item do estoque", quantidade="Novo saldo do item")
+    async def definir(self, interaction: discord.Interaction, item: str, quantidade: app_commands.Range[int, 0]):
+        snapshot = await self._verificar_gerente(interaction)
+        if snapshot is None:
+            return
+        nome = self._nome_do_item(snapshot, item)
+        if nome is None:
+            await interaction.response.send_message(f"❌ Item '{item}' não existe nas receitas.", ephemeral=True)
+            return
+
+        saldo = self.ledger.namespace(interaction.guild_id).definir(nome, quantidade, f"contagem por {interaction.user.name}")
+        await interaction.response.send_message(f"📦 {nome}: saldo {saldo:.0f}", ephemeral=True)
+
+    ajustar.autocomplete("item")(_autocompletar_item)
+    definir.autocomplete("item")(_autocompletar_item)
@@ -0,0 +1,317 @@
+"""
+Importação de encomendas em lote a partir de um arquivo CSV, JSON ou JSON Lines.
+
+Todas as encomendas do arquivo viram um único plano de produção: os
+intermediários compartilhados são fabricados uma vez e o desperdício de
+`ceil(qtd / produz)` é pago uma vez no total, não uma vez por encomenda.
+Cada encomenda recebe a sua parte do custo pelo custo unitário das
+matérias-primas, sem arredondamento; a diferença para o plano conjunto é o
+arredondamento.
+
+Formatos aceitos (uma linha por produto, agrupadas pela coluna `pedido`):
+    CSV:        pedido,produto,quantidade
+    JSON(L):    {"pedido": "...", "produto": "...", "quantidade": 10}
+    JSON:       [{"pedido": "...", "produtos": [{"name": "...", "quantity": 10}]}, ...]
+
+Cada encomenda e o arquivo inteiro respeitam `MAX_QUANTIDADE_TOTAL`, o mesmo
+limite do modal; as linhas que passariam dele são ignoradas e listadas.
+Arquivos maiores que `MAX_BYTES_ARQUIVO` são recusados antes da leitura.
+
+JSON Lines é lido linha a linha e a lista de um JSON, um registro por vez:
+nenhum dos dois monta a árvore do arquivo inteiro. Um `.json` com um objeto
+por linha é lido como JSON Lines.
+"""
+import codecs
+import csv
+import io
+import itertools
+import json
+import math
+from collections import OrderedDict, defaultdict, namedtuple
+
+import metrics
+
+from .order_plan import MAX_QUANTIDADE_TOTAL, planejar_encomenda
+from .scheduler import formatar_duracao, formatar_linha_do_tempo
+
+# Limite de mensagens de erro guardadas (o total continua sendo contado)
+MAX_ERROS_LISTADOS = 50
+
+# Tamanho máximo do arquivo importado
+MAX_BYTES_ARQUIVO = 5 * 1024 * 1024
+
+COLUNAS_PEDIDO = ("pedido", "encomenda", "cliente", "order")
+COLUNAS_PRODUTO = ("produto", "name", "item", "nome")
+COLUNAS_QUANTIDADE = ("quantidade", "quantity", "qtd")
+
+ResumoPedido = namedtuple("ResumoPedido", ["pedido", "produtos", "custo_min", "custo_max", "valor_venda"])
+ResultadoImportacao = namedtuple(
+    "ResultadoImportacao", ["plano", "pedidos", "erros", "total_erros", "linhas_lidas"]
+)
+
+
+def _campo(registro, nomes):
+    for nome in nomes:
+        if nome in registro and registro[nome] not in (None, ""):
+            return registro[nome]
+    return None
+
+
+def _linhas_csv(conteudo):
+    texto = io.TextIOWrapper(io.BytesIO(conteudo), encoding="utf-8-sig", newline="")
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(texto, dialect=dialeto)
+    leitor.fieldnames = [(coluna or "").strip().lower() for coluna in leitor.fieldnames or []]
+    for registro in leitor:
+        yield leitor.line_num, registro
+
+
+def _pular_espacos(texto, pos):
+    while pos < len(texto) and texto[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+
+def _registros_da_lista(texto, pos, decodificador):
+    """Decodifica a lista que começa em `texto[pos]` um elemento por vez."""
+    pos = _pular_espacos(texto, pos + 1)
+    if texto.startswith("]", pos):
+        return _pular_espacos(texto, pos + 1)
+    while True:
+        registro, pos = decodificador.raw_decode(texto, pos)
+        yield registro
+        pos = _pular_espacos(texto, pos)
+        if texto.startswith(",", pos):
+            pos = _pular_espacos(texto, pos + 1)
+        elif texto.startswith("]", pos):
+            return _pular_espacos(texto, pos + 1)
+        else:
+            raise ValueError(f"JSON inválido: esperado ',' ou ']' na posição {pos}.")
+
+
+class _JsonLines(Exception):
+    """O `.json` tem mais de um valor: é JSON Lines."""
+
+
+def _registros_json(texto):
+    """Encomendas do JSON: a lista é decodificada um elemento por vez."""
+    decodificador = json.JSONDecoder()
+    pos = _pular_espacos(texto, 0)
+    if texto.startswith("[", pos):
+        fim = yield from _registros_da_lista(texto, pos, decodificador)
+        if fim < len(texto):
+            raise ValueError(f"JSON inválido: conteúdo extra na posição {fim}.")
+        return
+    dados, fim = decodificador.raw_decode(texto, pos)
+    if _pular_espacos(texto, fim) < len(texto):
+        raise _JsonLines()
+    if isinstance(dados, dict):
+        dados = dados.get("encomendas", [dados])
+    if not isinstance(dados, list):
+        raise ValueError("o JSON deve ser uma lista de encomendas (ou um objeto com a chave 'encomendas').")
+    yield from dados
+
+
+def _linhas_json(conteudo):
+    registros = _registros_json(codecs.decode(conteudo, "utf-8-sig"))
+    try:
+        primeiro = next(registros)
+    except StopIteration:
+        return
+    except _JsonLines:
+        yield from _linhas_jsonl(io.BytesIO(conteudo))
+        return
+    registros = itertools.chain((primeiro,), registros)
+    for i, registro in enumerate(registros, start=1):
+        if not isinstance(registro, dict):
+            yield i, {}
+            continue
+        produtos = registro.get("produtos")
+        if produtos is None:
+            yield i, registro
+            continue
+        if not isinstance(produtos, list):
+            raise ValueError(f"encomenda {i}: 'produtos' deve ser uma lista.")
+        pedido = _campo(registro, COLUNAS_PEDIDO) or f"#{i}"
+        for produto in produtos:
+            if not isinstance(produto, dict):
+                raise ValueError(f"encomenda {i}: cada produto deve ser um objeto com nome e quantidade.")
+            yield i, {"pedido": pedido, **produto}
+
+
+def _linhas_jsonl(arquivo):
+    """Um registro por linha de `arquivo` (binário), sem ler o arquivo inteiro de uma vez."""
+    for i, linha in enumerate(io.TextIOWrapper(arquivo, encoding="utf-8-sig"), start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            registro = {}
+        yield i, registro if isinstance(registro, dict) else {}
+
+
+def _custos_brutos_unitarios(grafo, precos):
+    """
+    Custo (mínimo, máximo) das matérias-primas de uma unidade de cada item,
+    sem `ceil`, com a mesma regra de `calcular_faixa_de_custo` (tudo expandido).
+    """
+    custos = {}
+    for item in reversed(grafo.ordem):
+        if item not in grafo.produz:
+            custos[item] = precos.custo_materia_prima(item)
+            continue
+        produz = grafo.produz[item]
+        custo_min = custo_max = 0.0
+        for nome_material, quantidade in grafo.arestas[item]:
+            material_min, material_max = custos[nome_material]
+            custo_min += material_min * quantidade / produz
+            custo_max += material_max * quantidade / produz
+        custos[item] = (custo_min, custo_max)
+    return custos
+
+
+def ler_linhas(conteudo, nome_arquivo):
+    """Gera `(numero_da_linha, registro)` a partir do conteúdo do anexo, conforme a extensão."""
+    if len(conteudo) > MAX_BYTES_ARQUIVO:
+        raise ValueError(f"arquivo muito grande (máximo de {MAX_BYTES_ARQUIVO // (1024 * 1024)} MB).")
+    extensao = nome_arquivo.rsplit(".", 1)[-1].lower() if "." in nome_arquivo else ""
+    if extensao in ("jsonl", "ndjson"):
+        return _linhas_jsonl(io.BytesIO(conteudo))
+    if extensao == "json":
+        return _linhas_json(conteudo)
+    return _linhas_csv(conteudo)
+
+
+@metrics.cronometrado("gepeto_calculo_seconds")
+def importar_encomendas(conteudo, nome_arquivo, snapshot, estoque=None):
+    """
+    Lê as encomendas do arquivo, valida os produtos contra `receitas_crafting`
+    e calcula um único plano de produção para todas elas, abatendo `estoque`
+    (sem baixá-lo: a importação é só um plano). Levanta ValueError se o
+    arquivo não tiver o formato esperado.
+    Roda fora do event loop, no pool de workers (ver `importar_do_snapshot`).
+    """
+    grafo, precos = snapshot.grafo, snapshot.precos
+    nomes_validos = {nome.casefold(): nome for nome in grafo.produz}
+
+    pedidos = OrderedDict()
+    quantidade_por_pedido = defaultdict(int)
+    quantidade_importada = 0
+    limite = f"{MAX_QUANTIDADE_TOTAL:,}".replace(",", ".")
+    erros = []
+    total_erros = 0
+    linhas_lidas = 0
+
+    def erro(linha, mensagem):
+        nonlocal total_erros
+        total_erros += 1
+        if len(erros) < MAX_ERROS_LISTADOS:
+            erros.append(f"Linha {linha}: {mensagem}")
+
+    for linha, registro in ler_linhas(conteudo, nome_arquivo):
+        linhas_lidas += 1
+        registro = {str(chave).strip().lower(): valor for chave, valor in registro.items()}
+        pedido = _campo(registro, COLUNAS_PEDIDO)
+        produto = _campo(registro, COLUNAS_PRODUTO)
+        quantidade = _campo(registro, COLUNAS_QUANTIDADE)
+        if pedido is None or produto is None or quantidade is None:
+            erro(linha, "esperado pedido, produto e quantidade.")
+            continue
+
+        nome = nomes_validos.get(str(produto).strip().casefold())
+        if nome is None:
+            erro(linha, f"produto '{produto}' não existe nas receitas.")
+            continue
+        try:
+            quantidade = int(str(quantidade).strip())
+        except ValueError:
+            erro(linha, f"quantidade inválida '{quantidade}'.")
+            continue
+        if quantidade <= 0:
+            erro(linha, "quantidade deve ser maior que zero.")
+            continue
+
+        pedido = str(pedido).strip()
+        if quantidade_por_pedido[pedido] + quantidade > MAX_QUANTIDADE_TOTAL:
+            erro(linha, f"encomenda '{pedido}' passaria do limite de {limite} unidades.")
+            continue
+        if quantidade_importada + quantidade > MAX_QUANTIDADE_TOTAL:
+            erro(linha, f"o arquivo passaria do limite de {limite} unidades no total.")
+            continue
+        quantidade_por_pedido[pedido] += quantidade
+        quantidade_importada += quantidade
+        pedidos.setdefault(pedido, defaultdict(int))[nome] += quantidade
+
+    if not pedidos:
+        return ResultadoImportacao(None, [], erros, total_erros, linhas_lidas)
+
+    custos_unitarios = _custos_brutos_unitarios(grafo, precos)
+    total = defaultdict(int)
+    resumos = []
+    for pedido, produtos in pedidos.items():
+        custo_min = custo_max = 0.0
+        valor_venda = None
+        for nome, quantidade in produtos.items():
+            total[nome] += quantidade
+            unitario_min, unitario_max = custos_unitarios[nome]
+            custo_min += unitario_min * quantidade
+            custo_max += unitario_max * quantidade
+            preco = precos.get(nome)
+            if preco is not None and preco.min is not None:
+                valor_venda = (valor_venda or 0) + round(quantidade * preco.min, 2)
+        resumos.append(ResumoPedido(pedido, tuple(produtos.items()), custo_min, custo_max, valor_venda))
+
+    produtos_list = [{'name': nome, 'quantity': quantidade} for nome, quantidade in total.items()]
+    plano = planejar_encomenda(
+        produtos_list, grafo, precos, snapshot.craft_size, snapshot.versao, snapshot.estacoes, estoque
+    )
+    return ResultadoImportacao(plano, resumos, erros, total_erros, linhas_lidas)
+
+
+def importar_do_snapshot(snapshot, conteudo, nome_arquivo, estoque=None):
+    """`importar_encomendas` com o snapshot primeiro, na forma que o `WorkerPool` chama."""
+    return importar_encomendas(conteudo, nome_arquivo, snapshot, estoque)
+
+
+def formatar_relatorio(resultado):
+    """Relatório completo em texto: totais, parte de cada encomenda, materiais e rateio."""
+    plano = resultado.plano
+    soma_min = sum(r.custo_min for r in resultado.pedidos)
+    linhas = [
+        f"Encomendas: {len(resultado.pedidos)}  |  Linhas lidas: {resultado.linhas_lidas}  |  Erros: {resultado.total_erros}",
+        f"Custo total dos materiais: $ {plano.custo_min:.2f} - $ {plano.custo_max:.2f}",
+        (f"Arredondamento de crafts menos estoque usado: $ {plano.custo_min - soma_min:.2f}" if plano.consumo_estoque
+         else f"Arredondamento de crafts (pago uma vez): $ {plano.custo_min - soma_min:.2f}"),
+        f"Tempo estimado de produção: {formatar_duracao(plano.cronograma.duracao_total)}",
+        "",
+        f"{'Encomenda':<30} {'Custo (min-max)':>21} {'Venda':>12}",
+    ]
+    for resumo in resultado.pedidos:
+        custo = f"{resumo.custo_min:.2f}-{resumo.custo_max:.2f}"
+        venda = f"{resumo.valor_venda:.2f}" if resumo.valor_venda is not None else "N/A"
+        linhas.append(f"{resumo.pedido[:30]:<30} {custo:>21} {venda:>12}")
+        linhas.extend(f"    {nome}: {quantidade}" for nome, quantidade in resumo.produtos)
+
+    if plano.consumo_estoque:
+        linhas += ["", "Usado do estoque:"]
+        linhas.extend(f"    {item}: {qtd:.0f}" for item, qtd in sorted(plano.consumo_estoque.items()))
+
+    linhas += ["", "Materiais necessários (total):"]
+    linhas.extend(f"    {item}: {math.ceil(qtd)}" for item, qtd in sorted(plano.materiais_exibicao.items()))
+    for titulo, conteudo in plano.blocos_rateio:
+        linhas += ["", titulo, conteudo]
+    if plano.cronograma.duracao_total:
+        linhas += ["", "Linha do tempo:", formatar_linha_do_tempo(plano.cronograma)]
+
+    if resultado.erros:
+        linhas += ["", "Linhas ignoradas:"]
+        linhas.extend(f"    {mensagem}" for mensagem in resultado.erros)
+        if resultado.total_erros > len(resultado.erros):
+            linhas.append(f"    ... e mais {resultado.total_erros - len(resultado.erros)}")
+    return "\n".join(linhas)
@@ -0,0 +1,127 @@
+"""
+Empacotamento dos crafts de uma encomenda em solicitações de craft.
+
+Uma solicitação comporta até `craft_size` unidades de material; cada craft de
+um item ocupa a soma das quantidades dos seus materiais. Itens da mesma etapa
+(mesmo nível de dependência: a maior distância até uma matéria-prima) não
+dependem uns dos outros e podem dividir uma solicitação; um item só entra em
+uma etapa depois de todos os seus materiais craftáveis.
+
+Dentro de cada etapa os crafts são empacotados por First Fit Decreasing: os
+itens de maior peso por craft entram primeiro, e cada item completa o espaço
+livre das solicitações já abertas antes de abrir novas. Solicitações
+idênticas são agrupadas (`repeticoes`), então o custo depende do número de
+itens, não do número de crafts. O resultado nunca usa mais solicitações do
+que lotes separados por item (`calcular_lotes`).
+"""
+import math
+from collections import defaultdict, namedtuple
+
+# crafts: ((item, crafts por solicitação), ...); carga: unidades de material por solicitação
+Solicitacao = namedtuple("Solicitacao", ["crafts", "repeticoes", "carga"])
+# itens: ((item, crafts no total), ...) na etapa, em ordem de nome
+Etapa = namedtuple("Etapa", ["nivel", "itens", "solicitacoes"])
+
+
+def peso_do_craft(grafo, item):
+    """Unidades de material que um craft do item ocupa na solicitação."""
+    return sum(quantidade for _, quantidade in grafo.arestas[item])
+
+
+def _empacotar(crafts, pesos, capacidade):
+    # Grupos de solicitações idênticas: [conteúdo (item -> crafts), repetições, capacidade livre, carga]
+    grupos = []
+    # Grupos em que ainda cabe o craft mais leve da etapa; os que fecham saem da lista aos poucos
+    menor_peso = min((peso for peso in pesos.values() if peso > 0), default=0)
+    abertos = []
+    fechados = 0
+    for item in sorted(crafts, key=lambda nome: (-pesos[nome], nome)):
+        restante, peso = crafts[item], pesos[item]
+        if peso == 0:
+            # Não ocupa capacidade: vai inteiro na primeira solicitação da etapa
+            primeiro = next((grupo for grupo in grupos if grupo[1]), None)
+            if primeiro is None:
+                grupos.append([{item: restante}, 1, capacidade, 0])
+                continue
+            if primeiro[1] > 1:
+                # Só uma das solicitações repetidas recebe o item
+                primeiro[1] -= 1
+                primeiro = [dict(primeiro[0]), 1, primeiro[2], primeiro[3]]
+                grupos.append(primeiro)
+            primeiro[0][item] = restante
+            continue
+
+        novos = []
+        for grupo in abertos:
+            livre = grupo[2]
+            if livre < peso:
+                continue
+            conteudo, repeticoes, _, carga = grupo
+            cabe = livre // peso
+            if restante >= cabe * repeticoes:
+                conteudo[item] = cabe
+                grupo[2] = livre - cabe * peso
+                grupo[3] = carga + cabe * peso
+                restante -= cabe * repeticoes
+                if grupo[2] < menor_peso:
+                    fechados += 1
+            else:
+                # Não dá para completar o grupo todo: parte dele recebe o item e o resto fica como estava
+                cheias, parcial = divmod(restante, cabe)
+                grupo[1] = repeticoes - cheias - (1 if parcial else 0)
+                if cheias:
+                    novos.append([{**conteudo, item: cabe}, cheias, livre - cabe * peso, carga + cabe * peso])
+                if parcial:
+                    novos.append([{**conteudo, item: parcial}, 1, livre - parcial * peso, carga + parcial * peso])
+                restante = 0
+                if not grupo[1]:
+                    # Vazio: a capacidade negativa faz a busca pular o grupo até ele sair da lista
+                    grupo[2] = -1
+                    fechados += 1
+            if not restante:
+                break
+
+        if restante:
+            # Um craft maior que a capacidade ainda é solicitado sozinho, um por vez
+            por_vez = max(1, capacidade // peso)
+            cheias, parcial = divmod(restante, por_vez)
+            if cheias:
+                novos.append([{item: por_vez}, cheias, max(0, capacidade - por_vez * peso), por_vez * peso])
+            if parcial:
+                novos.append([{item: parcial}, 1, max(0, capacidade - parcial * peso), parcial * peso])
+
+        if novos:
+            grupos += novos
+            abertos += [grupo for grupo in novos if grupo[2] >= menor_peso]
+        if fechados * 2 > len(abertos):
+            abertos = [grupo for grupo in abertos if grupo[2] >= menor_peso]
+            fechados = 0
+
+    return tuple(
+        Solicitacao(tuple(conteudo.items()), repeticoes, carga)
+        for conteudo, repeticoes, _, carga in grupos if repeticoes
+    )
+
+
+def empacotar_lotes(necessidades, grafo, craft_size):
+    """
+    Solicitações de craft de todos os intermediários de `necessidades`
+    (item -> demanda), agrupadas por etapa. Retorna uma tupla de `Etapa`
+    em ordem de execução.
+    """
+    niveis = grafo.niveis
+    por_nivel = defaultdict(dict)
+    for item, demanda in necessidades.items():
+        if item in grafo.produz and demanda > 0:
+            por_nivel[niveis[item]][item] = math.ceil(math.ceil(demanda) / grafo.produz[item])
+
+    etapas = []
+    for nivel in sorted(por_nivel):
+        da_etapa = por_nivel[nivel]
+        pesos = {item: peso_do_craft(grafo, item) for item in da_etapa}
+        etapas.append(Etapa(nivel, tuple(sorted(da_etapa.items())), _empacotar(da_etapa, pesos, craft_size)))
+    return tuple(etapas)
+
+
+def total_de_solicitacoes(etapas):
+    return sum(s.repeticoes for etapa in etapas for s in etapa.solicitacoes)
@@ -0,0 +1,140 @@
+"""
+Plano de produção de uma encomenda, calculado uma única vez no envio do modal.
+
+O `OrderPlan` é guardado junto com a encomenda pendente e apenas renderizado
+na confirmação, então a prévia e o embed publicado sempre usam os mesmos números.
+"""
+from dataclasses import dataclass, field
+
+import metrics
+
+from .calculator import calcular_faixa_de_custo
+from .lot_packing import empacotar_lotes
+from .price_index import PriceIndex
+from .rateio import gerar_blocos_de_rateio_para_lista
+from .scheduler import Cronograma, agendar_producao
+
+# Intermediários que também aparecem na lista de "Materiais Necessários"
+INTERMEDIARIOS_EXIBIDOS = ("Farelo de Minério",)
+
+# Soma das quantidades aceita em uma encomenda (e em uma importação inteira);
+# acima disso o cálculo nem é tentado
+MAX_QUANTIDADE_TOTAL = 1_000_000
+
+
+@dataclass(frozen=True)
+class OrderPlan:
+    produtos: tuple         # ((nome, quantidade), ...)
+    materiais_brutos: dict  # matéria-prima -> quantidade
+    materiais_exibicao: dict
+    intermediarios: dict    # item craftável -> demanda total
+    custo_min: float
+    custo_max: float
+    valor_venda: float      # None se nenhum produto tem preço de venda
+    blocos_rateio: tuple    # ((titulo, conteudo), ...)
+    craft_size: int
+    versao: int = None
+    cronograma: Cronograma = None  # agenda dos lotes nas estações de craft
+    consumo_estoque: dict = field(default_factory=dict)  # item -> quantidade retirada do estoque
+    sobras: dict = field(default_factory=dict)           # item -> excedente que volta para o estoque
+    versao_estoque: int = None
+
+    @property
+    def produtos_list(self):
+        return [{'name': nome, 'quantity': quantidade} for nome, quantidade in self.produtos]
+
+    def para_dict(self):
+        """Forma serializável em JSON, usada pelo store de encomendas pendentes."""
+        return {
+            'produtos': [list(p) for p in self.produtos],
+            'materiais_brutos': self.materiais_brutos,
+            'materiais_exibicao': self.materiais_exibicao,
+            'intermediarios': self.intermediarios,
+            'custo_min': self.custo_min,
+            'custo_max': self.custo_max,
+            'valor_venda': self.valor_venda,
+            'blocos_rateio': [list(b) for b in self.blocos_rateio],
+            'craft_size': self.craft_size,
+            'versao': self.versao,
+            'cronograma': self.cronograma.para_dict() if self.cronograma else None,
+            'consumo_estoque': self.consumo_estoque,
+            'sobras': self.sobras,
+            'versao_estoque': self.versao_estoque,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        return cls(
+            produtos=tuple(tuple(p) for p in dados['produtos']),
+            materiais_brutos=dict(dados['materiais_brutos']),
+            materiais_exibicao=dict(dados['materiais_exibicao']),
+            intermediarios=dict(dados['intermediarios']),
+            custo_min=dados['custo_min'],
+            custo_max=dados['custo_max'],
+            valor_venda=dados['valor_venda'],
+            blocos_rateio=tuple(tuple(b) for b in dados['blocos_rateio']),
+            craft_size=dados['craft_size'],
+            versao=dados.get('versao'),
+            cronograma=Cronograma.de_dict(dados['cronograma']) if dados.get('cronograma') else None,
+            consumo_estoque=dict(dados.get('consumo_estoque') or {}),
+            sobras=dict(dados.get('sobras') or {}),
+            versao_estoque=dados.get('versao_estoque'),
+        )
+
+
+@metrics.cronometrado("gepeto_calculo_seconds")
+def planejar_encomenda(produtos_list, grafo, precos, craft_size, versao=None, estacoes=1,
+                       estoque=None, versao_estoque=None):
+    """
+    Calcula todo o plano da encomenda com uma única expansão do grafo:
+    matérias-primas, intermediários, faixa de custo, valor de venda, rateio
+    e a agenda dos lotes em `estacoes` estações de craft. Com `estoque`, só o
+    que falta é comprado e fabricado.
+    """
+    precos = PriceIndex.de(precos)
+    expansao = grafo.expandir(produtos_list, estoque)
+    custo_min, custo_max = calcular_faixa_de_custo(expansao.brutos, precos)
+
+    valor_venda = None
+    for produto in produtos_list:
+        preco = precos.get(produto['name'])
+        if preco is not None and preco.min is not None:
+            valor_venda = (valor_venda or 0) + round(produto['quantity'] * preco.min, 2)
+
+    materiais_exibicao = dict(expansao.brutos)
+    for item in INTERMEDIARIOS_EXIBIDOS:
+        if item in expansao.intermediarios:
+            materiais_exibicao[item] = expansao.intermediarios[item]
+
+    # O rateio publicado e o cronograma usam as mesmas solicitações de craft
+    etapas = empacotar_lotes(expansao.intermediarios, grafo, craft_size)
+    blocos = gerar_blocos_de_rateio_para_lista(produtos_list, grafo, craft_size, expansao.intermediarios, etapas=etapas)
+    cronograma = agendar_producao(expansao.intermediarios, grafo, craft_size, estacoes, etapas=etapas)
+
+    return OrderPlan(
+        produtos=tuple((p['name'], p['quantity']) for p in produtos_list),
+        materiais_brutos=dict(expansao.brutos),
+        materiais_exibicao=materiais_exibicao,
+        intermediarios=dict(expansao.intermediarios),
+        custo_min=custo_min,
+        custo_max=custo_max,
+        valor_venda=valor_venda,
+        blocos_rateio=tuple(blocos),
+        craft_size=craft_size,
+        versao=versao,
+        cronograma=cronograma,
+        consumo_estoque=dict(expansao.consumo),
+        sobras=dict(expansao.sobras),
+        versao_estoque=versao_estoque,
+    )
+
+
+def planejar_do_snapshot(snapshot, produtos_list, estoque=None, versao_estoque=None):
+    """
+    `planejar_encomenda` com os dados de um snapshot. É a função enviada ao
+    `WorkerPool`: recebe o snapshot primeiro e só argumentos serializáveis.
+    """
+    return planejar_encomenda(
+        produtos_list, snapshot.grafo, snapshot.precos, snapshot.craft_size, snapshot.versao,
+        snapshot.estacoes, estoque, versao_estoque
+    )
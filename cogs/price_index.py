@@ -0,0 +1,117 @@
+"""
+Índice de preços achatado, construído uma vez por carga de dados.
+
+Substitui a varredura por categoria de `precos` em cada consulta: cada item
+aponta diretamente para o seu preço mínimo, máximo e a categoria de origem.
+"""
+from collections import namedtuple
+from collections.abc import Mapping
+
+PrecoItem = namedtuple("PrecoItem", ["min", "max", "categoria"])
+
+
+class PriceIndex(Mapping):
+    """
+    Mapping somente-leitura `item -> PrecoItem`.
+
+    Regras de resolução:
+      * categorias são lidas na ordem do JSON e a primeira que contém o item vence;
+      * dentro da categoria, um item em `min` tem mínimo e máximo iguais a esse
+        valor (mesmo que também esteja em `range`); senão `range` fornece os dois;
+      * `fallback` (de `settings.precos-fallback`) mapeia um item de referência para a
+        lista de matérias-primas que usam o seu preço quando não têm preço próprio.
+        Itens de `craftaveis` (os que têm receita) nunca usam o fallback. O fallback
+        só vale em `preco_materia_prima`/`custo_materia_prima`: as consultas gerais
+        (`precos[item]`, `get`, `find_price`) só veem os preços próprios.
+    """
+
+    def __init__(self, precos, fallback=None, craftaveis=()):
+        self._precos = {}
+        # matéria-prima -> item de referência cujo preço ela usa quando não tem preço próprio
+        self.fallbacks = {}
+        self.referencias = frozenset(fallback or ())
+
+        for nome_categoria, categoria in (precos or {}).items():
+            if not isinstance(categoria, dict):
+                continue
+            minimos = categoria.get('min') if isinstance(categoria.get('min'), dict) else {}
+            faixas = categoria.get('range') if isinstance(categoria.get('range'), dict) else {}
+
+            for item in (*minimos, *faixas):
+                if item in self._precos:
+                    continue
+                if item in minimos:
+                    self._precos[item] = PrecoItem(minimos[item], minimos[item], nome_categoria)
+                    continue
+                faixa = faixas[item] if isinstance(faixas[item], dict) else {}
+                preco_min = faixa.get('min')
+                preco_max = faixa.get('max')
+                self._precos[item] = PrecoItem(preco_min, preco_min if preco_max is None else preco_max, nome_categoria)
+
+        for referencia, itens in (fallback or {}).items():
+            for item in itens:
+                if item not in craftaveis:
+                    self.fallbacks.setdefault(item, referencia)
+
+    @classmethod
+    def de(cls, precos, fallback=None, craftaveis=()):
+        """Retorna `precos` se já for um índice, senão constrói um novo."""
+        if isinstance(precos, cls):
+            return precos
+        return cls(precos, fallback, craftaveis)
+
+    def __getitem__(self, item):
+        return self._precos[item]
+
+    def __iter__(self):
+        return iter(self._precos)
+
+    def __len__(self):
+        return len(self._precos)
+
+    def __contains__(self, item):
+        return item in self._precos
+
+    def com_variacoes(self, variacoes, categoria="simulacao"):
+        """
+        Novo índice com os preços informados sobrescritos.
+        `variacoes` mapeia item -> (min, max), ou None para remover o preço.
+        """
+        novo = PriceIndex({})
+        novo._precos = dict(self._precos)
+        novo.fallbacks, novo.referencias = self.fallbacks, self.referencias
+        for item, faixa in variacoes.items():
+            if faixa is None:
+                novo._precos.pop(item, None)
+            else:
+                preco_min, preco_max = faixa
+                novo._precos[item] = PrecoItem(preco_min, preco_max if preco_max is not None else preco_min, categoria)
+        return novo
+
+    def preco_min(self, item, padrao=0.0):
+        """Preço mínimo do item, ou `padrao` se ele não tiver preço mínimo."""
+        preco = self._precos.get(item)
+        if preco is None or preco.min is None:
+            return padrao
+        return preco.min
+
+    def preco_max(self, item, padrao=0.0):
+        """Preço máximo do item, ou `padrao` se ele não tiver preço."""
+        preco = self._precos.get(item)
+        if preco is None or preco.max is None:
+            return padrao
+        return preco.max
+
+    def preco_materia_prima(self, item):
+        """Preço de uma matéria-prima: o próprio ou, sem ele, o da sua referência de fallback."""
+        preco = self._precos.get(item)
+        if preco is None and item in self.fallbacks:
+            preco = self._precos.get(self.fallbacks[item])
+        return preco
+
+    def custo_materia_prima(self, item):
+        """Custo unitário (mínimo, máximo) de uma matéria-prima; 0 se ela não tem preço."""
+        preco = self.preco_materia_prima(item)
+        if preco is None or preco.min is None:
+            return 0.0, 0.0
+        return preco.min, preco.max if preco.max is not None else preco.min
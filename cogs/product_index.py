@@ -0,0 +1,103 @@
+"""
+Índice de nomes de produtos para o autocomplete dos comandos de barra.
+
+Construído uma vez por snapshot de dados. As buscas ignoram acentos e
+maiúsculas e combinam três níveis, nesta ordem de relevância:
+
+  1. prefixo do nome inteiro ("mine" -> "Minério de Cobre");
+  2. prefixo de qualquer palavra do nome ("ouro" -> "Minério de Ouro");
+  3. trigramas em comum, para erros de digitação ("minerio d cobr").
+
+Os dois primeiros usam busca binária em listas ordenadas; o terceiro usa um
+índice invertido de trigramas.
+"""
+import bisect
+import unicodedata
+from collections import Counter
+
+# Fração mínima dos trigramas da consulta que um nome precisa ter
+SIMILARIDADE_MINIMA = 0.5
+
+
+def normalizar(texto):
+    """Remove acentos, caixa e espaços repetidos: "Minério  de Cobre" -> "minerio de cobre"."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acentos.casefold().split())
+
+
+def _trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class ProductIndex:
+    def __init__(self, nomes):
+        self.nomes = tuple(sorted(set(nomes), key=normalizar))
+        self._chaves_dos_nomes = [normalizar(nome) for nome in self.nomes]
+        self._normalizados = dict(zip(self._chaves_dos_nomes, self.nomes))
+
+        # (nome normalizado a partir da segunda palavra em diante, posição do nome)
+        self._sufixos = []
+        self._trigramas = {}
+        for i, normalizado in enumerate(self._chaves_dos_nomes):
+            inicio = normalizado.find(" ")
+            while inicio != -1:
+                self._sufixos.append((normalizado[inicio + 1:], i))
+                inicio = normalizado.find(" ", inicio + 1)
+            for trigrama in _trigramas(normalizado):
+                self._trigramas.setdefault(trigrama, []).append(i)
+        self._sufixos.sort()
+        self._chaves_dos_sufixos = [chave for chave, _ in self._sufixos]
+        # Trigramas presentes em quase todos os nomes não ajudam a distinguir nenhum
+        self._max_ocorrencias = max(8, len(self.nomes) // 4)
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def __contains__(self, nome):
+        return normalizar(nome) in self._normalizados
+
+    def resolver(self, texto):
+        """Nome canônico de `texto` (ignorando acentos e maiúsculas), ou None."""
+        return self._normalizados.get(normalizar(texto))
+
+    def buscar(self, consulta, limite=25):
+        """Até `limite` nomes para a consulta, dos mais aos menos relevantes."""
+        consulta = normalizar(consulta)
+        if not consulta:
+            return list(self.nomes[:limite])
+
+        # Os nomes já estão ordenados pela forma normalizada: prefixos são uma fatia contígua
+        resultado = []
+        vistos = set()
+        i = bisect.bisect_left(self._chaves_dos_nomes, consulta)
+        while i < len(self.nomes) and len(resultado) < limite and self._chaves_dos_nomes[i].startswith(consulta):
+            resultado.append(i)
+            vistos.add(i)
+            i += 1
+
+        j = bisect.bisect_left(self._chaves_dos_sufixos, consulta)
+        while j < len(self._sufixos) and len(resultado) < limite and self._chaves_dos_sufixos[j].startswith(consulta):
+            i = self._sufixos[j][1]
+            if i not in vistos:
+                resultado.append(i)
+                vistos.add(i)
+            j += 1
+
+        if len(resultado) < limite and len(consulta) >= 3:
+            trigramas = _trigramas(consulta)
+            contagem = Counter()
+            for trigrama in trigramas:
+                ocorrencias = self._trigramas.get(trigrama, ())
+                if len(ocorrencias) <= self._max_ocorrencias:
+                    contagem.update(ocorrencias)
+            minimo = max(1, int(len(trigramas) * SIMILARIDADE_MINIMA))
+            for i, comuns in contagem.most_common():
+                if comuns < minimo or len(resultado) >= limite:
+                    break
+                if i not in vistos:
+                    resultado.append(i)
+                    vistos.add(i)
+
+        return [self.nomes[i] for i in resultado]
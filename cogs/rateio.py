@@ -0,0 +1,91 @@
+"""
+Geração das instruções de rateio (solicitações de craft) de uma encomenda.
+
+As solicitações vêm de `empacotar_lotes` (cogs/lot_packing.py): itens da
+mesma etapa dividem uma solicitação quando cabem no craft-size. O agendador
+de produção (cogs/scheduler.py) agenda essas mesmas solicitações.
+`calcular_lotes` dá os lotes de um item isolado.
+"""
+import math
+from collections import namedtuple
+import metrics
+from .lot_packing import empacotar_lotes
+from .recipe_graph import RecipeGraph
+
+# Itens nomeados no título da seção de uma etapa (o nome de um campo de embed tem até 256 caracteres)
+MAX_ITENS_NO_TITULO = 4
+
+class Lotes(namedtuple("Lotes", ["total_crafts", "max_por_vez", "repeticoes", "resto"])):
+    """
+    Divisão dos crafts de um item em lotes que cabem no craft_size:
+    `repeticoes` lotes de `max_por_vez` crafts e um lote final de `resto` crafts.
+    """
+    __slots__ = ()
+
+    @property
+    def tamanhos(self):
+        return [self.max_por_vez] * self.repeticoes + ([self.resto] if self.resto else [])
+
+def calcular_lotes(item, quantidade_desejada, receitas, craft_size):
+    receita = receitas[item]
+    total_crafts = math.ceil(quantidade_desejada / receita['produz'])
+    soma_materiais_por_craft = sum(mat['quantidade'] for mat in receita['materiais'])
+    max_por_vez = math.floor(craft_size / soma_materiais_por_craft) if soma_materiais_por_craft > 0 else total_crafts
+    if max_por_vez == 0: max_por_vez = 1
+    return Lotes(total_crafts, max_por_vez, total_crafts // max_por_vez, total_crafts % max_por_vez)
+
+def _formatar_etapa(etapa, necessidades, grafo, craft_size):
+    produz, arestas = grafo.produz, grafo.arestas
+    linhas = [
+        f"{item} — Precisa: {math.ceil(necessidades[item])} | Total a produzir: {crafts * produz[item]}"
+        for item, crafts in etapa.itens
+    ]
+    linhas.append("")
+    for numero, solicitacao in enumerate(etapa.solicitacoes, 1):
+        repetir = f"repetir {solicitacao.repeticoes} vezes" if solicitacao.repeticoes > 1 else "repetir 1 vez"
+        linhas.append(f"📋 Solicitação {numero} ({repetir}):")
+        linhas += [f"   - {item}: Solicita {crafts} (Produz {crafts * produz[item]})" for item, crafts in solicitacao.crafts]
+        linhas.append("   - Materiais (para cada solicitação):")
+        materiais = {}
+        for item, crafts in solicitacao.crafts:
+            for nome, quantidade in arestas[item]:
+                materiais[nome] = materiais.get(nome, 0) + quantidade * crafts
+        linhas += [f"      - {nome}: {quantidade}" for nome, quantidade in materiais.items()]
+        linhas.append(f"   - Capacidade usada: {solicitacao.carga}/{craft_size}")
+        linhas.append("")
+    return "\n".join(linhas).strip()
+
+def dividir_em_blocos(texto, tamanho_max=1018):
+    blocos = []
+    bloco_atual = []
+    tamanho_atual = 0
+    for linha in texto.splitlines(keepends=True):
+        if tamanho_atual + len(linha) > tamanho_max:
+            blocos.append("".join(bloco_atual).rstrip())
+            bloco_atual, tamanho_atual = [], 0
+        bloco_atual.append(linha)
+        tamanho_atual += len(linha)
+    if bloco_atual:
+        blocos.append("".join(bloco_atual).rstrip())
+    return blocos
+
+@metrics.cronometrado("gepeto_calculo_seconds")
+def calcular_necessidades_intermediarios(produtos_list, receitas, estoque=None):
+    return RecipeGraph.de(receitas).expandir(produtos_list, estoque).intermediarios
+
+@metrics.cronometrado("gepeto_calculo_seconds")
+def gerar_blocos_de_rateio_para_lista(produtos_list, receitas, craft_size, necessidades=None, estoque=None, etapas=None):
+    grafo = RecipeGraph.de(receitas)
+    all_craft_needs = necessidades if necessidades is not None else grafo.expandir(produtos_list, estoque).intermediarios
+    if etapas is None:
+        etapas = empacotar_lotes(all_craft_needs, grafo, craft_size)
+
+    # Uma seção por etapa: os itens independentes entre si dividem as solicitações de craft
+    blocos_finais = []
+    for etapa in etapas:
+        nomes = [item.upper() for item, _ in etapa.itens]
+        titulo = ", ".join(nomes[:MAX_ITENS_NO_TITULO])
+        if len(nomes) > MAX_ITENS_NO_TITULO:
+            titulo += f" e mais {len(nomes) - MAX_ITENS_NO_TITULO}"
+        blocos_finais.append((f"➡️ ETAPA {etapa.nivel}: {titulo}", _formatar_etapa(etapa, all_craft_needs, grafo, craft_size)))
+    return blocos_finais
@@ -0,0 +1,188 @@
+"""
+Grafo de receitas compilado a partir de `receitas_crafting`.
+
+O grafo é construído uma única vez por carga de dados e guarda a ordem
+topológica (produto antes dos seus materiais) e as arestas reversas
+(material -> itens que o utilizam). Com isso uma encomenda inteira é
+expandida em uma única passada, somando a demanda de cada nó antes de
+aplicar `ceil(qtd / produz)`. Opcionalmente o estoque disponível é abatido
+da demanda de cada nó, em qualquer nível do grafo.
+"""
+import math
+from collections import defaultdict, deque, namedtuple
+from collections.abc import Mapping
+
+# Resultado de uma expansão:
+#   brutos         -> materiais sem receita (matérias-primas) e quantidade total
+#   intermediarios -> demanda total de cada item craftável
+#   crafts         -> número de crafts necessários de cada item craftável
+#   consumo        -> quantidade de cada item retirada do estoque
+#   sobras         -> excedente produzido pelo arredondamento dos crafts
+Expansao = namedtuple("Expansao", ["brutos", "intermediarios", "crafts", "consumo", "sobras"])
+
+
+class RecipeGraph(Mapping):
+    """
+    Grafo imutável de receitas. Funciona como um Mapping somente-leitura de
+    `receitas_crafting`, então pode ser usado no lugar do dicionário original.
+    """
+
+    def __init__(self, receitas):
+        self._receitas = dict(receitas or {})
+        self.produz = {}
+        self.arestas = {}
+        reversas = defaultdict(list)
+
+        for item, receita in self._receitas.items():
+            self.produz[item] = receita['produz']
+            materiais = tuple((mat['nome'], mat['quantidade']) for mat in receita['materiais'])
+            self.arestas[item] = materiais
+            for nome_material, _ in materiais:
+                reversas[nome_material].append(item)
+
+        self.reversas = {item: tuple(usos) for item, usos in reversas.items()}
+        self.ordem = self._ordenar_topologicamente()
+        self.posicao = {item: i for i, item in enumerate(self.ordem)}
+        self.niveis = self._calcular_niveis()
+
+    def _ordenar_topologicamente(self):
+        """Kahn: cada item aparece antes de todos os seus materiais."""
+        nos = list(self._receitas.keys())
+        for nome_material in self.reversas:
+            if nome_material not in self._receitas:
+                nos.append(nome_material)
+
+        grau_entrada = {no: len(self.reversas.get(no, ())) for no in nos}
+        fila = deque(no for no in nos if grau_entrada[no] == 0)
+        ordem = []
+        while fila:
+            no = fila.popleft()
+            ordem.append(no)
+            for nome_material, _ in self.arestas.get(no, ()):
+                grau_entrada[nome_material] -= 1
+                if grau_entrada[nome_material] == 0:
+                    fila.append(nome_material)
+
+        if len(ordem) != len(nos):
+            em_ciclo = sorted(no for no, grau in grau_entrada.items() if grau > 0)
+            raise ValueError(f"Ciclo detectado nas receitas envolvendo: {', '.join(em_ciclo)}")
+        return tuple(ordem)
+
+    def _calcular_niveis(self):
+        """Nível de cada item craftável: 1 + o maior nível entre os seus materiais (matérias-primas são 0)."""
+        niveis = {}
+        for item in reversed(self.ordem):  # materiais antes dos itens que os usam
+            if item in self.produz:
+                niveis[item] = 1 + max((niveis.get(nome, 0) for nome, _ in self.arestas[item]), default=0)
+        return niveis
+
+    @classmethod
+    def de(cls, receitas):
+        """Retorna `receitas` se já for um grafo compilado, senão compila um novo."""
+        if isinstance(receitas, cls):
+            return receitas
+        return cls(receitas)
+
+    # --- Interface de Mapping (compatível com o dicionário de receitas) ---
+
+    def __getitem__(self, item):
+        return self._receitas[item]
+
+    def __iter__(self):
+        return iter(self._receitas)
+
+    def __len__(self):
+        return len(self._receitas)
+
+    def __contains__(self, item):
+        return item in self._receitas
+
+    # --- Expansão ---
+
+    def expandir(self, produtos_list, estoque=None):
+        """
+        Expande uma lista de produtos (`{'name', 'quantity'}` ou tuplas
+        `(nome, quantidade)`) em uma única passada pela ordem topológica.
+        `estoque` (item -> quantidade disponível) é abatido da demanda total
+        de cada item antes de calcular os crafts ou as matérias-primas.
+        """
+        demanda = defaultdict(float)
+        for produto in produtos_list:
+            if isinstance(produto, Mapping):
+                demanda[produto['name']] += produto['quantity']
+            else:
+                nome, quantidade = produto
+                demanda[nome] += quantidade
+
+        brutos = defaultdict(float)
+        intermediarios = defaultdict(float)
+        crafts = {}
+        consumo = {}
+        sobras = {}
+        if not demanda:
+            return Expansao(brutos, intermediarios, crafts, consumo, sobras)
+        estoque = estoque or {}
+
+        def abater(item, quantidade):
+            disponivel = estoque.get(item, 0)
+            if disponivel <= 0:
+                return quantidade
+            usado = min(disponivel, quantidade)
+            consumo[item] = usado
+            return quantidade - usado
+
+        # Itens desconhecidos pelo grafo não têm receita: são matérias-primas
+        for nome in list(demanda):
+            if nome not in self.posicao:
+                quantidade = abater(nome, demanda.pop(nome))
+                if quantidade:
+                    brutos[nome] += quantidade
+
+        for item in self.ordem:
+            quantidade = demanda.get(item)
+            if not quantidade:
+                continue
+            quantidade = abater(item, quantidade)
+            if not quantidade:
+                continue
+            if item not in self.produz:
+                brutos[item] += quantidade
+                continue
+            intermediarios[item] += quantidade
+            n_crafts = math.ceil(quantidade / self.produz[item])
+            crafts[item] = n_crafts
+            excedente = n_crafts * self.produz[item] - quantidade
+            if excedente > 0:
+                sobras[item] = excedente
+            for nome_material, qtd_material in self.arestas[item]:
+                demanda[nome_material] += qtd_material * n_crafts
+
+        return Expansao(brutos, intermediarios, crafts, consumo, sobras)
+
+    def dependentes(self, itens):
+        """Todos os itens que usam, direta ou indiretamente, algum dos itens informados."""
+        encontrados = set()
+        fila = deque(itens)
+        while fila:
+            item = fila.popleft()
+            for usuario in self.reversas.get(item, ()):
+                if usuario not in encontrados:
+                    encontrados.add(usuario)
+                    fila.append(usuario)
+        return encontrados
+
+    def materiais(self, itens):
+        """Todos os itens usados, direta ou indiretamente, na fabricação dos itens informados."""
+        encontrados = set()
+        fila = deque(itens)
+        while fila:
+            item = fila.popleft()
+            for material, _ in self.arestas.get(item, ()):
+                if material not in encontrados:
+                    encontrados.add(material)
+                    fila.append(material)
+        return encontrados
+
+    def ordem_de_craft(self, itens):
+        """Ordena os itens craftáveis informados segundo a ordem topológica."""
+        return sorted((item for item in itens if item in self.produz), key=self.posicao.__getitem__)
@@ -0,0 +1,223 @@
+"""
+Agenda de produção de uma encomenda em várias estações de craft.
+
+As tarefas são as mesmas solicitações de craft publicadas no rateio
+(`empacotar_lotes`, cogs/lot_packing.py): cada repetição de uma solicitação
+ocupa uma estação, e os itens dela são craftados em sequência, cada um por
+`crafts * tempo` (o campo `tempo` da receita é o tempo de um craft, em
+segundos). Uma solicitação só começa quando todas as solicitações com os
+materiais craftáveis dos seus itens terminaram. As tarefas são distribuídas
+entre as estações por list scheduling com prioridade pelo caminho crítico:
+sempre que uma estação fica livre, ela pega a solicitação pronta com o maior
+caminho restante até o fim da encomenda.
+
+Repetições seguidas da mesma solicitação em uma estação são guardadas como
+uma única `Execucao` (as tarefas da primeira repetição, o número de
+repetições, o início e o fim): o plano de uma encomenda grande tem uma
+entrada por troca de solicitação, não uma por craft. As tarefas individuais
+só são expandidas para montar o texto da linha do tempo.
+"""
+import heapq
+from collections import defaultdict, namedtuple
+from dataclasses import dataclass
+
+import metrics
+
+from .lot_packing import empacotar_lotes
+from .recipe_graph import RecipeGraph
+
+Tarefa = namedtuple("Tarefa", ["item", "crafts", "produz", "inicio", "fim"])
+# `repeticoes` execuções seguidas da mesma solicitação; `tarefas` são as da primeira
+Execucao = namedtuple("Execucao", ["tarefas", "repeticoes", "inicio", "fim"])
+
+
+def expandir(execucao):
+    """As tarefas de todas as repetições da execução, em ordem de início."""
+    if execucao.repeticoes == 1:
+        return list(execucao.tarefas)
+    ciclo = (execucao.fim - execucao.inicio) / execucao.repeticoes
+    return [
+        t._replace(inicio=t.inicio + k * ciclo, fim=t.fim + k * ciclo)
+        for k in range(execucao.repeticoes)
+        for t in execucao.tarefas
+    ]
+
+
+@dataclass(frozen=True)
+class Cronograma:
+    estacoes: tuple         # uma tupla de `Execucao` por estação, em ordem de início
+    duracao_total: float    # makespan, em segundos
+    caminho_critico: float  # limite inferior imposto pelas dependências
+
+    def tarefas_da_estacao(self, i):
+        return [t for execucao in self.estacoes[i] for t in expandir(execucao)]
+
+    @property
+    def tarefas(self):
+        return sorted(
+            (t for i in range(len(self.estacoes)) for t in self.tarefas_da_estacao(i)),
+            key=lambda t: (t.inicio, t.item),
+        )
+
+    def para_dict(self):
+        return {
+            'execucoes': [
+                [[e.repeticoes, e.inicio, e.fim, [list(t) for t in e.tarefas]] for e in estacao]
+                for estacao in self.estacoes
+            ],
+            'duracao_total': self.duracao_total,
+            'caminho_critico': self.caminho_critico,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        if 'execucoes' in dados:
+            estacoes = tuple(
+                tuple(Execucao(tuple(Tarefa(*t) for t in tarefas), repeticoes, inicio, fim)
+                      for repeticoes, inicio, fim, tarefas in estacao)
+                for estacao in dados['execucoes']
+            )
+        else:
+            # Planos salvos antes das execuções: uma tarefa por repetição
+            estacoes = tuple(
+                tuple(Execucao((Tarefa(*t),), 1, t[3], t[4]) for t in estacao)
+                for estacao in dados['estacoes']
+            )
+        return cls(
+            estacoes=estacoes,
+            duracao_total=dados['duracao_total'],
+            caminho_critico=dados['caminho_critico'],
+        )
+
+
+def _prioridades(itens, grafo, duracao_do_lote):
+    """Caminho crítico de cada item: duração da sua maior solicitação + maior caminho entre os itens que o usam."""
+    prioridade = {}
+    for item in grafo.ordem_de_craft(itens):  # produtos antes dos materiais
+        usuarios = [prioridade[u] for u in grafo.reversas.get(item, ()) if u in prioridade]
+        prioridade[item] = duracao_do_lote[item] + max(usuarios, default=0.0)
+    return prioridade
+
+
+@metrics.cronometrado("gepeto_calculo_seconds")
+def agendar_producao(necessidades, receitas, craft_size, estacoes=1, etapas=None):
+    """
+    Agenda as solicitações de craft de todos os intermediários de
+    `necessidades` (item -> demanda) em `estacoes` estações paralelas.
+    `etapas` é o resultado de `empacotar_lotes` já calculado para as mesmas
+    necessidades, se houver. Retorna um `Cronograma`.
+    """
+    grafo = RecipeGraph.de(receitas)
+    estacoes = max(1, int(estacoes))
+    if etapas is None:
+        etapas = empacotar_lotes(necessidades, grafo, craft_size)
+
+    # Cada grupo de solicitações idênticas: (itens com crafts e duração, duração total, repetições)
+    grupos = []
+    duracao_do_item = {}
+    for etapa in etapas:
+        for solicitacao in etapa.solicitacoes:
+            partes = []
+            for item, crafts in solicitacao.crafts:
+                duracao = crafts * (grafo[item].get('tempo', 0) or 0)
+                partes.append((item, crafts, duracao))
+            duracao = sum(d for _, _, d in partes)
+            grupos.append((partes, duracao, solicitacao.repeticoes))
+            for item, _, _ in partes:
+                duracao_do_item[item] = max(duracao_do_item.get(item, 0.0), duracao)
+    prioridade = _prioridades(duracao_do_item, grafo, duracao_do_item)
+
+    # Solicitações pendentes de cada item e, por material, os grupos que esperam por ele
+    pendentes = defaultdict(int)
+    for partes, _, repeticoes in grupos:
+        for item, _, _ in partes:
+            pendentes[item] += repeticoes
+    esperando = defaultdict(list)
+    bloqueios = []
+    for g, (partes, _, _) in enumerate(grupos):
+        materiais = {nome for item, _, _ in partes for nome, _ in grafo.arestas[item] if nome in pendentes}
+        bloqueios.append(len(materiais))
+        for nome in materiais:
+            esperando[nome].append(g)
+
+    prontas = []
+    sequencia = 0
+
+    def liberar(g):
+        nonlocal sequencia
+        partes, duracao, repeticoes = grupos[g]
+        urgencia = max(prioridade[item] for item, _, _ in partes)
+        for _ in range(repeticoes):
+            heapq.heappush(prontas, (-urgencia, -duracao, sequencia, g))
+            sequencia += 1
+
+    for g in range(len(grupos)):
+        if bloqueios[g] == 0:
+            liberar(g)
+
+    linhas_do_tempo = [[] for _ in range(estacoes)]
+    ultimo_grupo = [None] * estacoes  # grupo da última execução de cada estação
+    livres = list(range(estacoes))
+    em_andamento = []  # (fim, estacao, grupo)
+    agora = 0.0
+    while prontas or em_andamento:
+        while prontas and livres:
+            g = heapq.heappop(prontas)[3]
+            estacao = min(livres)
+            livres.remove(estacao)
+            linha = linhas_do_tempo[estacao]
+            fim = agora + grupos[g][1]
+            if ultimo_grupo[estacao] == g and linha[-1].fim == agora:
+                # Outra repetição logo depois da anterior: estende a execução
+                linha[-1] = linha[-1]._replace(repeticoes=linha[-1].repeticoes + 1, fim=fim)
+            else:
+                tarefas, inicio = [], agora
+                for item, crafts, duracao in grupos[g][0]:
+                    tarefas.append(Tarefa(item, crafts, grafo.produz[item] * crafts, inicio, inicio + duracao))
+                    inicio += duracao
+                linha.append(Execucao(tuple(tarefas), 1, agora, fim))
+                ultimo_grupo[estacao] = g
+            heapq.heappush(em_andamento, (agora + grupos[g][1], estacao, g))
+
+        # Avança até o próximo término e libera as solicitações cujos materiais ficaram prontos
+        agora, estacao, g = heapq.heappop(em_andamento)
+        livres.append(estacao)
+        for item, _, _ in grupos[g][0]:
+            pendentes[item] -= 1
+            if pendentes[item] == 0:
+                for espera in esperando.get(item, ()):
+                    bloqueios[espera] -= 1
+                    if bloqueios[espera] == 0:
+                        liberar(espera)
+
+    return Cronograma(
+        estacoes=tuple(tuple(linha) for linha in linhas_do_tempo),
+        duracao_total=agora,
+        caminho_critico=max(prioridade.values(), default=0.0),
+    )
+
+
+def formatar_duracao(segundos):
+    segundos = int(round(segundos))
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    if horas:
+        return f"{horas}h{minutos:02d}min"
+    if minutos:
+        return f"{minutos}min{segundos:02d}s"
+    return f"{segundos}s"
+
+
+def formatar_linha_do_tempo(cronograma):
+    """Uma seção por estação, com o início, o fim e o lote de cada tarefa."""
+    secoes = []
+    for i, estacao in enumerate(cronograma.estacoes):
+        if not estacao:
+            continue
+        linhas = [f"Estação {i + 1}:"]
+        linhas.extend(
+            f"   {formatar_duracao(t.inicio)} → {formatar_duracao(t.fim)}  {t.item} ({t.crafts} crafts, {t.produz} un.)"
+            for t in cronograma.tarefas_da_estacao(i)
+        )
+        secoes.append("\n".join(linhas))
+    return "\n\n".join(secoes)
@@ -0,0 +1,250 @@
+"""
+Configuração por servidor (guild) e partições de dados carregadas sob demanda.
+
+Cada guild em `guilds.json` (GUILDS_CONFIG) tem seus canais, cargos com
+permissão, craft-size, estações de craft e preços que sobrepõem o catálogo
+base da API:
+
+    {
+      "1145126424248848514": {
+        "canal_encomenda": 1402582869280292894,
+        "canal_publico": 1160775850334113852,
+        "permission": ["1145130477326434324"],
+        "craft-size": 400,
+        "precos": {"ferraria": {"min": {"Lingote de Ferro": 2.5}}}
+      }
+    }
+
+Sem o arquivo, o bot atende só a guild padrão (constantes abaixo), como antes.
+
+`GuildPartitions` compila o snapshot de uma guild (catálogo base + sobreposições)
+na primeira interação dela, reaproveitando o grafo e o índice de produtos do
+snapshot base, e o descarta depois de `ttl_ocioso` segundos sem uso. Guilds sem
+sobreposições usam o snapshot base diretamente. A memória cresce com as guilds
+ativas, não com as configuradas.
+
+A compilação é CPU-bound e roda fora do event loop (`asyncio.to_thread`): na
+primeira interação da guild e, para as guilds ativas, logo que o catálogo base
+é trocado, antes da próxima interação precisar dele. Sobreposições que não
+compilam (ex.: preço de item desconhecido com DATA_STRICT=1) são logadas e a
+guild usa o catálogo base.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from snapshot import compilar_snapshot
+
+# Guild padrão, usada quando não há guilds.json
+ID_GUILD = 1145126424248848514
+# Canal onde o botão de nova encomenda é enviado
+ID_CANAL_ENCOMENDA = 1402582869280292894
+# Canal onde as encomendas confirmadas são publicadas
+ID_CANAL_PUBLICO = 1160775850334113852
+
+# Intervalo mínimo entre varreduras de partições ociosas
+INTERVALO_LIMPEZA = 60
+# Versões do snapshot base mantidas por guild (encomendas pendentes usam a versão da prévia)
+VERSOES_POR_GUILD = 2
+
+
+@dataclass(frozen=True)
+class GuildConfig:
+    guild_id: int
+    canal_encomenda: int
+    canal_publico: int
+    permissoes: tuple = None   # None: usa as permissões do catálogo base
+    settings: dict = field(default_factory=dict)  # sobrepõe 'settings' (craft-size, estacoes-de-craft)
+    precos: dict = field(default_factory=dict)    # sobrepõe 'precos', no mesmo formato do data.json
+
+    @property
+    def tem_sobreposicoes(self):
+        return self.permissoes is not None or bool(self.settings) or bool(self.precos)
+
+    @classmethod
+    def de_dict(cls, guild_id, dados):
+        settings = {chave: dados[chave] for chave in ("craft-size", "estacoes-de-craft") if chave in dados}
+        permissoes = dados.get('permission')
+        return cls(
+            guild_id=int(guild_id),
+            canal_encomenda=int(dados['canal_encomenda']),
+            canal_publico=int(dados['canal_publico']),
+            permissoes=tuple(str(cargo) for cargo in permissoes) if permissoes is not None else None,
+            settings=settings,
+            precos=dict(dados.get('precos') or {}),
+        )
+
+
+def carregar_configuracoes(caminho=None):
+    """guild_id -> GuildConfig, de `caminho` (GUILDS_CONFIG, padrão guilds.json)."""
+    caminho = caminho or os.getenv("GUILDS_CONFIG", "guilds.json")
+    try:
+        with open(caminho, "r", encoding="utf-8") as file:
+            dados = json.load(file)
+    except FileNotFoundError:
+        return {ID_GUILD: GuildConfig(ID_GUILD, ID_CANAL_ENCOMENDA, ID_CANAL_PUBLICO)}
+    if not isinstance(dados, dict):
+        raise ValueError(f"{caminho}: esperado um objeto com uma entrada por guild.")
+    configs = {}
+    for guild_id, config in dados.items():
+        try:
+            configs[int(guild_id)] = GuildConfig.de_dict(guild_id, config)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{caminho}: configuração da guild {guild_id} inválida ({e!r}).") from None
+    return configs
+
+
+def _mesclar_precos(base, sobreposicao):
+    """
+    Preços do catálogo base com os da guild por cima. Como no `PriceIndex` a
+    primeira categoria que tem o item vence, um item sobreposto sai de todas
+    as categorias do base antes de entrar na categoria da sobreposição.
+    """
+    sobrepostos = {
+        item
+        for valores in sobreposicao.values()
+        for chave in ("min", "range")
+        for item in (valores.get(chave) or {})
+    }
+    precos = {}
+    for categoria, valores in base.items():
+        if not isinstance(valores, dict):
+            precos[categoria] = valores
+            continue
+        precos[categoria] = dict(valores)
+        for chave in ("min", "range"):
+            if isinstance(valores.get(chave), dict):
+                precos[categoria][chave] = {
+                    item: preco for item, preco in valores[chave].items() if item not in sobrepostos
+                }
+    for categoria, valores in sobreposicao.items():
+        destino = precos.setdefault(categoria, {})
+        for chave in ("min", "range"):
+            if chave in valores:
+                destino[chave] = {**destino.get(chave, {}), **valores[chave]}
+    return precos
+
+
+def derivar_snapshot(base, config):
+    """Snapshot da guild: o base com as sobreposições de `config` (grafo e índice reaproveitados)."""
+    dados = dict(base.dados)
+    if config.permissoes is not None:
+        dados['permission'] = list(config.permissoes)
+    if config.settings:
+        dados['settings'] = {**base.settings, **config.settings}
+    if config.precos:
+        dados['precos'] = _mesclar_precos(base.dados.get('precos', {}), config.precos)
+    return compilar_snapshot(
+        dados, base.versao, f"{base.origem} + guild {config.guild_id}",
+        base.etag, base.last_modified, anterior=base, particao=config.guild_id,
+    )
+
+
+def _derivar_ou_base(base, config):
+    # Guardado como a partição da versão: o erro é logado uma vez por versão do catálogo
+    try:
+        return derivar_snapshot(base, config)
+    except ValueError as e:
+        print(f"[GUILDS] Sobreposições da guild {config.guild_id} inválidas; usando o catálogo base: {e}")
+        return base
+
+
+class GuildPartitions:
+    def __init__(self, dados, configs, ttl_ocioso=1800):
+        # `dados` é o DataRefresher do catálogo base
+        self.dados = dados
+        self.configs = configs
+        self.ttl_ocioso = ttl_ocioso
+        self.compilacoes = 0
+        self.despejos = 0
+        self._particoes = {}  # guild_id -> OrderedDict(versao base -> snapshot)
+        self._compilando = {}  # (guild_id, versao base) -> tarefa da compilação em andamento
+        self._recompilacoes = set()  # recompilações agendadas pela troca do catálogo base
+        self._ultimo_uso = {}
+        self._ultima_limpeza = 0.0
+        dados.ao_atualizar.append(self._ao_trocar_base)
+
+    @classmethod
+    def do_ambiente(cls, dados):
+        """Cria as partições a partir de GUILDS_CONFIG e GUILD_IDLE_TTL."""
+        return cls(dados, carregar_configuracoes(), ttl_ocioso=int(os.getenv("GUILD_IDLE_TTL", "1800")))
+
+    def __len__(self):
+        """Guilds com partição compilada em memória."""
+        return len(self._particoes)
+
+    def config(self, guild_id):
+        return self.configs.get(guild_id)
+
+    async def obter(self, guild_id, versao=None):
+        """
+        Snapshot da guild sobre a versão `versao` do catálogo base (a atual se
+        None ou se ela já saiu do histórico). None se a guild não está
+        configurada ou os dados ainda não foram carregados.
+        """
+        agora = time.monotonic()
+        if agora - self._ultima_limpeza >= INTERVALO_LIMPEZA:
+            self.despejar_ociosas(agora)
+
+        config = self.configs.get(guild_id)
+        base = (self.dados.obter(versao) if versao is not None else None) or self.dados.atual
+        if config is None or base is None:
+            return None
+        if not config.tem_sobreposicoes:
+            return base
+
+        self._ultimo_uso[guild_id] = agora
+        versoes = self._particoes.get(guild_id)
+        snapshot = versoes.get(base.versao) if versoes is not None else None
+        if snapshot is None:
+            return await self._compilar(config, base)
+        versoes.move_to_end(base.versao)
+        return snapshot
+
+    def catalogo(self, guild_id):
+        """
+        Snapshot para consultas que só usam os nomes dos itens (autocomplete),
+        sem esperar compilação: a partição atual da guild, se já pronta, ou o
+        catálogo base (o grafo e o índice de produtos são os mesmos).
+        """
+        base = self.dados.atual
+        if base is None or guild_id not in self.configs:
+            return None
+        return self._particoes.get(guild_id, {}).get(base.versao, base)
+
+    async def _compilar(self, config, base):
+        chave = (config.guild_id, base.versao)
+        tarefa = self._compilando.get(chave)
+        if tarefa is None:
+            tarefa = self._compilando[chave] = asyncio.ensure_future(asyncio.to_thread(_derivar_ou_base, base, config))
+            tarefa.add_done_callback(lambda _: self._compilando.pop(chave, None))
+            self.compilacoes += 1
+        snapshot = await asyncio.shield(tarefa)
+
+        versoes = self._particoes.setdefault(config.guild_id, OrderedDict())
+        versoes[base.versao] = snapshot
+        while len(versoes) > VERSOES_POR_GUILD:
+            versoes.popitem(last=False)
+        return snapshot
+
+    def _ao_trocar_base(self, base):
+        """Recompila em segundo plano as partições das guilds ativas sobre o novo catálogo base."""
+        for guild_id in list(self._particoes):
+            config = self.configs.get(guild_id)
+            if config is not None and config.tem_sobreposicoes:
+                tarefa = asyncio.ensure_future(self._compilar(config, base))
+                self._recompilacoes.add(tarefa)
+                tarefa.add_done_callback(self._recompilacoes.discard)
+
+    def despejar_ociosas(self, agora=None):
+        """Remove as partições das guilds sem interação há mais de `ttl_ocioso` segundos."""
+        agora = time.monotonic() if agora is None else agora
+        self._ultima_limpeza = agora
+        ociosas = [guild_id for guild_id, uso in self._ultimo_uso.items() if agora - uso > self.ttl_ocioso]
+        for guild_id in ociosas:
+            del self._ultimo_uso[guild_id]
+            self._particoes.pop(guild_id, None)
+        self.despejos += len(ociosas)
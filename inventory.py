@@ -0,0 +1,177 @@
+"""
+Livro de estoque: quantidade disponível de cada item (matérias-primas,
+intermediários e produtos), persistida em SQLite.
+
+O saldo é mantido em memória e cada alteração grava o novo saldo e um
+movimento no histórico, na mesma transação. As encomendas confirmadas
+consomem o estoque usado pelo plano e lançam as sobras do arredondamento dos
+crafts, que ficam disponíveis para as próximas encomendas.
+
+Cada guild tem o próprio estoque (`ledger.namespace(guild_id)`): saldos,
+movimentos e a versão usada pelos planos são chaveados por (guild, item), então
+uma encomenda ou uma contagem em uma guild nunca altera o estoque de outra.
+Bancos de antes da separação por guild são migrados para a guild legada
+(`guild_legado`, a guild padrão da instalação de um servidor só).
+"""
+import os
+import sqlite3
+import time
+from collections import defaultdict
+
+from guilds import ID_GUILD
+
+
+class InventoryLedger:
+    def __init__(self, caminho="inventory.db", guild_legado=ID_GUILD):
+        # Incrementada a cada alteração de cada guild; planos guardam a versão com que foram calculados
+        self._versoes = defaultdict(int)
+        self._saldos = defaultdict(dict)  # guild_id -> item -> quantidade
+
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrar(guild_legado)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS estoque ("
+            " guild_id INTEGER NOT NULL,"
+            " item TEXT NOT NULL,"
+            " quantidade REAL NOT NULL,"
+            " PRIMARY KEY (guild_id, item))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS movimentos ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " guild_id INTEGER NOT NULL,"
+            " item TEXT NOT NULL,"
+            " delta REAL NOT NULL,"
+            " motivo TEXT,"
+            " criado_em REAL NOT NULL)"
+        )
+        self._conn.commit()
+        for guild_id, item, quantidade in self._conn.execute(
+            "SELECT guild_id, item, quantidade FROM estoque WHERE quantidade > 0"
+        ):
+            self._saldos[guild_id][item] = quantidade
+
+    def _migrar(self, guild_legado):
+        """Move o estoque global de antes da separação por guild para `guild_legado`."""
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(estoque)")}
+        if not colunas or 'guild_id' in colunas:
+            return
+        with self._conn:
+            # A chave primária muda para (guild_id, item): a tabela é recriada
+            self._conn.execute("ALTER TABLE estoque RENAME TO estoque_global")
+            self._conn.execute(
+                "CREATE TABLE estoque ("
+                " guild_id INTEGER NOT NULL,"
+                " item TEXT NOT NULL,"
+                " quantidade REAL NOT NULL,"
+                " PRIMARY KEY (guild_id, item))"
+            )
+            self._conn.execute(
+                "INSERT INTO estoque (guild_id, item, quantidade) SELECT ?, item, quantidade FROM estoque_global",
+                (guild_legado,),
+            )
+            self._conn.execute("DROP TABLE estoque_global")
+            self._conn.execute("ALTER TABLE movimentos ADD COLUMN guild_id INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE movimentos SET guild_id = ?", (guild_legado,))
+        print(f"[ESTOQUE] Estoque global migrado para a guild {guild_legado}.")
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(os.getenv("INVENTORY_DB", "inventory.db"))
+
+    def namespace(self, guild_id):
+        """Estoque de uma guild, com a mesma interface para todos os usos (saldos, versão e movimentos)."""
+        return InventoryNamespace(self, guild_id)
+
+    def saldo(self, guild_id, item):
+        return self._saldos.get(guild_id, {}).get(item, 0)
+
+    def saldos(self, guild_id):
+        """Cópia dos saldos positivos da guild (item -> quantidade), usada como `estoque` na expansão."""
+        return dict(self._saldos.get(guild_id, {}))
+
+    def versao(self, guild_id):
+        return self._versoes.get(guild_id, 0)
+
+    def aplicar(self, guild_id, deltas, motivo):
+        """
+        Aplica vários movimentos (item -> delta) no estoque da guild em uma
+        única transação. Saldos nunca ficam negativos: o consumo além do
+        disponível é ignorado.
+        """
+        saldos = self._saldos[guild_id]
+        agora = time.time()
+        linhas_saldo, linhas_movimento = [], []
+        for item, delta in deltas.items():
+            if not delta:
+                continue
+            novo = max(0, saldos.get(item, 0) + delta)
+            linhas_saldo.append((guild_id, item, novo))
+            linhas_movimento.append((guild_id, item, novo - saldos.get(item, 0), motivo, agora))
+        if not linhas_saldo:
+            return
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO estoque (guild_id, item, quantidade) VALUES (?, ?, ?)"
+                " ON CONFLICT(guild_id, item) DO UPDATE SET quantidade = excluded.quantidade",
+                linhas_saldo,
+            )
+            self._conn.executemany(
+                "INSERT INTO movimentos (guild_id, item, delta, motivo, criado_em) VALUES (?, ?, ?, ?, ?)",
+                linhas_movimento,
+            )
+        for _, item, novo in linhas_saldo:
+            if novo > 0:
+                saldos[item] = novo
+            else:
+                saldos.pop(item, None)
+        self._versoes[guild_id] += 1
+
+    def __len__(self):
+        """Itens com saldo positivo, somando todas as guilds."""
+        return sum(len(saldos) for saldos in self._saldos.values())
+
+    def fechar(self):
+        self._conn.close()
+
+
+class InventoryNamespace:
+    """Estoque de uma única guild, sobre o `InventoryLedger` compartilhado."""
+
+    def __init__(self, ledger, guild_id):
+        self.ledger = ledger
+        self.guild_id = guild_id
+
+    @property
+    def versao(self):
+        return self.ledger.versao(self.guild_id)
+
+    def saldo(self, item):
+        return self.ledger.saldo(self.guild_id, item)
+
+    def saldos(self):
+        return self.ledger.saldos(self.guild_id)
+
+    def aplicar(self, deltas, motivo):
+        self.ledger.aplicar(self.guild_id, deltas, motivo)
+
+    def ajustar(self, item, delta, motivo="ajuste manual"):
+        self.aplicar({item: delta}, motivo)
+        return self.saldo(item)
+
+    def definir(self, item, quantidade, motivo="contagem manual"):
+        self.aplicar({item: quantidade - self.saldo(item)}, motivo)
+        return self.saldo(item)
+
+    def registrar_encomenda(self, consumo, sobras, motivo):
+        """Baixa o que o plano tirou do estoque e lança as sobras produzidas."""
+        deltas = {item: -quantidade for item, quantidade in consumo.items()}
+        for item, quantidade in sobras.items():
+            deltas[item] = deltas.get(item, 0) + quantidade
+        self.aplicar(deltas, motivo)
+
+    def __len__(self):
+        return len(self.ledger.saldos(self.guild_id))
@@ -1,64 +1,130 @@
 import os
-import json
-import aiohttp
+import time
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 from cogs.encomendas import EncomendaCog
+from cogs.estoque import EstoqueCog
+from snapshot import DataRefresher, intervalo_de_atualizacao
+from snapshot_cache import SnapshotCache
+from pending_orders import PendingOrderStore
+from guilds import GuildPartitions
+from published_orders import PublishedOrderStore
+from outbox import Outbox
+from inventory import InventoryLedger
+from order_history import OrderHistory
+from startup_state import StartupState, hash_da_arvore, medir_fase
+from workers import WorkerPool
+from plan_cache import PlanCache
+import metrics
 import webserver
 
-button_data = {}
-
-API_DATA = {}
-
-async def load_api_data():
-    """Carrega os dados da API_URL ou, se indisponível, do arquivo local data.json."""
-    global API_DATA
-    api_url = os.getenv("API_URL")
-
-    # 1️⃣ Tenta buscar da API
-    if api_url:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_url, timeout=5) as resp:
-                    if resp.status == 200:
-                        API_DATA = await resp.json()
-                        print(f"[API] Dados carregados com sucesso da API: {api_url}")
-                        return
-                    else:
-                        print(f"[API] Falha ao carregar da API ({resp.status}), usando arquivo local...")
-        except Exception as e:
-            print(f"[API] Erro ao acessar a API ({e}), usando arquivo local...")
-
-    # 2️⃣ Fallback para o arquivo local
-    try:
-        with open("data.json", "r", encoding="utf-8") as file:
-            API_DATA = json.load(file)
-        print("[API] Dados carregados com sucesso do arquivo local.")
-    except FileNotFoundError:
-        print("[ERRO] Arquivo data.json não encontrado.")
-        API_DATA = None
-    except json.JSONDecodeError:
-        print("[ERRO] Arquivo data.json está corrompido ou inválido.")
-        API_DATA = None
+def opcoes_do_gateway():
+    """
+    Intents e caches do cliente. Por padrão o bot roda enxuto: só o intent de
+    guilds (canais e cargos), sem cache nem chunking de membros, sem presenças
+    e sem cache de mensagens. O fluxo de encomendas só precisa de interações,
+    que chegam independentemente de intents. GATEWAY_LEAN=0 volta ao modo
+    completo (Intents.all e caches padrão).
+    """
+    if os.getenv("GATEWAY_LEAN", "1") == "0":
+        return {'intents': discord.Intents.all()}
+    intents = discord.Intents.none()
+    intents.guilds = True
+    return {
+        'intents': intents,
+        'member_cache_flags': discord.MemberCacheFlags.none(),
+        'chunk_guilds_at_startup': False,
+        'max_messages': int(os.getenv("MESSAGE_CACHE_SIZE", "0")) or None,
+    }
 
 class MyBot(commands.Bot):
-    def __init__(self):
-        super().__init__(command_prefix=commands.when_mentioned_or('.'), intents=discord.Intents.all())
+    def __init__(self, servidor_http=True):
+        self._inicio = time.perf_counter()
+        opcoes = opcoes_do_gateway()
+        super().__init__(command_prefix=commands.when_mentioned_or('.'), **opcoes)
+        print(f"[SETUP] Gateway {'completo' if opcoes['intents'] == discord.Intents.all() else 'enxuto'} "
+              f"(intents={opcoes['intents'].value}).")
+        # Sob o gunicorn o servidor HTTP é do worker; aqui só sobe quando o bot roda sozinho
+        self.usar_servidor_http = servidor_http
+        self.servidor_http = None
+        self.dados = DataRefresher(os.getenv("API_URL"), intervalo_de_atualizacao(), cache=SnapshotCache.do_ambiente())
+        self.button_data = PendingOrderStore.do_ambiente()
+        # Configuração de cada guild e os snapshots derivados do catálogo base, sob demanda
+        self.particoes = GuildPartitions.do_ambiente(self.dados)
+        print(f"[SETUP] {len(self.particoes.configs)} guild(s) configurada(s).")
+        # Planos das encomendas publicadas, para a navegação entre as páginas da mensagem pública
+        self.publicadas = PublishedOrderStore.do_ambiente()
+        # Fila durável das publicações no canal público, esvaziada pelo publicador da EncomendaCog
+        self.outbox = Outbox.do_ambiente()
+        self.estado = StartupState.do_ambiente()
+        self.estoque = InventoryLedger.do_ambiente()
+        # Encomendas confirmadas e a demanda agregada por dia/semana (/previsao-materiais)
+        self.historico = OrderHistory.do_ambiente()
+        # Cálculos de encomendas rodam fora do event loop (WORKER_MODE=thread|processo)
+        self.workers = WorkerPool.do_ambiente()
+        print(f"[SETUP] Pool de cálculo: {self.workers.modo} com {self.workers.max_workers} worker(s).")
+        # Planos já calculados, reaproveitados por encomendas repetidas
+        self.planos = PlanCache.do_ambiente()
+        self._registrar_metricas()
+
+    def _registrar_metricas(self):
+        metrics.registrar_gauge("gepeto_pending_orders", lambda: len(self.button_data), "Encomendas pendentes no store.")
+        metrics.registrar_gauge("gepeto_pending_evictions", lambda: self.button_data.evictions, "Encomendas pendentes despejadas por LRU.")
+        metrics.registrar_gauge("gepeto_pending_expired", lambda: self.button_data.expirados, "Encomendas pendentes expiradas por TTL.")
+        metrics.registrar_gauge("gepeto_plan_cache_size", lambda: len(self.planos), "Planos no cache de planos.")
+        metrics.registrar_gauge("gepeto_plan_cache_hits", lambda: self.planos.hits, "Planos servidos pelo cache de planos.")
+        metrics.registrar_gauge("gepeto_plan_cache_misses", lambda: self.planos.misses, "Planos calculados por falta no cache de planos.")
+        metrics.registrar_gauge("gepeto_plan_cache_evictions", lambda: self.planos.evictions, "Planos despejados do cache por LRU.")
+        metrics.registrar_gauge("gepeto_guild_partitions_active", lambda: len(self.particoes), "Guilds com snapshot derivado em memória.")
+        metrics.registrar_gauge("gepeto_outbox_depth", lambda: len(self.outbox), "Publicações aguardando envio na fila de saída.")
+        metrics.registrar_gauge("gepeto_inventory_items", lambda: len(self.estoque), "Itens com saldo positivo no estoque.")
+        metrics.registrar_gauge("gepeto_gateway_latency_seconds", lambda: self.latency, "Latência do heartbeat do gateway.")
+        metrics.registrar_gauge(
+            "gepeto_data_snapshot_version",
+            lambda: self.dados.atual.versao if self.dados.atual else None,
+            "Versão do snapshot de dados em uso.",
+        )
 
     async def setup_hook(self):
         """Carrega os dados da API, a cog de encomendas e sincroniza os comandos de árvore."""
-        await load_api_data()
-        await self.add_cog(EncomendaCog(self, button_data, API_DATA))
-        print("[SETUP] Cog 'EncomendaCog' carregada.")
-        
-        # Sincroniza os comandos de árvore
-        await self.tree.sync()
-        print("[SETUP] Comandos de árvore sincronizados.")
+        with medir_fase("dados"):
+            await self.dados.iniciar()
+        if self.usar_servidor_http:
+            with medir_fase("servidor_http"):
+                self.servidor_http = await webserver.iniciar(self)
+        with medir_fase("cogs"):
+            await self.add_cog(EncomendaCog(self, self.button_data, self.particoes, self.estado))
+            await self.add_cog(EstoqueCog(self, self.particoes, self.estoque))
+        print("[SETUP] Cogs 'EncomendaCog' e 'EstoqueCog' carregadas.")
+
+        # Sincroniza os comandos de árvore só quando eles mudaram desde o último sync
+        with medir_fase("comandos"):
+            hash_atual = hash_da_arvore(self.tree)
+            if hash_atual == self.estado.hash_comandos and not os.getenv("FORCE_TREE_SYNC"):
+                print("[SETUP] Comandos de árvore inalterados; sync ignorado.")
+            else:
+                await self.tree.sync()
+                self.estado.hash_comandos = hash_atual
+                print("[SETUP] Comandos de árvore sincronizados.")
+
+    async def close(self):
+        await self.dados.fechar()
+        if self.servidor_http is not None:
+            await self.servidor_http.cleanup()
+            self.servidor_http = None
+        await super().close()
+        self.workers.fechar()
+        self.button_data.fechar()
+        self.publicadas.fechar()
+        self.outbox.fechar()
+        self.estoque.fechar()
+        self.historico.fechar()
 
     async def on_ready(self):
         """Executado quando o bot está online e pronto."""
-        print(f"[READY] Bot online como {self.user}")
+        print(f"[READY] Bot online como {self.user} em {time.perf_counter() - self._inicio:.1f}s "
+              f"(RSS {metrics.memoria_rss() / 1e6:.1f} MB)")
 
 if __name__ == "__main__":
     print("[MAIN] Carregando variáveis de ambiente...")
@@ -70,5 +136,4 @@ if __name__ == "__main__":
     else:
         bot = MyBot()
         print("[MAIN] Iniciando o bot...")
-        webserver.keep_alive()
         bot.run(token)
\ No newline at end of file
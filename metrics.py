@@ -0,0 +1,183 @@
+"""
+Métricas de latência e contadores do bot, expostas em formato texto do Prometheus.
+
+Uso:
+    with metrics.medir("gepeto_calculo_seconds", funcao="planejar_encomenda"):
+        ...
+    metrics.incrementar("gepeto_interaction_deferred_total")
+    metrics.registrar_gauge("gepeto_pending_orders", lambda: len(store), "Encomendas pendentes.")
+"""
+import functools
+import math
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Prazo do Discord para a primeira resposta de uma interação
+PRAZO_INTERACAO = 3.0
+
+BUCKETS_PADRAO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histogramas = {}
+_contadores = {}
+_gauges = {}
+_descricoes = {}
+
+
+class Histograma:
+    def __init__(self, buckets=BUCKETS_PADRAO):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+        self.soma += valor
+        self.total += 1
+
+
+def _chave(nome, labels):
+    return nome, tuple(sorted(labels.items()))
+
+
+def descrever(nome, descricao):
+    _descricoes[nome] = descricao
+
+
+def observar(nome, valor, **labels):
+    """Registra uma observação (em segundos) no histograma `nome`."""
+    chave = _chave(nome, labels)
+    with _lock:
+        histograma = _histogramas.get(chave)
+        if histograma is None:
+            histograma = _histogramas[chave] = Histograma()
+        histograma.observar(valor)
+
+
+def incrementar(nome, valor=1, **labels):
+    chave = _chave(nome, labels)
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+def registrar_gauge(nome, funcao, descricao=None):
+    """Gauge calculado na hora da coleta por `funcao()`."""
+    _gauges[nome] = funcao
+    if descricao:
+        descrever(nome, descricao)
+
+
+@contextmanager
+def medir(nome, **labels):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nome, time.perf_counter() - inicio, **labels)
+
+
+def cronometrado(nome, **labels):
+    """Decorador que mede a duração de uma função síncrona."""
+    def decorador(funcao):
+        rotulos = {'funcao': funcao.__name__, **labels}
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            with medir(nome, **rotulos):
+                return funcao(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def registrar_prazo_de_interacao(interaction, ramo):
+    """
+    Registra quanto tempo se passou desde a criação da interação no Discord e
+    conta uma perda de prazo se a primeira resposta passou de 3 segundos.
+    """
+    decorrido = time.time() - interaction.created_at.timestamp()
+    observar("gepeto_interaction_response_seconds", decorrido, ramo=ramo)
+    if decorrido > PRAZO_INTERACAO:
+        incrementar("gepeto_interaction_deadline_misses_total", ramo=ramo)
+
+
+def memoria_rss():
+    """RSS atual do processo em bytes (pico, se /proc não estiver disponível)."""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_labels(labels, extra=()):
+    pares = list(labels) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def _formatar_numero(valor):
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return "NaN"
+    if isinstance(valor, float) and math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def renderizar():
+    """Todas as métricas no formato de exposição texto do Prometheus (0.0.4)."""
+    linhas = []
+    vistos = set()
+
+    def cabecalho(nome, tipo):
+        if nome in vistos:
+            return
+        vistos.add(nome)
+        if nome in _descricoes:
+            linhas.append(f"# HELP {nome} {_descricoes[nome]}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+
+    with _lock:
+        histogramas = sorted((chave, (list(h.buckets), list(h.contagens), h.soma, h.total)) for chave, h in _histogramas.items())
+        contadores = sorted(_contadores.items())
+
+    for (nome, labels), (buckets, contagens, soma, total) in histogramas:
+        cabecalho(nome, "histogram")
+        for limite, contagem in zip(buckets, contagens):
+            linhas.append(f"{nome}_bucket{_formatar_labels(labels, [('le', limite)])} {contagem}")
+        linhas.append(f"{nome}_bucket{_formatar_labels(labels, [('le', '+Inf')])} {total}")
+        linhas.append(f"{nome}_sum{_formatar_labels(labels)} {_formatar_numero(soma)}")
+        linhas.append(f"{nome}_count{_formatar_labels(labels)} {total}")
+
+    for (nome, labels), valor in contadores:
+        cabecalho(nome, "counter")
+        linhas.append(f"{nome}{_formatar_labels(labels)} {_formatar_numero(valor)}")
+
+    for nome, funcao in sorted(_gauges.items()):
+        try:
+            valor = funcao()
+        except Exception:
+            valor = None
+        cabecalho(nome, "gauge")
+        linhas.append(f"{nome} {_formatar_numero(valor)}")
+
+    return "\n".join(linhas) + "\n"
+
+
+descrever("gepeto_interaction_seconds", "Duração dos handlers de interação, por ramo.")
+descrever("gepeto_interaction_response_seconds", "Tempo desde a criação da interação no Discord até a resposta.")
+descrever("gepeto_interaction_deadline_misses_total", "Interações respondidas depois do prazo de 3 segundos.")
+descrever("gepeto_interaction_deferred_total", "Interações respondidas com defer.")
+descrever("gepeto_calculo_seconds", "Duração das funções de cálculo e rateio.")
+descrever("gepeto_api_load_seconds", "Duração das cargas de dados (API ou arquivo local).")
+registrar_gauge("gepeto_process_rss_bytes", memoria_rss, "Memória residente (RSS) do processo.")
@@ -0,0 +1,187 @@
+"""
+Histórico das encomendas confirmadas, com a demanda agregada por dia e semana.
+
+Cada confirmação grava uma linha em `encomendas` (comprador, prazo, custos,
+produtos, matérias-primas e intermediários do plano) e, na mesma transação,
+soma as quantidades nas tabelas de agregados:
+
+- `demanda`: quantidade por (guild, período, início, tipo, item), com tipo
+  'produto' ou 'material' (matérias-primas compradas, `plano.materiais_brutos`);
+- `totais`: encomendas, custo e valor de venda por (guild, período, início).
+
+Os agregados nunca são recalculados a partir do histórico. A previsão lê só
+as linhas diárias da janela pedida, então o custo não cresce com o número de
+encomendas registradas.
+"""
+import json
+import os
+import sqlite3
+import time
+
+DIA = "dia"
+SEMANA = "semana"
+
+PRODUTO = "produto"
+MATERIAL = "material"
+
+
+def dia_de(instante):
+    """Dia (UTC) do instante, em dias desde a época."""
+    return int(instante // 86400)
+
+
+def semana_de(instante):
+    """Semana (UTC, começando na segunda-feira) do instante, em semanas desde a época."""
+    # 01/01/1970 foi uma quinta-feira
+    return (dia_de(instante) + 3) // 7
+
+
+class OrderHistory:
+    def __init__(self, caminho="order_history.db"):
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS encomendas ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " message_id INTEGER UNIQUE,"
+            " guild_id INTEGER NOT NULL,"
+            " criado_em REAL NOT NULL,"
+            " criado_por TEXT,"
+            " nome TEXT,"
+            " prazo TEXT,"
+            " custo_min REAL NOT NULL,"
+            " custo_max REAL NOT NULL,"
+            " valor_venda REAL,"
+            " produtos TEXT NOT NULL,"
+            " materiais TEXT NOT NULL,"
+            " intermediarios TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS demanda ("
+            " guild_id INTEGER NOT NULL,"
+            " periodo TEXT NOT NULL,"
+            " inicio INTEGER NOT NULL,"
+            " tipo TEXT NOT NULL,"
+            " item TEXT NOT NULL,"
+            " quantidade REAL NOT NULL,"
+            " PRIMARY KEY (guild_id, periodo, tipo, inicio, item))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS totais ("
+            " guild_id INTEGER NOT NULL,"
+            " periodo TEXT NOT NULL,"
+            " inicio INTEGER NOT NULL,"
+            " encomendas INTEGER NOT NULL,"
+            " custo_min REAL NOT NULL,"
+            " custo_max REAL NOT NULL,"
+            " valor_venda REAL NOT NULL,"
+            " PRIMARY KEY (guild_id, periodo, inicio))"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(os.getenv("HISTORY_DB", "order_history.db"))
+
+    def registrar(self, plano, guild_id, message_id=None, criado_por=None, nome=None, prazo=None, instante=None):
+        """
+        Grava a encomenda confirmada e soma o plano nos agregados. Uma
+        `message_id` já registrada (clique duplo) é ignorada. Retorna True se
+        a encomenda foi gravada.
+        """
+        instante = time.time() if instante is None else instante
+        guild_id = guild_id or 0
+        periodos = ((DIA, dia_de(instante)), (SEMANA, semana_de(instante)))
+
+        linhas_demanda = []
+        for periodo, inicio in periodos:
+            for nome_produto, quantidade in plano.produtos:
+                linhas_demanda.append((guild_id, periodo, inicio, PRODUTO, nome_produto, quantidade))
+            for material, quantidade in plano.materiais_brutos.items():
+                linhas_demanda.append((guild_id, periodo, inicio, MATERIAL, material, quantidade))
+        valor_venda = plano.valor_venda or 0
+
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO encomendas (message_id, guild_id, criado_em, criado_por, nome, prazo,"
+                " custo_min, custo_max, valor_venda, produtos, materiais, intermediarios)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    message_id, guild_id, instante, criado_por, nome, prazo,
+                    plano.custo_min, plano.custo_max, plano.valor_venda,
+                    json.dumps([list(p) for p in plano.produtos], ensure_ascii=False),
+                    json.dumps(plano.materiais_brutos, ensure_ascii=False),
+                    json.dumps(plano.intermediarios, ensure_ascii=False),
+                ),
+            )
+            if not cursor.rowcount:
+                return False
+            self._conn.executemany(
+                "INSERT INTO demanda (guild_id, periodo, inicio, tipo, item, quantidade) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(guild_id, periodo, tipo, inicio, item) DO UPDATE SET quantidade = quantidade + excluded.quantidade",
+                linhas_demanda,
+            )
+            self._conn.executemany(
+                "INSERT INTO totais (guild_id, periodo, inicio, encomendas, custo_min, custo_max, valor_venda)"
+                " VALUES (?, ?, ?, 1, ?, ?, ?)"
+                " ON CONFLICT(guild_id, periodo, inicio) DO UPDATE SET encomendas = encomendas + 1,"
+                " custo_min = custo_min + excluded.custo_min, custo_max = custo_max + excluded.custo_max,"
+                " valor_venda = valor_venda + excluded.valor_venda",
+                [(guild_id, periodo, inicio, plano.custo_min, plano.custo_max, valor_venda) for periodo, inicio in periodos],
+            )
+        return True
+
+    def demanda(self, guild_id, tipo, periodo, inicio):
+        """item -> quantidade de um período (ex.: `demanda(g, MATERIAL, SEMANA, semana_de(time.time()))`)."""
+        return dict(self._conn.execute(
+            "SELECT item, quantidade FROM demanda WHERE guild_id = ? AND periodo = ? AND tipo = ? AND inicio = ?",
+            (guild_id or 0, periodo, tipo, inicio),
+        ))
+
+    def totais(self, guild_id, periodo, inicio):
+        """Encomendas, custo, valor de venda e margem de um período (zeros se não houve encomendas)."""
+        linha = self._conn.execute(
+            "SELECT encomendas, custo_min, custo_max, valor_venda FROM totais"
+            " WHERE guild_id = ? AND periodo = ? AND inicio = ?",
+            (guild_id or 0, periodo, inicio),
+        ).fetchone() or (0, 0.0, 0.0, 0.0)
+        encomendas, custo_min, custo_max, valor_venda = linha
+        return {
+            'encomendas': encomendas,
+            'custo_min': custo_min,
+            'custo_max': custo_max,
+            'valor_venda': valor_venda,
+            'margem': valor_venda - custo_max,
+        }
+
+    def previsao(self, guild_id, horizonte_dias=7, janela_dias=14, tipo=MATERIAL, instante=None):
+        """
+        Demanda prevista (item -> quantidade) para os próximos `horizonte_dias`:
+        a média diária dos últimos `janela_dias` (incluindo hoje) vezes o
+        horizonte. Com menos histórico que a janela, a média é sobre os dias
+        desde o primeiro registro da guild (no mínimo 1). Lê no máximo
+        `janela_dias` linhas por item.
+        """
+        hoje = dia_de(time.time() if instante is None else instante)
+        # Usa a chave primária (guild_id, periodo, tipo, inicio): não percorre o histórico
+        primeiro_dia = self._conn.execute(
+            "SELECT MIN(inicio) FROM demanda WHERE guild_id = ? AND periodo = ? AND tipo = ?",
+            (guild_id or 0, DIA, tipo),
+        ).fetchone()[0]
+        if primeiro_dia is None:
+            return {}
+        dias = max(1, min(janela_dias, hoje - primeiro_dia + 1))
+        linhas = self._conn.execute(
+            "SELECT item, SUM(quantidade) FROM demanda"
+            " WHERE guild_id = ? AND periodo = ? AND tipo = ? AND inicio > ? AND inicio <= ?"
+            " GROUP BY item",
+            (guild_id or 0, DIA, tipo, hoje - janela_dias, hoje),
+        )
+        return {item: total / dias * horizonte_dias for item, total in linhas}
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM encomendas").fetchone()[0]
+
+    def fechar(self):
+        self._conn.close()
@@ -0,0 +1,330 @@
+"""
+Fila de saída das publicações no canal público, persistida em SQLite.
+
+A confirmação de uma encomenda só grava a publicação na fila e responde ao
+usuário; um único `Publicador` esvazia a fila em segundo plano. Assim uma
+rajada de confirmações não fica presa no rate limit do canal, e uma falha de
+envio não perde a encomenda: ela volta para a fila com backoff exponencial e
+sobrevive a um restart.
+
+- Cada publicação tem uma chave única; enfileirar a mesma chave de novo (clique
+  duplo, reenvio depois de um restart) é coalescido na entrada existente.
+- O envio respeita um balde de tokens por canal (OUTBOX_RATE mensagens a cada
+  OUTBOX_RATE_WINDOW segundos; por padrão 4 a cada 5 s, abaixo do limite de 5
+  a cada 5 s do Discord por canal) em vez de depender dos 429.
+- A publicação é marcada como feita logo depois do envio. O que vem depois
+  (`ao_publicar`) nunca faz o envio ser repetido: uma falha ali só é logada.
+- Erros permanentes (sem permissão, canal inexistente) ou que passam de
+  `max_tentativas` marcam a publicação como falha, que fica no banco para
+  inspeção.
+- Publicações feitas ficam no banco por `retencao_dias` (para coalescer um
+  reenvio da mesma chave) e depois são apagadas, na abertura do banco e no
+  máximo uma vez por `INTERVALO_LIMPEZA` durante a execução.
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+
+import metrics
+
+# Intervalo mínimo entre limpezas das publicações feitas
+INTERVALO_LIMPEZA = 3600
+
+PENDENTE = "pendente"
+PUBLICADA = "publicada"
+FALHOU = "falhou"
+
+
+class Outbox:
+    def __init__(self, caminho="outbox.db", max_tentativas=8, retencao_dias=7):
+        self.max_tentativas = max_tentativas
+        self.retencao_dias = retencao_dias
+        self._ultima_limpeza = 0.0
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS saida ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " chave TEXT NOT NULL UNIQUE,"
+            " canal_id INTEGER NOT NULL,"
+            " dados TEXT NOT NULL,"
+            " estado TEXT NOT NULL,"
+            " tentativas INTEGER NOT NULL DEFAULT 0,"
+            " proxima_tentativa REAL NOT NULL,"
+            " criado_em REAL NOT NULL,"
+            " message_id INTEGER,"
+            " ultimo_erro TEXT,"
+            " publicada_em REAL)"
+        )
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(saida)")}
+        if 'publicada_em' not in colunas:
+            self._conn.execute("ALTER TABLE saida ADD COLUMN publicada_em REAL")
+            # Publicações feitas antes da coluna: contam a partir de agora
+            self._conn.execute("UPDATE saida SET publicada_em = ? WHERE estado = ?", (time.time(), PUBLICADA))
+        self._conn.execute("CREATE INDEX IF NOT EXISTS saida_pendentes ON saida (estado, proxima_tentativa)")
+        self._conn.commit()
+        self.limpar_publicadas()
+        self._pendentes = self._conn.execute("SELECT COUNT(*) FROM saida WHERE estado = ?", (PENDENTE,)).fetchone()[0]
+
+    @classmethod
+    def do_ambiente(cls):
+        """Cria a fila a partir de OUTBOX_DB, OUTBOX_MAX_ATTEMPTS e OUTBOX_RETENTION_DAYS."""
+        return cls(
+            caminho=os.getenv("OUTBOX_DB", "outbox.db"),
+            max_tentativas=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8")),
+            retencao_dias=int(os.getenv("OUTBOX_RETENTION_DAYS", "7")),
+        )
+
+    def __len__(self):
+        """Publicações aguardando envio."""
+        return self._pendentes
+
+    def enfileirar(self, chave, canal_id, dados):
+        """Grava a publicação e retorna o id; uma chave já enfileirada retorna o id existente."""
+        agora = time.time()
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO saida (chave, canal_id, dados, estado, proxima_tentativa, criado_em)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, canal_id, json.dumps(dados, ensure_ascii=False), PENDENTE, agora, agora),
+            )
+        if cursor.rowcount:
+            self._pendentes += 1
+            return cursor.lastrowid
+        metrics.incrementar("gepeto_outbox_coalesced_total")
+        return self._conn.execute("SELECT id FROM saida WHERE chave = ?", (chave,)).fetchone()[0]
+
+    def cancelar(self, chave):
+        """Retira da fila uma publicação ainda não enviada (a confirmação que a gravou falhou depois)."""
+        with self._conn:
+            cursor = self._conn.execute("DELETE FROM saida WHERE chave = ? AND estado = ?", (chave, PENDENTE))
+        self._pendentes -= cursor.rowcount
+
+    def proximas(self, limite=10):
+        """Publicações pendentes já vencidas, das mais antigas para as mais novas."""
+        linhas = self._conn.execute(
+            "SELECT id, chave, canal_id, dados, tentativas, criado_em FROM saida"
+            " WHERE estado = ? AND proxima_tentativa <= ? ORDER BY id LIMIT ?",
+            (PENDENTE, time.time(), limite),
+        )
+        return [
+            {'id': id_, 'chave': chave, 'canal_id': canal_id, 'dados': json.loads(dados),
+             'tentativas': tentativas, 'criado_em': criado_em}
+            for id_, chave, canal_id, dados, tentativas, criado_em in linhas
+        ]
+
+    def proxima_em(self):
+        """Horário (time.time) da próxima tentativa pendente, ou None se a fila está vazia."""
+        return self._conn.execute(
+            "SELECT MIN(proxima_tentativa) FROM saida WHERE estado = ?", (PENDENTE,)
+        ).fetchone()[0]
+
+    def concluir(self, id_, message_id):
+        agora = time.time()
+        with self._conn:
+            self._conn.execute(
+                "UPDATE saida SET estado = ?, message_id = ?, ultimo_erro = NULL, publicada_em = ? WHERE id = ?",
+                (PUBLICADA, message_id, agora, id_),
+            )
+        self._pendentes -= 1
+        if agora - self._ultima_limpeza >= INTERVALO_LIMPEZA:
+            self.limpar_publicadas()
+
+    def limpar_publicadas(self):
+        """Apaga as publicações feitas há mais de `retencao_dias` dias (0: guarda todas)."""
+        agora = time.time()
+        self._ultima_limpeza = agora
+        if not self.retencao_dias:
+            return 0
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM saida WHERE estado = ? AND publicada_em < ?",
+                (PUBLICADA, agora - self.retencao_dias * 86400),
+            )
+        return cursor.rowcount
+
+    def reagendar(self, id_, erro, atraso):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE saida SET tentativas = tentativas + 1, proxima_tentativa = ?, ultimo_erro = ? WHERE id = ?",
+                (time.time() + atraso, erro, id_),
+            )
+
+    def falhar(self, id_, erro):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE saida SET estado = ?, tentativas = tentativas + 1, ultimo_erro = ? WHERE id = ?",
+                (FALHOU, erro, id_),
+            )
+        self._pendentes -= 1
+
+    def fechar(self):
+        self._conn.close()
+
+
+class BaldeDeEnvio:
+    """Balde de tokens: até `capacidade` envios por `janela` segundos."""
+
+    def __init__(self, capacidade, janela):
+        self.capacidade = capacidade
+        self.taxa = capacidade / janela
+        self._tokens = float(capacidade)
+        self._atualizado = time.monotonic()
+
+    def espera(self):
+        """Segundos até haver um token livre (0 se já há)."""
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.taxa
+
+    def consumir(self):
+        self._tokens -= 1
+
+
+class Publicador:
+    """
+    Tarefa única que esvazia a `Outbox`. `publicar(item)` é a corrotina que
+    faz o envio de fato e retorna o id da mensagem criada; ela deve retornar
+    assim que o envio der certo, sem outras chamadas que possam falhar.
+    `ao_publicar(item, message_id)`, se dada, é chamada depois que a
+    publicação foi marcada como feita; `ao_falhar(item, erro)`, quando a
+    publicação é descartada.
+    """
+
+    def __init__(self, outbox, publicar, erros_permanentes=(), capacidade=4, janela=5.0,
+                 atraso_base=2.0, atraso_max=300.0, ao_falhar=None, ao_publicar=None):
+        self.outbox = outbox
+        self.publicar = publicar
+        self.ao_publicar = ao_publicar
+        self.ao_falhar = ao_falhar
+        self.erros_permanentes = erros_permanentes
+        self.capacidade = capacidade
+        self.janela = janela
+        self.atraso_base = atraso_base
+        self.atraso_max = atraso_max
+        self._baldes = {}
+        self._acordar = asyncio.Event()
+        self._tarefa = None
+
+    @classmethod
+    def do_ambiente(cls, outbox, publicar, erros_permanentes=(), ao_falhar=None, ao_publicar=None):
+        """Cria o publicador a partir de OUTBOX_RATE e OUTBOX_RATE_WINDOW."""
+        return cls(
+            outbox, publicar, erros_permanentes,
+            capacidade=int(os.getenv("OUTBOX_RATE", "4")),
+            janela=float(os.getenv("OUTBOX_RATE_WINDOW", "5")),
+            ao_falhar=ao_falhar,
+            ao_publicar=ao_publicar,
+        )
+
+    def iniciar(self):
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar(), name="publicador-outbox")
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    def avisar(self):
+        """Acorda o publicador depois de um `enfileirar`."""
+        self._acordar.set()
+
+    def _atraso(self, tentativas):
+        atraso = min(self.atraso_max, self.atraso_base * 2 ** tentativas)
+        # Jitter para que publicações que falharam juntas não voltem todas juntas
+        return atraso * random.uniform(0.5, 1.0)
+
+    def _balde(self, canal_id):
+        balde = self._baldes.get(canal_id)
+        if balde is None:
+            balde = self._baldes[canal_id] = BaldeDeEnvio(self.capacidade, self.janela)
+        return balde
+
+    async def _executar(self):
+        while True:
+            self._acordar.clear()
+            enviou = False
+            # Canal sem token livre -> segundos até o próximo; ele não segura os outros canais
+            bloqueados = {}
+            try:
+                for item in self.outbox.proximas(limite=50):
+                    canal_id = item['canal_id']
+                    if canal_id in bloqueados:
+                        continue
+                    balde = self._balde(canal_id)
+                    espera = balde.espera()
+                    if espera > 0:
+                        bloqueados[canal_id] = espera
+                        continue
+                    balde.consumir()
+                    await self._enviar(item)
+                    enviou = True
+                proxima = self.outbox.proxima_em()
+            except sqlite3.Error as e:
+                print(f"[OUTBOX] Erro no banco da fila: {e}")
+                proxima = time.time() + self.atraso_base
+            if enviou:
+                continue
+
+            esperas = list(bloqueados.values())
+            if proxima is not None and proxima > time.time():
+                esperas.append(proxima - time.time())
+            try:
+                await asyncio.wait_for(self._acordar.wait(), min(esperas) if esperas else None)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _enviar(self, item):
+        try:
+            message_id = await self.publicar(item)
+        except asyncio.CancelledError:
+            raise
+        except self.erros_permanentes as e:
+            print(f"[OUTBOX] Publicação '{item['chave']}' descartada: {e}")
+            await self._descartar(item, e)
+            return
+        except Exception as e:
+            tentativas = item['tentativas'] + 1
+            if tentativas >= self.outbox.max_tentativas:
+                print(f"[OUTBOX] Publicação '{item['chave']}' falhou {tentativas} vezes; desistindo: {e}")
+                await self._descartar(item, e)
+                return
+            atraso = self._atraso(item['tentativas'])
+            print(f"[OUTBOX] Falha ao publicar '{item['chave']}' ({e}); nova tentativa em {atraso:.0f}s.")
+            self.outbox.reagendar(item['id'], str(e), atraso)
+            metrics.incrementar("gepeto_publish_retries_total")
+            return
+
+        self.outbox.concluir(item['id'], message_id)
+        metrics.observar("gepeto_publish_latency_seconds", time.time() - item['criado_em'])
+        if self.ao_publicar is None:
+            return
+        try:
+            await self.ao_publicar(item, message_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # A mensagem já está no canal; repetir o envio a duplicaria
+            print(f"[OUTBOX] Publicação '{item['chave']}' enviada, mas o pós-envio falhou: {e!r}")
+
+    async def _descartar(self, item, erro):
+        self.outbox.falhar(item['id'], str(erro))
+        metrics.incrementar("gepeto_publish_failures_total")
+        if self.ao_falhar is not None:
+            await self.ao_falhar(item, erro)
+
+
+metrics.descrever("gepeto_publish_latency_seconds", "Tempo entre a confirmação e a publicação no canal público.")
+metrics.descrever("gepeto_publish_retries_total", "Publicações reagendadas após uma falha de envio.")
+metrics.descrever("gepeto_publish_failures_total", "Publicações descartadas (erro permanente ou tentativas esgotadas).")
+metrics.descrever("gepeto_outbox_coalesced_total", "Publicações repetidas coalescidas na entrada existente.")
@@ -0,0 +1,195 @@
+"""
+Armazenamento das encomendas pendentes (aguardando Confirmar/Cancelar).
+
+Substitui o antigo dicionário `button_data`: as entradas expiram após um TTL,
+o total é limitado com despejo LRU e tudo é persistido em um arquivo SQLite
+(modo WAL), então as encomendas pendentes sobrevivem a um restart. As
+consultas são servidas por um `OrderedDict` em memória, mantido em sincronia
+com o banco.
+
+Cada guild usa seu próprio namespace (`store.namespace(guild_id)`): só enxerga
+as próprias entradas e tem um limite próprio, para que a rajada de uma guild
+não despeje as encomendas pendentes das outras. Entradas gravadas antes da
+separação por guild (e as gravadas sem guild) pertencem à guild legada
+(`guild_legado`, a guild padrão da instalação de um servidor só).
+"""
+import json
+import os
+import sqlite3
+import time
+from collections import Counter, OrderedDict
+
+from guilds import ID_GUILD
+
+# Intervalo mínimo entre varreduras completas de entradas expiradas
+INTERVALO_LIMPEZA = 60
+
+
+class PendingOrderStore:
+    def __init__(self, caminho="pending_orders.db", ttl=900, max_itens=1000, max_por_guild=200, guild_legado=ID_GUILD):
+        self.ttl = ttl
+        self.guild_legado = guild_legado
+        self.max_itens = max_itens
+        self.max_por_guild = max_por_guild
+        self.evictions = 0
+        self.expirados = 0
+        self._ultima_limpeza = 0.0
+        self._cache = OrderedDict()  # message_id -> (expira_em, dados, guild_id)
+        self._por_guild = Counter()
+
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pendentes ("
+            " message_id INTEGER PRIMARY KEY,"
+            " dados TEXT NOT NULL,"
+            " expira_em REAL NOT NULL)"
+        )
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(pendentes)")}
+        if 'guild_id' not in colunas:
+            self._conn.execute("ALTER TABLE pendentes ADD COLUMN guild_id INTEGER NOT NULL DEFAULT 0")
+        # Guild 0 é de antes da separação por guild: nenhuma guild real consulta esse namespace
+        migradas = self._conn.execute(
+            "UPDATE pendentes SET guild_id = ? WHERE guild_id = 0", (guild_legado,)
+        ).rowcount
+        self._conn.commit()
+        if migradas:
+            print(f"[PENDENTES] {migradas} encomenda(s) pendente(s) sem guild movida(s) para a guild {guild_legado}.")
+        self._carregar()
+
+    @classmethod
+    def do_ambiente(cls):
+        """Cria o store a partir de PENDING_DB, PENDING_TTL, PENDING_MAX e PENDING_MAX_PER_GUILD."""
+        return cls(
+            caminho=os.getenv("PENDING_DB", "pending_orders.db"),
+            ttl=int(os.getenv("PENDING_TTL", "900")),
+            max_itens=int(os.getenv("PENDING_MAX", "1000")),
+            max_por_guild=int(os.getenv("PENDING_MAX_PER_GUILD", "200")),
+        )
+
+    def namespace(self, guild_id):
+        """Visão das encomendas pendentes de uma guild, com a mesma interface do store."""
+        return PendingNamespace(self, guild_id)
+
+    def _carregar(self):
+        agora = time.time()
+        with self._conn:
+            self._conn.execute("DELETE FROM pendentes WHERE expira_em <= ?", (agora,))
+        linhas = self._conn.execute("SELECT message_id, dados, expira_em, guild_id FROM pendentes ORDER BY rowid")
+        for message_id, dados, expira_em, guild_id in linhas:
+            self._cache[message_id] = (expira_em, json.loads(dados), guild_id)
+            self._por_guild[guild_id] += 1
+        self._despejar_excedentes()
+
+    def _remover(self, message_id):
+        entrada = self._cache.pop(message_id, None)
+        if entrada is not None:
+            self._por_guild[entrada[2]] -= 1
+        with self._conn:
+            self._conn.execute("DELETE FROM pendentes WHERE message_id = ?", (message_id,))
+
+    def _despejar_excedentes(self, guild_id=None):
+        if guild_id is not None and self.max_por_guild:
+            while self._por_guild[guild_id] > self.max_por_guild:
+                # A mais antiga da própria guild; as das outras guilds não são tocadas
+                mais_antiga = next(m for m, entrada in self._cache.items() if entrada[2] == guild_id)
+                self._remover(mais_antiga)
+                self.evictions += 1
+        while len(self._cache) > self.max_itens:
+            message_id = next(iter(self._cache))
+            self._remover(message_id)
+            self.evictions += 1
+
+    def limpar_expirados(self):
+        """Remove todas as entradas com TTL vencido."""
+        agora = time.time()
+        self._ultima_limpeza = agora
+        vencidos = [message_id for message_id, entrada in self._cache.items() if entrada[0] <= agora]
+        for message_id in vencidos:
+            _, _, guild_id = self._cache.pop(message_id)
+            self._por_guild[guild_id] -= 1
+        with self._conn:
+            self._conn.execute("DELETE FROM pendentes WHERE expira_em <= ?", (agora,))
+        self.expirados += len(vencidos)
+
+    def __setitem__(self, message_id, dados):
+        self.guardar(message_id, dados)
+
+    def guardar(self, message_id, dados, guild_id=None):
+        if guild_id is None:
+            guild_id = self.guild_legado
+        agora = time.time()
+        if agora - self._ultima_limpeza >= INTERVALO_LIMPEZA:
+            self.limpar_expirados()
+
+        if message_id in self._cache:
+            self._remover(message_id)
+        expira_em = agora + self.ttl
+        self._cache[message_id] = (expira_em, dados, guild_id)
+        self._por_guild[guild_id] += 1
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pendentes (message_id, dados, expira_em, guild_id) VALUES (?, ?, ?, ?)",
+                (message_id, json.dumps(dados, ensure_ascii=False), expira_em, guild_id),
+            )
+        self._despejar_excedentes(guild_id)
+
+    def get(self, message_id, padrao=None, guild_id=None):
+        entrada = self._cache.get(message_id)
+        if entrada is None or (guild_id is not None and entrada[2] != guild_id):
+            return padrao
+        expira_em, dados, _ = entrada
+        if expira_em <= time.time():
+            self._remover(message_id)
+            self.expirados += 1
+            return padrao
+        self._cache.move_to_end(message_id)
+        return dados
+
+    def pop(self, message_id, padrao=None, guild_id=None):
+        dados = self.get(message_id, padrao, guild_id)
+        if dados is not padrao:
+            self._remover(message_id)
+        return dados
+
+    def __contains__(self, message_id):
+        return self.get(message_id) is not None
+
+    def __len__(self):
+        return len(self._cache)
+
+    def estatisticas(self):
+        return {
+            'tamanho': len(self._cache),
+            'max_itens': self.max_itens,
+            'guilds': sum(1 for total in self._por_guild.values() if total > 0),
+            'evictions': self.evictions,
+            'expirados': self.expirados,
+        }
+
+    def fechar(self):
+        self._conn.close()
+
+
+class PendingNamespace:
+    """Encomendas pendentes de uma única guild, sobre o `PendingOrderStore` compartilhado."""
+
+    def __init__(self, store, guild_id):
+        self.store = store
+        self.guild_id = guild_id
+
+    def __setitem__(self, message_id, dados):
+        self.store.guardar(message_id, dados, self.guild_id)
+
+    def get(self, message_id, padrao=None):
+        return self.store.get(message_id, padrao, self.guild_id)
+
+    def pop(self, message_id, padrao=None):
+        return self.store.pop(message_id, padrao, self.guild_id)
+
+    def __contains__(self, message_id):
+        return self.get(message_id) is not None
+
+    def __len__(self):
+        return self.store._por_guild[self.guild_id]
@@ -0,0 +1,119 @@
+"""
+Cache LRU dos planos de encomenda calculados, compartilhado entre as interações.
+
+Os membros repetem as mesmas encomendas (mesmos produtos, quantidades
+redondas); com o cache, a prévia e a confirmação de uma encomenda repetida
+não voltam ao pool de cálculo. A chave é o conteúdo normalizado da encomenda
+(produtos somados e ordenados), o craft-size, a partição e a versão do
+snapshot e o saldo em estoque de todo o conjunto de itens que a expansão
+pode ler: os próprios produtos e o fecho transitivo dos seus materiais
+(intermediários em qualquer profundidade e matérias-primas, via
+`RecipeGraph.materiais`). Uma recarga dos dados muda a versão, e um movimento
+de estoque em qualquer desses itens muda o saldo, então uma entrada nunca é
+usada com dados diferentes dos que a produziram; as antigas saem por LRU.
+
+Junto com o plano fica a parte da prévia que só depende dele (campos do
+embed), renderizada uma única vez.
+"""
+import dataclasses
+import os
+from collections import OrderedDict
+
+from cogs.order_plan import planejar_do_snapshot
+from workers import executar_com_prazo
+
+# Conjuntos de materiais (por snapshot e produtos) mantidos para montar as chaves
+MAX_FECHOS = 256
+
+
+def normalizar_produtos(produtos_list):
+    """((nome, quantidade), ...) com produtos repetidos somados, em ordem de nome."""
+    quantidades = {}
+    for produto in produtos_list:
+        quantidades[produto['name']] = quantidades.get(produto['name'], 0) + produto['quantity']
+    return tuple(sorted(quantidades.items()))
+
+
+class PlanCache:
+    def __init__(self, max_itens=256):
+        self.max_itens = max_itens
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._itens = OrderedDict()  # chave -> [plano, campos renderizados (ou None)]
+        self._fechos = OrderedDict()  # (particao, versao, nomes) -> itens com saldo relevante
+
+    @classmethod
+    def do_ambiente(cls):
+        """Cria o cache a partir de PLAN_CACHE_MAX (0 desliga o cache)."""
+        return cls(max_itens=int(os.getenv("PLAN_CACHE_MAX", "256")))
+
+    def __len__(self):
+        return len(self._itens)
+
+    def _fecho(self, snapshot, nomes):
+        # Todos os itens cujo saldo `RecipeGraph.expandir` consulta para esses produtos
+        chave = (snapshot.particao, snapshot.versao, nomes)
+        fecho = self._fechos.get(chave)
+        if fecho is None:
+            fecho = self._fechos[chave] = frozenset(nomes) | frozenset(snapshot.grafo.materiais(nomes))
+            while len(self._fechos) > MAX_FECHOS:
+                self._fechos.popitem(last=False)
+        else:
+            self._fechos.move_to_end(chave)
+        return fecho
+
+    def chave(self, snapshot, produtos_list, saldos):
+        produtos = normalizar_produtos(produtos_list)
+        fecho = self._fecho(snapshot, tuple(nome for nome, _ in produtos))
+        estoque = tuple(sorted((item, quantidade) for item, quantidade in saldos.items() if item in fecho))
+        return produtos, snapshot.craft_size, snapshot.particao, snapshot.versao, estoque
+
+    def get(self, chave):
+        entrada = self._itens.get(chave)
+        if entrada is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._itens.move_to_end(chave)
+        return entrada[0]
+
+    def __setitem__(self, chave, plano):
+        if not self.max_itens:
+            return
+        self._itens[chave] = [plano, None]
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+            self.evictions += 1
+
+    def campos(self, chave, plano, renderizar):
+        """`renderizar(plano)`, guardado com o plano da chave na primeira chamada."""
+        entrada = self._itens.get(chave)
+        if entrada is None:
+            return renderizar(plano)
+        if entrada[1] is None:
+            entrada[1] = renderizar(plano)
+        return entrada[1]
+
+
+async def planejar_com_cache(interaction, bot, snapshot, produtos_list, ramo):
+    """
+    Plano da encomenda com o estoque atual: do `bot.planos` se a mesma
+    encomenda já foi calculada nas mesmas condições, senão do pool de workers
+    (`executar_com_prazo`). Retorna (plano, chave).
+    """
+    # Cada guild planeja contra o próprio estoque
+    estoque = bot.estoque.namespace(interaction.guild_id)
+    saldos, versao = estoque.saldos(), estoque.versao
+    chave = bot.planos.chave(snapshot, produtos_list, saldos)
+    plano = bot.planos.get(chave)
+    if plano is None:
+        plano = await executar_com_prazo(
+            interaction, bot.workers, snapshot, planejar_do_snapshot, produtos_list, saldos, versao, ramo=ramo
+        )
+        bot.planos[chave] = plano
+    elif plano.versao_estoque != versao:
+        # O saldo dos itens da encomenda é o mesmo; só a versão do livro andou
+        plano = dataclasses.replace(plano, versao_estoque=versao)
+    return plano, chave
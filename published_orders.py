@@ -0,0 +1,78 @@
+"""
+Encomendas publicadas no canal público, indexadas pelo id da mensagem.
+
+Guarda os dados do comprador e o plano (`OrderPlan.para_dict`) de cada
+mensagem pública em um arquivo SQLite, para que a navegação entre as páginas
+e o anexo "Plano completo" continuem funcionando depois de um restart. As
+entradas mais antigas que `retencao_dias` são apagadas na abertura do banco.
+As últimas entradas lidas ficam decodificadas em um cache LRU.
+"""
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+
+class PublishedOrderStore:
+    def __init__(self, caminho="published_orders.db", retencao_dias=90, max_cache=128):
+        self.max_cache = max_cache
+        self._cache = OrderedDict()
+
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS publicadas ("
+            " message_id INTEGER PRIMARY KEY,"
+            " dados TEXT NOT NULL,"
+            " publicada_em REAL NOT NULL)"
+        )
+        if retencao_dias:
+            self._conn.execute(
+                "DELETE FROM publicadas WHERE publicada_em < ?", (time.time() - retencao_dias * 86400,)
+            )
+        self._conn.commit()
+
+    @classmethod
+    def do_ambiente(cls):
+        """Cria o store a partir de PUBLISHED_DB e PUBLISHED_RETENTION_DAYS."""
+        return cls(
+            caminho=os.getenv("PUBLISHED_DB", "published_orders.db"),
+            retencao_dias=int(os.getenv("PUBLISHED_RETENTION_DAYS", "90")),
+        )
+
+    def _lembrar(self, message_id, dados):
+        self._cache[message_id] = dados
+        self._cache.move_to_end(message_id)
+        while len(self._cache) > self.max_cache:
+            self._cache.popitem(last=False)
+
+    def __setitem__(self, message_id, dados):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO publicadas (message_id, dados, publicada_em) VALUES (?, ?, ?)",
+                (message_id, json.dumps(dados, ensure_ascii=False), time.time()),
+            )
+        self._lembrar(message_id, dados)
+
+    def get(self, message_id, padrao=None):
+        dados = self._cache.get(message_id)
+        if dados is not None:
+            self._cache.move_to_end(message_id)
+            return dados
+        linha = self._conn.execute("SELECT dados FROM publicadas WHERE message_id = ?", (message_id,)).fetchone()
+        if linha is None:
+            return padrao
+        dados = json.loads(linha[0])
+        self._lembrar(message_id, dados)
+        return dados
+
+    def __contains__(self, message_id):
+        return self.get(message_id) is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM publicadas").fetchone()[0]
+
+    def fechar(self):
+        self._conn.close()
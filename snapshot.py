@@ -0,0 +1,361 @@
+"""
+Snapshots versionados e imutáveis dos dados da API (receitas, preços, permissões)
+e a tarefa que os recarrega periodicamente em segundo plano.
+
+Cada snapshot carrega o grafo de receitas e o índice de preços já compilados.
+O payload é validado uma única vez, na compilação (estrutura, ciclos nas
+receitas, matérias-primas sem preço e preços de itens desconhecidos), e o
+resultado compilado fica no cache em disco (snapshot_cache.py) para o próximo
+restart.
+A troca do snapshot atual é uma simples atribuição de atributo, portanto
+atômica para o event loop: quem já pegou uma referência (ex.: uma encomenda
+em andamento) continua usando o snapshot com que começou.
+"""
+import asyncio
+import dataclasses
+import difflib
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import aiohttp
+
+import metrics
+from cogs.cost_engine import CostEngine
+from cogs.price_index import PriceIndex
+from cogs.product_index import ProductIndex
+from cogs.recipe_graph import RecipeGraph
+
+
+class FrozenDict(dict):
+    """Dicionário somente-leitura (e serializável com pickle)."""
+
+    def _somente_leitura(self, *args, **kwargs):
+        raise TypeError("Snapshot de dados é somente-leitura.")
+
+    __setitem__ = __delitem__ = _somente_leitura
+    clear = pop = popitem = setdefault = update = _somente_leitura
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def congelar(valor):
+    """Converte recursivamente dicts em `FrozenDict` e listas em tuplas."""
+    if isinstance(valor, dict):
+        return FrozenDict((chave, congelar(v)) for chave, v in valor.items())
+    if isinstance(valor, list):
+        return tuple(congelar(v) for v in valor)
+    return valor
+
+
+def validar_dados(dados):
+    """Validação estrutural mínima do payload. Lança ValueError se inválido."""
+    if not isinstance(dados, dict):
+        raise ValueError("Payload de dados não é um objeto JSON.")
+    receitas = dados.get('receitas_crafting')
+    if not isinstance(receitas, dict):
+        raise ValueError("Campo 'receitas_crafting' ausente ou inválido.")
+    if not isinstance(dados.get('precos', {}), dict):
+        raise ValueError("Campo 'precos' inválido.")
+    for item, receita in receitas.items():
+        # Também aceita dados já congelados (snapshots derivados por guild)
+        if not isinstance(receita, dict) or not isinstance(receita.get('materiais'), (list, tuple)):
+            raise ValueError(f"Receita '{item}' sem lista de materiais.")
+        produz = receita.get('produz')
+        if not isinstance(produz, (int, float)) or produz <= 0:
+            raise ValueError(f"Receita '{item}' com 'produz' ausente ou inválido.")
+        for material in receita['materiais']:
+            if not isinstance(material, dict) or not isinstance(material.get('nome'), str):
+                raise ValueError(f"Receita '{item}' com material sem nome.")
+            quantidade = material.get('quantidade')
+            if not isinstance(quantidade, (int, float)) or quantidade <= 0:
+                raise ValueError(f"Receita '{item}' com quantidade inválida de '{material['nome']}'.")
+
+
+def verificar_referencias(grafo, precos):
+    """
+    Problemas de consistência que não impedem o uso dos dados, como avisos:
+    matérias-primas sem preço (entram com custo 0 nos cálculos) e preços de
+    itens que nenhuma receita usa (em geral um nome digitado errado).
+    """
+    avisos = []
+    usados = set(grafo.produz) | set(grafo.reversas)
+    referencias = precos.referencias
+    sem_preco = sorted(item for item in grafo.reversas if item not in grafo.produz and item not in precos)
+    desconhecidos = sorted(item for item in precos if item not in usados and item not in referencias)
+    for item in sem_preco:
+        parecido = difflib.get_close_matches(item, desconhecidos, n=1)
+        sugestao = f" (há um preço para '{parecido[0]}')" if parecido else ""
+        avisos.append(f"Matéria-prima '{item}' sem preço{sugestao}.")
+    for item in desconhecidos:
+        avisos.append(f"Preço de '{item}', que não aparece em nenhuma receita.")
+    for item, preco in precos.items():
+        if preco.min is None:
+            avisos.append(f"Preço de '{item}' sem valor mínimo.")
+    return tuple(avisos)
+
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    versao: int
+    dados: FrozenDict
+    grafo: RecipeGraph
+    precos: PriceIndex
+    custos: CostEngine
+    origem: str
+    etag: str = None
+    last_modified: str = None
+    carregado_em: float = field(default_factory=time.time)
+    produtos: ProductIndex = None  # índice de nomes para o autocomplete
+    particao: int = None           # guild com sobreposições de config; None no catálogo base
+    avisos: tuple = ()             # problemas de consistência encontrados na compilação
+
+    @property
+    def permissoes(self):
+        return self.dados.get('permission', ())
+
+    @property
+    def settings(self):
+        return self.dados.get('settings', FrozenDict())
+
+    @property
+    def craft_size(self):
+        return self.settings.get('craft-size', 300)
+
+    @property
+    def estacoes(self):
+        """Estações de craft em paralelo usadas pelo agendador de produção."""
+        return self.settings.get('estacoes-de-craft', int(os.getenv("CRAFT_STATIONS", "1")))
+
+
+def compilar_snapshot(conteudo, versao, origem, etag=None, last_modified=None, anterior=None, particao=None):
+    """
+    Faz o parse, valida e compila um payload em um `DataSnapshot`.
+    É CPU-bound: deve ser chamada fora do event loop (`asyncio.to_thread`).
+
+    Se as receitas forem iguais às do snapshot `anterior`, o grafo é reaproveitado
+    e os custos são recalculados só para os itens afetados pelos preços alterados.
+
+    Lança ValueError se o payload é inválido, tem ciclos nas receitas ou, com
+    DATA_STRICT=1, se a verificação de referências encontrou algum problema.
+    """
+    dados = json.loads(conteudo) if isinstance(conteudo, (bytes, str)) else conteudo
+    validar_dados(dados)
+    dados = congelar(dados)
+    fallback = dados.get('settings', {}).get('precos-fallback')
+    mesmas_receitas = anterior is not None and anterior.dados['receitas_crafting'] == dados['receitas_crafting']
+    grafo = anterior.grafo if mesmas_receitas else RecipeGraph(dados['receitas_crafting'])
+    precos = PriceIndex(dados.get('precos', {}), fallback, craftaveis=grafo.produz)
+    if mesmas_receitas:
+        custos = anterior.custos.com_precos(precos)
+        produtos = anterior.produtos
+    else:
+        custos = CostEngine(grafo, precos)
+        produtos = ProductIndex(grafo.produz)
+    avisos = verificar_referencias(grafo, precos)
+    if avisos and os.getenv("DATA_STRICT") == "1":
+        raise ValueError(f"{len(avisos)} problema(s) nos dados: {' '.join(avisos[:5])}")
+    return DataSnapshot(
+        versao, dados, grafo, precos, custos, origem, etag, last_modified,
+        produtos=produtos, particao=particao, avisos=avisos,
+    )
+
+
+class DataRefresher:
+    """
+    Mantém o snapshot atual dos dados e o recarrega da `API_URL` a cada
+    `intervalo` segundos usando uma única `aiohttp.ClientSession` e GET
+    condicional (ETag / If-Modified-Since).
+    """
+
+    # Quantos snapshots anteriores ficam disponíveis para encomendas pendentes
+    HISTORICO_MAX = 5
+
+    def __init__(self, api_url, intervalo=300, arquivo_local="data.json", cache=None):
+        self.api_url = api_url
+        self.intervalo = intervalo
+        self.arquivo_local = arquivo_local
+        # SnapshotCache (ou None): payloads já compilados são lidos do disco na inicialização
+        self.cache = cache
+        self._atual = None
+        self._historico = OrderedDict()
+        self._versao = 0
+        # sha256 do payload que gerou o snapshot atual: um 200 com o mesmo corpo não recompila
+        self._hash_atual = None
+        self._session = None
+        self._tarefa = None
+        # Chamados com o novo snapshot a cada atualização vinda da API (devem só agendar trabalho)
+        self.ao_atualizar = []
+
+    @property
+    def atual(self):
+        return self._atual
+
+    @atual.setter
+    def atual(self, snapshot):
+        self._atual = snapshot
+        self._historico[snapshot.versao] = snapshot
+        while len(self._historico) > self.HISTORICO_MAX:
+            self._historico.popitem(last=False)
+
+    def obter(self, versao):
+        """Snapshot de uma versão recente, ou None se ela já saiu do histórico."""
+        return self._historico.get(versao)
+
+    def _proxima_versao(self):
+        self._versao += 1
+        return self._versao
+
+    def _compilar(self, conteudo, versao, origem, etag=None, last_modified=None, anterior=None):
+        """
+        `compilar_snapshot` passando pelo cache. Sem snapshot anterior (início
+        do bot) o payload já compilado é lido do cache; com anterior ele é
+        sempre compilado, para que as alterações de custo sejam calculadas.
+        """
+        if self.cache is None:
+            return compilar_snapshot(conteudo, versao, origem, etag, last_modified, anterior)
+        chave = self.cache.chave(conteudo)
+        if anterior is None:
+            snapshot = self.cache.carregar(chave)
+            if snapshot is not None:
+                print(f"[CACHE] Snapshot compilado de '{origem}' carregado do cache.")
+                return dataclasses.replace(
+                    snapshot, versao=versao, origem=origem, etag=etag, last_modified=last_modified,
+                    carregado_em=time.time(),
+                )
+        snapshot = compilar_snapshot(conteudo, versao, origem, etag, last_modified, anterior)
+        self.cache.salvar(chave, snapshot)
+        return snapshot
+
+    def _avisar(self, snapshot):
+        for aviso in snapshot.avisos[:10]:
+            print(f"[API] Aviso nos dados: {aviso}")
+        if len(snapshot.avisos) > 10:
+            print(f"[API] ... e mais {len(snapshot.avisos) - 10} aviso(s).")
+
+    async def iniciar(self):
+        """Carrega o primeiro snapshot e agenda as atualizações em segundo plano."""
+        if self.api_url:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+            if await self.atualizar():
+                print(f"[API] Dados carregados com sucesso da API: {self.api_url}")
+            else:
+                print("[API] Falha ao carregar da API, usando arquivo local...")
+
+        if self.atual is None:
+            await self._carregar_arquivo_local()
+
+        if self._session is not None and self.intervalo > 0:
+            self._tarefa = asyncio.create_task(self._loop())
+
+    async def _carregar_arquivo_local(self):
+        inicio = time.perf_counter()
+        resultado = "erro"
+        try:
+            with open(self.arquivo_local, "rb") as file:
+                conteudo = file.read()
+            self.atual = await asyncio.to_thread(
+                self._compilar, conteudo, self._proxima_versao(), self.arquivo_local
+            )
+            self._hash_atual = hashlib.sha256(conteudo).hexdigest()
+            resultado = "atualizado"
+            print("[API] Dados carregados com sucesso do arquivo local.")
+            self._avisar(self.atual)
+        except FileNotFoundError:
+            print(f"[ERRO] Arquivo {self.arquivo_local} não encontrado.")
+        except ValueError as e:
+            # json.JSONDecodeError também é um ValueError
+            print(f"[ERRO] Arquivo {self.arquivo_local} está corrompido ou inválido: {e}")
+        metrics.observar("gepeto_api_load_seconds", time.perf_counter() - inicio, origem="arquivo", resultado=resultado)
+
+    async def atualizar(self):
+        """
+        Executa um GET condicional na API. Retorna True se um novo snapshot
+        foi publicado, False se os dados não mudaram ou a requisição falhou.
+        """
+        inicio = time.perf_counter()
+        resultado = await self._buscar_da_api()
+        metrics.observar("gepeto_api_load_seconds", time.perf_counter() - inicio, origem="api", resultado=resultado)
+        return resultado == "atualizado"
+
+    async def _buscar_da_api(self):
+        headers = {}
+        if self.atual is not None and self.atual.origem == self.api_url:
+            if self.atual.etag:
+                headers['If-None-Match'] = self.atual.etag
+            if self.atual.last_modified:
+                headers['If-Modified-Since'] = self.atual.last_modified
+
+        try:
+            async with self._session.get(self.api_url, headers=headers) as resp:
+                if resp.status == 304:
+                    return "nao_modificado"
+                if resp.status != 200:
+                    print(f"[API] Falha ao atualizar dados da API ({resp.status}).")
+                    return "erro"
+                conteudo = await resp.read()
+                etag = resp.headers.get('ETag')
+                last_modified = resp.headers.get('Last-Modified')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[API] Erro ao acessar a API ({e!r}).")
+            return "erro"
+
+        hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+        if hash_conteudo == self._hash_atual:
+            # Mesmo corpo (a API não fez o GET condicional): só os metadados mudam, a versão fica
+            if (self.atual.origem, self.atual.etag, self.atual.last_modified) != (self.api_url, etag, last_modified):
+                self.atual = dataclasses.replace(self.atual, origem=self.api_url, etag=etag, last_modified=last_modified)
+            return "nao_modificado"
+
+        try:
+            novo = await asyncio.to_thread(
+                self._compilar, conteudo, self._proxima_versao(), self.api_url, etag, last_modified, self.atual
+            )
+        except ValueError as e:
+            print(f"[API] Payload da API rejeitado, mantendo snapshot atual: {e}")
+            return "rejeitado"
+
+        self.atual = novo
+        self._hash_atual = hash_conteudo
+        print(f"[API] Snapshot de dados atualizado para a versão {novo.versao}.")
+        for ouvinte in self.ao_atualizar:
+            ouvinte(novo)
+        self._avisar(novo)
+        for alteracao in novo.custos.alteracoes:
+            print(
+                f"[API] Custo de '{alteracao.item}': {alteracao.custo_antes[0]:.2f} -> {alteracao.custo_depois[0]:.2f}"
+                f" | margem: {_formatar_margem(alteracao.margem_antes)} -> {_formatar_margem(alteracao.margem_depois)}"
+            )
+        return "atualizado"
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.atualizar()
+            except Exception as e:
+                print(f"[API] Erro inesperado ao atualizar dados: {e!r}")
+
+    async def fechar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def _formatar_margem(margem):
+    return f"{margem:.2f}" if margem is not None else "N/A"
+
+
+def intervalo_de_atualizacao():
+    """Intervalo de atualização configurado em `API_REFRESH_INTERVAL` (segundos)."""
+    try:
+        return int(os.getenv("API_REFRESH_INTERVAL", "300"))
+    except ValueError:
+        return 300
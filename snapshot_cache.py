@@ -0,0 +1,103 @@
+"""
+Cache em disco dos snapshots compilados, indexado pelo hash do conteúdo.
+
+Compilar um payload (parse do JSON, validação, grafo de receitas com a ordem
+topológica, índice de preços, custos e índice de produtos) custa bem mais do
+que ler o resultado pronto. Cada compilação bem-sucedida é gravada em
+`<diretorio>/<sha256 do payload>-v<FORMATO>.pickle`; na inicialização o mesmo
+payload é carregado desse arquivo, sem compilar de novo. Um payload
+que não passou na validação nunca chega ao cache.
+
+`FORMATO` deve ser incrementado sempre que a estrutura das classes
+compiladas (RecipeGraph, PriceIndex, CostEngine, ProductIndex, DataSnapshot)
+mudar, para que caches antigos sejam ignorados.
+"""
+import copy
+import dataclasses
+import hashlib
+import os
+import pickle
+import tempfile
+
+import metrics
+
+FORMATO = 4
+
+
+class SnapshotCache:
+    def __init__(self, diretorio="snapshot_cache", max_entradas=3):
+        self.diretorio = diretorio
+        self.max_entradas = max_entradas
+
+    @classmethod
+    def do_ambiente(cls):
+        """Cria o cache a partir de SNAPSHOT_CACHE_DIR e SNAPSHOT_CACHE_MAX; None se SNAPSHOT_CACHE_DIR estiver vazio."""
+        diretorio = os.getenv("SNAPSHOT_CACHE_DIR", "snapshot_cache")
+        if not diretorio:
+            return None
+        return cls(diretorio, max_entradas=int(os.getenv("SNAPSHOT_CACHE_MAX", "3")))
+
+    @staticmethod
+    def chave(conteudo):
+        if isinstance(conteudo, str):
+            conteudo = conteudo.encode("utf-8")
+        return hashlib.sha256(conteudo).hexdigest()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}-v{FORMATO}.pickle")
+
+    def carregar(self, chave):
+        """Snapshot compilado do payload com esse hash, ou None se não há (ou não é legível)."""
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as file:
+                snapshot = pickle.loads(file.read())
+        except FileNotFoundError:
+            metrics.incrementar("gepeto_snapshot_cache_total", resultado="miss")
+            return None
+        except (OSError, ValueError, pickle.UnpicklingError, AttributeError, EOFError, ImportError) as e:
+            print(f"[CACHE] Snapshot em cache '{caminho}' ilegível, descartado: {e!r}")
+            metrics.incrementar("gepeto_snapshot_cache_total", resultado="erro")
+            self._remover(caminho)
+            return None
+        metrics.incrementar("gepeto_snapshot_cache_total", resultado="hit")
+        # O mtime marca o último uso; as entradas menos usadas saem primeiro
+        os.utime(caminho)
+        return snapshot
+
+    def salvar(self, chave, snapshot):
+        """Grava o snapshot sem as diferenças de custo (elas só valem contra o snapshot anterior)."""
+        custos = copy.copy(snapshot.custos)
+        custos.alteracoes = []
+        snapshot = dataclasses.replace(snapshot, custos=custos, origem=None, etag=None, last_modified=None)
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            # Escreve em um arquivo temporário e troca, para nunca deixar um cache pela metade
+            descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+            with os.fdopen(descritor, "wb") as file:
+                pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, self._caminho(chave))
+        except OSError as e:
+            print(f"[CACHE] Não foi possível gravar o snapshot em cache: {e}")
+            return
+        self._podar()
+
+    def _podar(self):
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            if nome.endswith(".pickle"):
+                entradas.append((os.path.getmtime(caminho), caminho))
+        entradas.sort(reverse=True)
+        for _, caminho in entradas[self.max_entradas:]:
+            self._remover(caminho)
+
+    @staticmethod
+    def _remover(caminho):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+metrics.descrever("gepeto_snapshot_cache_total", "Leituras do cache de snapshots compilados, por resultado.")
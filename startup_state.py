@@ -0,0 +1,100 @@
+"""
+Estado de inicialização persistido entre restarts (arquivo JSON local).
+
+Guarda o hash da árvore de comandos sincronizada por último e os nomes das
+views persistentes registradas. Com isso o bot só chama `tree.sync()` quando
+os comandos mudam.
+
+O id da mensagem "Nova Encomenda" não é guardado: as views persistentes são
+registradas sem `message_id` e atendem o botão de qualquer guild pelo
+`custom_id`, então a inicialização não procura a mensagem em nenhum canal e
+não há id por guild a manter. A chave `mensagem_encomenda` de arquivos antigos
+é descartada na leitura.
+"""
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# Chaves de versões anteriores do estado, sem uso atual
+CHAVES_OBSOLETAS = ("mensagem_encomenda",)
+
+
+def hash_da_arvore(tree, guild=None):
+    """Hash estável do payload que `tree.sync()` enviaria ao Discord."""
+    payload = [comando.to_dict(tree) for comando in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda comando: (comando.get('type', 1), comando['name']))
+    serializado = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def medir_fase(nome):
+    """Loga e registra em métrica quanto tempo uma fase da inicialização levou."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        decorrido = time.perf_counter() - inicio
+        metrics.observar("gepeto_startup_phase_seconds", decorrido, fase=nome)
+        print(f"[STARTUP] {nome}: {decorrido * 1000:.0f}ms (RSS {metrics.memoria_rss() / 1e6:.1f} MB)")
+
+
+class StartupState:
+    def __init__(self, caminho="startup_state.json"):
+        self.caminho = caminho
+        self._dados = self._carregar()
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(os.getenv("STARTUP_STATE", "startup_state.json"))
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as file:
+                dados = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[STARTUP] Estado em '{self.caminho}' ignorado: {e}")
+            return {}
+        if not isinstance(dados, dict):
+            return {}
+        for chave in CHAVES_OBSOLETAS:
+            dados.pop(chave, None)
+        return dados
+
+    def _salvar(self):
+        # Escreve em um arquivo temporário e troca, para nunca deixar o estado pela metade
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as file:
+            json.dump(self._dados, file, indent=2, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+
+    def _atualizar(self, chave, valor):
+        if self._dados.get(chave) == valor:
+            return False
+        self._dados[chave] = valor
+        self._salvar()
+        return True
+
+    @property
+    def hash_comandos(self):
+        return self._dados.get('hash_comandos')
+
+    @hash_comandos.setter
+    def hash_comandos(self, valor):
+        self._atualizar('hash_comandos', valor)
+
+    @property
+    def views(self):
+        return list(self._dados.get('views', []))
+
+    def registrar_views(self, nomes):
+        return self._atualizar('views', sorted(nomes))
+
+
+metrics.descrever("gepeto_startup_phase_seconds", "Duração de cada fase da inicialização do bot.")
@@ -0,0 +1,13 @@
+import json
+import os
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def dados():
+    """O data.json distribuído com o bot."""
+    with open(os.path.join(RAIZ, "data.json"), "r", encoding="utf-8") as file:
+        return json.load(file)
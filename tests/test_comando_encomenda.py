@@ -0,0 +1,59 @@
+"""Parâmetros do comando /encomenda."""
+import asyncio
+import types
+
+import discord
+import pytest
+
+import cogs.encomendas as encomendas
+from bench.fake_discord import FakeInteraction, FakeUser
+from cogs.encomendas import EncomendaCog
+from guilds import GuildConfig
+from outbox import Outbox
+from snapshot import compilar_snapshot
+
+
+@pytest.fixture
+def comando(tmp_path, dados, monkeypatch):
+    snapshot = compilar_snapshot(dados, 1, "teste")
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+
+    async def obter(guild_id, versao=None):
+        return snapshot
+
+    particoes = types.SimpleNamespace(obter=obter, config=lambda guild_id: GuildConfig(guild_id, 1, 2))
+    pendentes = types.SimpleNamespace(namespace=lambda guild_id: {})
+    cog = EncomendaCog(types.SimpleNamespace(outbox=outbox), pendentes, particoes, estado=None)
+    previas = []
+
+    async def enviar_previa(interaction, bot, button_data, snapshot, nome, pombo, prazo, produtos_list, ramo):
+        previas.append(produtos_list)
+
+    monkeypatch.setattr(encomendas, "enviar_previa", enviar_previa)
+
+    def executar(**pares):
+        interacao = FakeInteraction(
+            discord.InteractionType.application_command, FakeUser("comprador", snapshot.permissoes), 1, guild_id=10
+        )
+        asyncio.run(EncomendaCog.encomenda.callback(cog, interacao, "Comprador", "1", "amanhã", **pares))
+        return interacao
+
+    yield executar, previas, sorted(snapshot.grafo.produz)
+    outbox.fechar()
+
+
+def test_usa_os_parametros_declarados(comando):
+    executar, previas, produtos = comando
+    executar(produto_1=produtos[0], quantidade_1=3, produto_2=produtos[1], quantidade_2=7, produto_3=produtos[0], quantidade_3=2)
+    assert previas == [[{'name': produtos[0], 'quantity': 5}, {'name': produtos[1], 'quantity': 7}]]
+
+
+@pytest.mark.parametrize("pares", [
+    {"quantidade_2": None, "produto_2": "X"},
+    {"produto_2": None, "quantidade_2": 4},
+])
+def test_par_incompleto_e_recusado(comando, pares):
+    executar, previas, produtos = comando
+    interacao = executar(produto_1=produtos[0], quantidade_1=1, **pares)
+    assert previas == []
+    assert "par(es) 2 incompleto(s)" in interacao._original.content
@@ -0,0 +1,105 @@
+"""Confirmação de encomenda: a encomenda pendente só sai do store quando tudo foi registrado."""
+import asyncio
+import sqlite3
+import types
+
+import pytest
+
+from bench.fake_discord import FakeChannel, FakeInteraction, FakeUser
+from cogs.encomendas import EncomendaCog
+from cogs.order_plan import planejar_do_snapshot
+from guilds import ID_CANAL_PUBLICO, GuildConfig
+from inventory import InventoryLedger
+from order_history import OrderHistory
+from outbox import Outbox
+from pending_orders import PendingOrderStore
+from plan_cache import PlanCache
+from snapshot import compilar_snapshot
+from workers import WorkerPool
+
+GUILD = 10
+
+
+@pytest.fixture
+def cenario(tmp_path, dados):
+    snapshot = compilar_snapshot(dados, 1, "teste")
+    produto = sorted(snapshot.grafo.produz)[0]
+    bot = types.SimpleNamespace(
+        estoque=InventoryLedger(str(tmp_path / "inventory.db")),
+        historico=OrderHistory(str(tmp_path / "history.db")),
+        outbox=Outbox(str(tmp_path / "outbox.db")),
+        planos=PlanCache(),
+        workers=WorkerPool("thread", max_workers=1),
+    )
+    pendentes = PendingOrderStore(str(tmp_path / "pending.db"))
+
+    async def obter(guild_id, versao=None):
+        return snapshot
+
+    particoes = types.SimpleNamespace(obter=obter, config=lambda guild_id: GuildConfig(guild_id, 1, ID_CANAL_PUBLICO))
+    cog = EncomendaCog(bot, pendentes, particoes, estado=None)
+    cog.publicador.avisar = lambda: None
+
+    estoque = bot.estoque.namespace(GUILD)
+    estoque.definir(produto, 5)
+    plano = planejar_do_snapshot(snapshot, [{'name': produto, 'quantity': 20}], estoque.saldos(), estoque.versao)
+    mensagem = asyncio.run(FakeChannel(1, guild_id=GUILD).send(content="prévia"))
+    pendentes.namespace(GUILD)[mensagem.id] = {
+        'name': "Comprador", 'pombo': "1", 'prazo': "amanhã", 'venda': None,
+        'produtos': [{'name': produto, 'quantity': 20}], 'plano': plano.para_dict(),
+    }
+    yield bot, cog, pendentes.namespace(GUILD), mensagem, produto, plano
+    for store in (bot.estoque, bot.historico, bot.outbox, bot.workers, pendentes):
+        store.fechar()
+
+
+def _falhar(*args, **kwargs):
+    raise sqlite3.OperationalError("database is locked")
+
+
+def _confirmar(cog, mensagem):
+    interacao = FakeInteraction.componente(FakeUser("comprador"), mensagem, "confirmar_encomenda")
+    asyncio.run(cog._tratar_interacao(interacao, "confirmar_encomenda"))
+    return interacao
+
+
+def test_confirmacao_registra_tudo(cenario):
+    bot, cog, pendentes, mensagem, produto, plano = cenario
+    _confirmar(cog, mensagem)
+    assert mensagem.id not in pendentes
+    esperado = 5 - plano.consumo_estoque.get(produto, 0) + plano.sobras.get(produto, 0)
+    assert bot.estoque.saldo(GUILD, produto) == esperado
+    assert (len(bot.outbox), len(bot.historico)) == (1, 1)
+
+
+@pytest.mark.parametrize("falha", ["registrar_encomenda", "enfileirar", "registrar"])
+def test_falha_de_sqlite_mantem_a_encomenda_pendente(cenario, falha, monkeypatch):
+    bot, cog, pendentes, mensagem, produto, _ = cenario
+    if falha == "registrar_encomenda":
+        monkeypatch.setattr(bot.estoque, "aplicar", _falhar)
+    else:
+        monkeypatch.setattr({"enfileirar": bot.outbox, "registrar": bot.historico}[falha], falha, _falhar)
+
+    interacao = _confirmar(cog, mensagem)
+    assert mensagem.id in pendentes
+    assert "Tente confirmar de novo" in interacao._original.content
+    assert bot.estoque.saldo(GUILD, produto) == 5
+    assert (len(bot.outbox), len(bot.historico)) == (0, 0)
+
+    # Sem a falha, a mesma encomenda é confirmada normalmente (o estorno mudou a versão do estoque: o plano é refeito)
+    monkeypatch.undo()
+    _confirmar(cog, mensagem)
+    assert mensagem.id not in pendentes
+    assert (len(bot.outbox), len(bot.historico)) == (1, 1)
+
+
+def test_pool_quebrado_mantem_a_encomenda_pendente(cenario, monkeypatch):
+    bot, cog, pendentes, mensagem, _, _ = cenario
+
+    async def pool_quebrado(interaction, data):
+        raise RuntimeError("cannot schedule new futures after shutdown")
+
+    monkeypatch.setattr(cog, "_plano_da_encomenda", pool_quebrado)
+    _confirmar(cog, mensagem)
+    assert mensagem.id in pendentes
+    assert (len(bot.outbox), len(bot.historico)) == (0, 0)
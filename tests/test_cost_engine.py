@@ -0,0 +1,58 @@
+"""Recalculo incremental do CostEngine (`com_precos` / `com_variacoes`)."""
+import random
+
+import numpy as np
+import pytest
+
+from cogs.cost_engine import CostEngine
+from cogs.price_index import PriceIndex
+from cogs.recipe_graph import RecipeGraph
+
+
+@pytest.fixture(scope="module")
+def motor(dados):
+    grafo = RecipeGraph(dados["receitas_crafting"])
+    return CostEngine(grafo, PriceIndex(dados["precos"], craftaveis=grafo.produz))
+
+
+def _variacoes(motor, semente, n=8):
+    rng = random.Random(semente)
+    itens = rng.sample(sorted(motor.estrutura.indice), n)
+    variacoes = {}
+    for item in itens:
+        if rng.random() < 0.2:
+            variacoes[item] = None
+        else:
+            minimo = round(rng.uniform(0.1, 50), 2)
+            variacoes[item] = (minimo, round(minimo * rng.uniform(1, 2), 2))
+    return variacoes
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_incremental_igual_ao_calculo_completo(motor, semente):
+    incremental = motor.com_variacoes(_variacoes(motor, semente))
+    completo = CostEngine(motor.grafo, incremental.precos)
+    np.testing.assert_allclose(incremental.custo, completo.custo)
+    np.testing.assert_allclose(incremental.custo_craft, completo.custo_craft)
+    assert incremental.tabela() == completo.tabela()
+
+
+def test_alteracoes_so_a_jusante_do_preco(motor):
+    material = next(
+        item for item in motor.grafo.ordem
+        if item not in motor.grafo.produz and motor.grafo.reversas.get(item) and motor.precos.get(item)
+    )
+    preco = motor.precos[material]
+    novo = motor.com_variacoes({material: (preco.min * 2 + 1, preco.max * 2 + 1)})
+
+    alterados = {a.item for a in novo.alteracoes}
+    assert alterados
+    assert alterados <= motor.grafo.dependentes([material])
+    for alteracao in novo.alteracoes:
+        assert alteracao.custo_depois[0] > alteracao.custo_antes[0]
+
+
+def test_mesmos_precos_nao_alteram_nada(motor):
+    novo = motor.com_precos(motor.precos)
+    assert novo.alteracoes == []
+    np.testing.assert_array_equal(novo.custo, motor.custo)
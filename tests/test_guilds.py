@@ -0,0 +1,22 @@
+"""Sobreposições de preços por guild."""
+from cogs.price_index import PriceIndex
+from guilds import _mesclar_precos
+
+
+def test_sobreposicao_vence_todas_as_categorias_do_base():
+    base = {
+        "ferraria": {"min": {"Lingote de Ferro": 2.0}},
+        "minerios": {"range": {"Lingote de Ferro": {"min": 1.0, "max": 3.0}, "Carvão": {"min": 0.5, "max": 0.6}}},
+    }
+    precos = _mesclar_precos(base, {"minerios": {"min": {"Lingote de Ferro": 9.0}}})
+
+    indice = PriceIndex(precos)
+    assert indice["Lingote de Ferro"][:2] == (9.0, 9.0)
+    assert indice["Carvão"][:2] == (0.5, 0.6)
+    # O catálogo base não é alterado
+    assert base["ferraria"]["min"] == {"Lingote de Ferro": 2.0}
+
+
+def test_categoria_nova_na_sobreposicao():
+    precos = _mesclar_precos({"ferraria": {"min": {"Prego": 1.0}}}, {"extra": {"range": {"Prego": {"min": 2.0, "max": 4.0}}}})
+    assert PriceIndex(precos)["Prego"][:2] == (2.0, 4.0)
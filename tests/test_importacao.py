@@ -0,0 +1,95 @@
+"""Importação de encomendas em lote (cogs/importacao.py e /importar-encomendas)."""
+import asyncio
+import json
+import types
+
+import discord
+import pytest
+
+from bench.fake_discord import FakeInteraction, FakeUser
+from cogs.encomendas import EncomendaCog
+from cogs.importacao import MAX_BYTES_ARQUIVO, importar_encomendas, ler_linhas
+from guilds import GuildConfig
+from inventory import InventoryLedger
+from outbox import Outbox
+from snapshot import compilar_snapshot
+from workers import WorkerPool
+
+
+@pytest.fixture(scope="module")
+def snapshot(dados):
+    return compilar_snapshot(dados, 1, "teste")
+
+
+@pytest.mark.parametrize("nome, conteudo", [
+    ("pedidos.csv", b"pedido,produto,quantidade\nA,X,1\nB,Y,2\n"),
+    ("pedidos.json", b'[{"pedido": "A", "produto": "X", "quantidade": 1}, {"pedido": "B", "produto": "Y", "quantidade": 2}]'),
+    ("pedidos.json", b'{"encomendas": [{"pedido": "A", "produtos": [{"name": "X", "quantity": 1}]},'
+                     b' {"pedido": "B", "produtos": [{"name": "Y", "quantity": 2}]}]}'),
+    ("pedidos.jsonl", b'{"pedido": "A", "produto": "X", "quantidade": 1}\n\n{"pedido": "B", "produto": "Y", "quantidade": 2}\n'),
+    # JSON Lines salvo com extensão .json
+    ("pedidos.json", b'{"pedido": "A", "produto": "X", "quantidade": 1}\n{"pedido": "B", "produto": "Y", "quantidade": 2}\n'),
+])
+def test_formatos_aceitos(nome, conteudo):
+    registros = [registro for _, registro in ler_linhas(conteudo, nome)]
+    normalizados = [
+        {chave: str(valor) for chave, valor in registro.items() if chave in ("pedido", "produto", "name")}
+        for registro in registros
+    ]
+    assert [r.get("produto") or r.get("name") for r in normalizados] == ["X", "Y"]
+    assert [r["pedido"] for r in normalizados] == ["A", "B"]
+
+
+@pytest.mark.parametrize("conteudo", [b'[{"a": 1} {"b": 2}]', b'[{"a": 1}] x', b'5', b'{"a":'])
+def test_json_invalido(conteudo):
+    with pytest.raises(ValueError):
+        list(ler_linhas(conteudo, "pedidos.json"))
+
+
+def test_arquivo_grande_e_recusado():
+    with pytest.raises(ValueError, match="muito grande"):
+        ler_linhas(b" " * (MAX_BYTES_ARQUIVO + 1), "pedidos.csv")
+
+
+def test_plano_unico_com_linhas_invalidas(snapshot):
+    produtos = sorted(snapshot.grafo.produz)[:2]
+    linhas = [{"pedido": "A", "produto": produtos[0], "quantidade": 10},
+              {"pedido": "B", "produto": produtos[1], "quantidade": 5},
+              {"pedido": "B", "produto": "Inexistente", "quantidade": 1},
+              {"pedido": "C", "produto": produtos[0], "quantidade": 0}]
+    conteudo = "\n".join(json.dumps(linha) for linha in linhas).encode()
+    resultado = importar_encomendas(conteudo, "pedidos.jsonl", snapshot)
+
+    assert [r.pedido for r in resultado.pedidos] == ["A", "B"]
+    assert dict(resultado.plano.produtos) == {produtos[0]: 10, produtos[1]: 5}
+    assert resultado.total_erros == 2
+    assert resultado.linhas_lidas == 4
+
+
+def test_falha_ao_baixar_o_anexo_e_respondida(tmp_path, snapshot):
+    bot = types.SimpleNamespace(
+        outbox=Outbox(str(tmp_path / "outbox.db")),
+        estoque=InventoryLedger(str(tmp_path / "inventory.db")),
+        workers=WorkerPool("thread", max_workers=1),
+    )
+
+    async def obter(guild_id, versao=None):
+        return snapshot
+
+    particoes = types.SimpleNamespace(obter=obter, config=lambda guild_id: GuildConfig(guild_id, 1, 2))
+    cog = EncomendaCog(bot, None, particoes, estado=None)
+
+    async def anexo_removido():
+        resposta = types.SimpleNamespace(status=404, reason="Not Found")
+        raise discord.NotFound(resposta, "Unknown Attachment")
+
+    arquivo = types.SimpleNamespace(size=100, filename="pedidos.csv", read=anexo_removido)
+    interacao = FakeInteraction(
+        discord.InteractionType.application_command, FakeUser("comprador", snapshot.permissoes), 1, guild_id=10
+    )
+    asyncio.run(EncomendaCog.importar_encomendas.callback(cog, interacao, arquivo))
+
+    assert "Não foi possível baixar o arquivo" in interacao.followup.mensagens[-1].content
+    bot.outbox.fechar()
+    bot.estoque.fechar()
+    bot.workers.fechar()
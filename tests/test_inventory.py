@@ -0,0 +1,53 @@
+"""Estoque por guild (InventoryLedger) e a migração do estoque global."""
+import sqlite3
+
+from inventory import InventoryLedger
+
+
+def test_guilds_nao_compartilham_estoque(tmp_path):
+    ledger = InventoryLedger(str(tmp_path / "inventory.db"), guild_legado=1)
+    a, b = ledger.namespace(10), ledger.namespace(20)
+    a.definir("Lingote de Ferro", 50)
+    b.ajustar("Lingote de Ferro", 5)
+    a.registrar_encomenda({"Lingote de Ferro": 30}, {"Pó de Ferro": 2}, "encomenda")
+
+    assert a.saldos() == {"Lingote de Ferro": 20, "Pó de Ferro": 2}
+    assert b.saldos() == {"Lingote de Ferro": 5}
+    assert (a.versao, b.versao, ledger.versao(30)) == (2, 1, 0)
+    assert len(ledger) == 3
+    ledger.fechar()
+
+    # Recarregado do banco, cada guild mantém o próprio saldo
+    ledger = InventoryLedger(str(tmp_path / "inventory.db"), guild_legado=1)
+    assert ledger.saldos(10) == {"Lingote de Ferro": 20, "Pó de Ferro": 2}
+    assert ledger.saldos(20) == {"Lingote de Ferro": 5}
+    ledger.fechar()
+
+
+def test_consumo_alem_do_saldo_zera(tmp_path):
+    ledger = InventoryLedger(str(tmp_path / "inventory.db"))
+    estoque = ledger.namespace(10)
+    estoque.definir("Carvão", 3)
+    assert estoque.ajustar("Carvão", -10) == 0
+    assert estoque.saldos() == {}
+    ledger.fechar()
+
+
+def test_migra_estoque_global_para_a_guild_legada(tmp_path):
+    caminho = str(tmp_path / "inventory.db")
+    conn = sqlite3.connect(caminho)
+    conn.execute("CREATE TABLE estoque (item TEXT PRIMARY KEY, quantidade REAL NOT NULL)")
+    conn.execute(
+        "CREATE TABLE movimentos (id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT NOT NULL,"
+        " delta REAL NOT NULL, motivo TEXT, criado_em REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO estoque VALUES ('Carvão', 7)")
+    conn.execute("INSERT INTO movimentos (item, delta, motivo, criado_em) VALUES ('Carvão', 7, 'contagem', 0)")
+    conn.commit()
+    conn.close()
+
+    ledger = InventoryLedger(caminho, guild_legado=99)
+    assert ledger.saldos(99) == {"Carvão": 7}
+    assert ledger.saldos(10) == {}
+    assert ledger._conn.execute("SELECT DISTINCT guild_id FROM movimentos").fetchall() == [(99,)]
+    ledger.fechar()
@@ -0,0 +1,54 @@
+"""Empacotamento dos crafts em solicitações (cogs/lot_packing.py)."""
+import math
+
+import pytest
+
+from cogs.lot_packing import empacotar_lotes, peso_do_craft, total_de_solicitacoes
+from cogs.rateio import calcular_lotes
+from cogs.recipe_graph import RecipeGraph
+
+
+@pytest.fixture(scope="module")
+def grafo(dados):
+    return RecipeGraph(dados["receitas_crafting"])
+
+
+def _necessidades(grafo, quantidades):
+    produtos = sorted(grafo.produz, key=lambda item: -grafo.niveis[item])
+    return grafo.expandir([(produto, q) for produto, q in zip(produtos, quantidades)]).intermediarios
+
+
+@pytest.mark.parametrize("quantidades", [(1,), (10, 250, 7), (5000, 1, 320, 64, 99)])
+@pytest.mark.parametrize("craft_size", [64, 400])
+def test_solicitacoes_cobrem_os_crafts_e_respeitam_a_capacidade(grafo, quantidades, craft_size):
+    necessidades = _necessidades(grafo, quantidades)
+    etapas = empacotar_lotes(necessidades, grafo, craft_size)
+
+    feitos = {}
+    for etapa in etapas:
+        for solicitacao in etapa.solicitacoes:
+            carga = sum(peso_do_craft(grafo, item) * crafts for item, crafts in solicitacao.crafts)
+            assert carga == solicitacao.carga
+            # Um craft mais pesado que a solicitação vai sozinho
+            assert carga <= craft_size or len(solicitacao.crafts) == 1 and solicitacao.crafts[0][1] == 1
+            for item, crafts in solicitacao.crafts:
+                feitos[item] = feitos.get(item, 0) + crafts * solicitacao.repeticoes
+    esperado = {
+        item: math.ceil(math.ceil(demanda) / grafo.produz[item])
+        for item, demanda in necessidades.items() if demanda > 0
+    }
+    assert feitos == esperado
+
+    # Nunca mais solicitações do que lotes separados por item
+    separados = sum(
+        lotes.repeticoes + (1 if lotes.resto else 0)
+        for lotes in (calcular_lotes(item, math.ceil(d), grafo, craft_size) for item, d in necessidades.items() if d > 0)
+    )
+    assert total_de_solicitacoes(etapas) <= separados
+
+
+def test_etapas_seguem_os_niveis(grafo):
+    etapas = empacotar_lotes(_necessidades(grafo, (300, 40)), grafo, 400)
+    assert [etapa.nivel for etapa in etapas] == sorted({etapa.nivel for etapa in etapas})
+    for etapa in etapas:
+        assert {grafo.niveis[item] for item, _ in etapa.itens} == {etapa.nivel}
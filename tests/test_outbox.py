@@ -0,0 +1,93 @@
+"""Fila de saída das publicações (outbox.py)."""
+import asyncio
+import sqlite3
+import time
+
+import discord
+
+from outbox import PUBLICADA, Outbox, Publicador
+
+
+def test_mesma_chave_coalesce(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    primeiro = outbox.enfileirar("encomenda:1", 10, {"n": 1})
+    assert outbox.enfileirar("encomenda:1", 10, {"n": 2}) == primeiro
+    assert len(outbox) == 1
+    assert [item['dados'] for item in outbox.proximas()] == [{"n": 1}]
+    outbox.fechar()
+
+
+def test_cancelar_retira_so_publicacoes_pendentes(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    outbox.enfileirar("encomenda:1", 10, {})
+    outbox.concluir(outbox.enfileirar("encomenda:2", 10, {}), 99)
+    outbox.cancelar("encomenda:1")
+    outbox.cancelar("encomenda:2")
+    assert len(outbox) == 0
+    assert outbox._conn.execute("SELECT chave FROM saida").fetchall() == [("encomenda:2",)]
+    outbox.fechar()
+
+
+def test_publicadas_antigas_sao_apagadas(tmp_path):
+    caminho = str(tmp_path / "outbox.db")
+    outbox = Outbox(caminho, retencao_dias=7)
+    outbox.concluir(outbox.enfileirar("antiga", 10, {}), 1)
+    outbox.concluir(outbox.enfileirar("recente", 10, {}), 2)
+    outbox.enfileirar("pendente", 10, {})
+    with outbox._conn:
+        outbox._conn.execute("UPDATE saida SET publicada_em = ? WHERE chave = 'antiga'", (time.time() - 8 * 86400,))
+    outbox.fechar()
+
+    outbox = Outbox(caminho, retencao_dias=7)
+    chaves = {chave for chave, in outbox._conn.execute("SELECT chave FROM saida")}
+    assert chaves == {"recente", "pendente"}
+    assert len(outbox) == 1
+    outbox.fechar()
+
+
+def test_banco_sem_publicada_em_e_migrado(tmp_path):
+    caminho = str(tmp_path / "outbox.db")
+    conn = sqlite3.connect(caminho)
+    conn.execute(
+        "CREATE TABLE saida (id INTEGER PRIMARY KEY AUTOINCREMENT, chave TEXT NOT NULL UNIQUE,"
+        " canal_id INTEGER NOT NULL, dados TEXT NOT NULL, estado TEXT NOT NULL,"
+        " tentativas INTEGER NOT NULL DEFAULT 0, proxima_tentativa REAL NOT NULL,"
+        " criado_em REAL NOT NULL, message_id INTEGER, ultimo_erro TEXT)"
+    )
+    conn.execute("INSERT INTO saida (chave, canal_id, dados, estado, proxima_tentativa, criado_em)"
+                 " VALUES ('velha', 10, '{}', ?, 0, 0)", (PUBLICADA,))
+    conn.commit()
+    conn.close()
+
+    outbox = Outbox(caminho, retencao_dias=7)
+    # Sem a data da publicação, a retenção conta a partir da migração
+    assert outbox._conn.execute("SELECT publicada_em IS NOT NULL FROM saida").fetchone() == (1,)
+    outbox.fechar()
+
+
+def test_publicador_conclui_e_descarta_erros_permanentes(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    outbox.enfileirar("ok", 10, {})
+    outbox.enfileirar("sem-permissao", 20, {})
+    falhas = []
+
+    async def publicar(item):
+        if item['canal_id'] == 20:
+            raise discord.Forbidden(type("Resposta", (), {"status": 403, "reason": "Forbidden"})(), "sem permissão")
+        return 1234
+
+    async def ao_falhar(item, erro):
+        falhas.append(item['chave'])
+
+    async def executar():
+        publicador = Publicador(outbox, publicar, erros_permanentes=(discord.Forbidden,), ao_falhar=ao_falhar)
+        publicador.iniciar()
+        while len(outbox):
+            await asyncio.sleep(0.01)
+        await publicador.parar()
+
+    asyncio.run(asyncio.wait_for(executar(), 5))
+    estados = dict(outbox._conn.execute("SELECT chave, estado FROM saida"))
+    assert estados == {"ok": PUBLICADA, "sem-permissao": "falhou"}
+    assert falhas == ["sem-permissao"]
+    outbox.fechar()
@@ -0,0 +1,70 @@
+"""Encomendas pendentes por guild (PendingOrderStore) e a migração das entradas sem guild."""
+import sqlite3
+import time
+
+from pending_orders import PendingOrderStore
+
+
+def test_namespaces_isolados(tmp_path):
+    store = PendingOrderStore(str(tmp_path / "pending.db"), max_por_guild=2)
+    a, b = store.namespace(10), store.namespace(20)
+    a[1] = {"nome": "a1"}
+    b[2] = {"nome": "b2"}
+    assert 2 not in a and a.get(2) is None
+    assert b.pop(1) is None and 1 in a
+
+    # O limite por guild despeja só a mais antiga da própria guild
+    a[3] = {"nome": "a3"}
+    a[4] = {"nome": "a4"}
+    assert 1 not in a and 2 in b
+    assert (len(a), len(b)) == (2, 1)
+    store.fechar()
+
+
+def test_entradas_persistem(tmp_path):
+    caminho = str(tmp_path / "pending.db")
+    store = PendingOrderStore(caminho)
+    store.namespace(10)[1] = {"nome": "a1"}
+    store.fechar()
+
+    store = PendingOrderStore(caminho)
+    assert store.namespace(10).pop(1) == {"nome": "a1"}
+    assert len(store) == 0
+    store.fechar()
+
+
+def test_entradas_sem_guild_vao_para_a_guild_legada(tmp_path):
+    caminho = str(tmp_path / "pending.db")
+    conn = sqlite3.connect(caminho)
+    conn.execute("CREATE TABLE pendentes (message_id INTEGER PRIMARY KEY, dados TEXT NOT NULL, expira_em REAL NOT NULL)")
+    conn.execute("INSERT INTO pendentes VALUES (1, '{\"nome\": \"antiga\"}', ?)", (time.time() + 600,))
+    conn.commit()
+    conn.close()
+
+    store = PendingOrderStore(caminho, guild_legado=99)
+    assert store.namespace(99).get(1) == {"nome": "antiga"}
+    assert store.namespace(0).get(1) is None
+    store[2] = {"nome": "sem guild"}
+    assert store.namespace(99).get(2) == {"nome": "sem guild"}
+    store.fechar()
+
+
+def test_entradas_expiram_pelo_ttl(tmp_path, monkeypatch):
+    store = PendingOrderStore(str(tmp_path / "pending.db"), ttl=60)
+    store[1] = {"nome": "a"}
+    agora = time.time()
+    monkeypatch.setattr(time, "time", lambda: agora + 61)
+    assert store.get(1) is None
+    assert (len(store), store.expirados) == (0, 1)
+    store.fechar()
+
+
+def test_limite_total_despeja_a_menos_usada(tmp_path):
+    store = PendingOrderStore(str(tmp_path / "pending.db"), max_itens=2, max_por_guild=0)
+    store.namespace(10)[1] = {"nome": "a"}
+    store.namespace(20)[2] = {"nome": "b"}
+    assert store.namespace(10).get(1) is not None  # 1 passa a ser a mais recente
+    store.namespace(30)[3] = {"nome": "c"}
+    assert 2 not in store and 1 in store and 3 in store
+    assert store.evictions == 1
+    store.fechar()
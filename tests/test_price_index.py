@@ -0,0 +1,97 @@
+"""
+Preços e custos do data.json comparados com os números do cálculo original
+(tests/dados/baseline_precos.json, gerado pelo `find_price` /
+`calcular_custo_craft` / `calcular_custo_de_materiais` de antes do PriceIndex).
+"""
+import json
+import os
+
+import pytest
+
+from cogs.calculator import calcular_custo_craft, calcular_custo_de_materiais, find_price
+from cogs.cost_engine import CostEngine
+from cogs.price_index import PriceIndex
+from cogs.recipe_graph import RecipeGraph
+
+with open(os.path.join(os.path.dirname(__file__), "dados", "baseline_precos.json"), encoding="utf-8") as _file:
+    BASELINE = json.load(_file)
+
+
+@pytest.fixture(params=["com settings", "sem precos-fallback"])
+def catalogo(request, dados):
+    """Grafo e índice do data.json, com e sem `settings.precos-fallback` (como num payload da API)."""
+    fallback = dados["settings"].get("precos-fallback") if request.param == "com settings" else None
+    grafo = RecipeGraph(dados["receitas_crafting"])
+    return grafo, PriceIndex(dados["precos"], fallback, craftaveis=grafo.produz)
+
+
+@pytest.mark.parametrize("item", sorted(BASELINE))
+def test_find_price_igual_ao_baseline(catalogo, item):
+    _, precos = catalogo
+    assert list(find_price(item, precos)) == BASELINE[item]["find_price"]
+
+
+@pytest.mark.parametrize("item", sorted(BASELINE))
+def test_custo_craft_igual_ao_baseline(catalogo, item):
+    grafo, precos = catalogo
+    assert list(calcular_custo_craft(item, 24, grafo, precos)) == pytest.approx(BASELINE[item]["custo_craft_24"])
+
+
+@pytest.mark.parametrize("item", sorted(BASELINE))
+def test_cost_engine_igual_ao_baseline(catalogo, item):
+    grafo, precos = catalogo
+    if item not in grafo.posicao:
+        pytest.skip("o motor só cobre os itens das receitas")
+    custo_min, custo_max = CostEngine(grafo, precos).custo_unitario(item)
+    assert [round(custo_min * 24, 2), round(custo_max * 24, 2)] == pytest.approx(BASELINE[item]["custo_craft_24"])
+
+
+@pytest.mark.parametrize("item", sorted(item for item, numeros in BASELINE.items() if "custo_materiais_24" in numeros))
+def test_custo_de_materiais_igual_ao_baseline(catalogo, item):
+    # As matérias-primas vêm da expansão original: aqui só a regra de preço é comparada
+    _, precos = catalogo
+    assert calcular_custo_de_materiais(BASELINE[item]["materiais_24"], precos) == pytest.approx(BASELINE[item]["custo_materiais_24"])
+
+
+PRECOS = {
+    "mineradora": {"min": {"Qualquer Minério": 0.5, "Cobre": 2.0}},
+    "ferraria": {"min": {"Cobre": 9.0}, "range": {"Prego": {"min": 1.0, "max": 1.5}, "Cobre": {"min": 8.0, "max": 9.5}}},
+}
+RECEITAS = {
+    "Lingote": {"produz": 1, "materiais": [{"nome": "Minério de Ferro", "quantidade": 2}]},
+    "Farelo de Minério": {"produz": 2, "materiais": [{"nome": "Minério de Ferro", "quantidade": 1}]},
+}
+
+
+def test_primeira_categoria_vence_e_min_fixa_a_faixa():
+    precos = PriceIndex(PRECOS)
+    assert precos["Cobre"] == (2.0, 2.0, "mineradora")
+    assert precos["Prego"] == (1.0, 1.5, "ferraria")
+
+
+def test_fallback_so_vale_para_materias_primas():
+    fallback = {"Qualquer Minério": ["Minério de Ferro", "Farelo de Minério"]}
+    grafo = RecipeGraph(RECEITAS)
+    precos = PriceIndex(PRECOS, fallback, craftaveis=grafo.produz)
+
+    # Consultas gerais só veem preços próprios
+    assert "Minério de Ferro" not in precos
+    assert find_price("Minério de Ferro", precos) == (None, None)
+    # A matéria-prima usa a referência; o item com receita nunca
+    assert precos.custo_materia_prima("Minério de Ferro") == (0.5, 0.5)
+    assert precos.preco_materia_prima("Farelo de Minério") is None
+    assert calcular_custo_de_materiais({"Minério de Ferro": 4}, precos) == 2.0
+    # O custo de craft segue a regra original: matéria-prima sem preço próprio custa 0
+    assert calcular_custo_craft("Farelo de Minério", 2, grafo, precos) == (0, 0)
+
+
+def test_sem_settings_nao_ha_fallback():
+    precos = PriceIndex(PRECOS)
+    assert precos.custo_materia_prima("Minério de Cobre") == (0.0, 0.0)
+
+
+def test_variacoes_removem_a_referencia():
+    precos = PriceIndex(PRECOS, {"Qualquer Minério": ["Minério de Ferro"]})
+    simulado = precos.com_variacoes({"Qualquer Minério": None})
+    assert simulado.custo_materia_prima("Minério de Ferro") == (0.0, 0.0)
+    assert precos.custo_materia_prima("Minério de Ferro") == (0.5, 0.5)
@@ -0,0 +1,34 @@
+"""Encomendas publicadas (published_orders.py)."""
+import time
+
+from published_orders import PublishedOrderStore
+
+
+def test_publicadas_sobrevivem_ao_restart(tmp_path):
+    caminho = str(tmp_path / "published.db")
+    store = PublishedOrderStore(caminho, max_cache=1)
+    store[1] = {"name": "A"}
+    store[2] = {"name": "B"}
+    # A primeira já saiu do cache LRU e volta do banco
+    assert store.get(1) == {"name": "A"}
+    store.fechar()
+
+    store = PublishedOrderStore(caminho)
+    assert store.get(2) == {"name": "B"}
+    assert 3 not in store and store.get(3, "nada") == "nada"
+    assert len(store) == 2
+    store.fechar()
+
+
+def test_retencao_apaga_as_antigas(tmp_path):
+    caminho = str(tmp_path / "published.db")
+    store = PublishedOrderStore(caminho, retencao_dias=30)
+    store[1] = {"name": "antiga"}
+    store[2] = {"name": "recente"}
+    with store._conn:
+        store._conn.execute("UPDATE publicadas SET publicada_em = ? WHERE message_id = 1", (time.time() - 31 * 86400,))
+    store.fechar()
+
+    store = PublishedOrderStore(caminho, retencao_dias=30)
+    assert 1 not in store and 2 in store
+    store.fechar()
@@ -0,0 +1,64 @@
+"""Grafo de receitas e a expansão das encomendas (cogs/recipe_graph.py)."""
+import pytest
+
+from cogs.recipe_graph import RecipeGraph
+
+
+def _receita(produz, **materiais):
+    return {'produz': produz, 'materiais': [{'nome': nome, 'quantidade': qtd} for nome, qtd in materiais.items()]}
+
+
+# Espada <- Lâmina + Cabo; Lâmina <- Lingote; Cabo <- Madeira + Lingote; Lingote <- Minério
+RECEITAS = {
+    "Espada": _receita(1, Lamina=1, Cabo=1),
+    "Lamina": _receita(2, Lingote=3),
+    "Cabo": _receita(4, Madeira=2, Lingote=1),
+    "Lingote": _receita(5, Minerio=10),
+}
+
+
+@pytest.fixture
+def grafo():
+    return RecipeGraph(RECEITAS)
+
+
+def test_ordem_topologica_e_niveis(grafo):
+    for item in grafo.produz:
+        for material, _ in grafo.arestas[item]:
+            assert grafo.posicao[item] < grafo.posicao[material]
+    assert grafo.niveis == {"Lingote": 1, "Lamina": 2, "Cabo": 2, "Espada": 3}
+    assert grafo.ordem_de_craft(["Lingote", "Espada", "Minerio"]) == ["Espada", "Lingote"]
+
+
+def test_ciclo_e_recusado():
+    with pytest.raises(ValueError, match="Ciclo"):
+        RecipeGraph({"A": _receita(1, B=1), "B": _receita(1, A=1)})
+
+
+def test_demanda_e_somada_antes_do_ceil(grafo):
+    expansao = grafo.expandir([{'name': "Espada", 'quantity': 3}])
+    # Lâmina: 3 -> 2 crafts (6 Lingote); Cabo: 3 -> 1 craft (1 Lingote); Lingote: 7 -> 2 crafts
+    assert expansao.crafts == {"Espada": 3, "Lamina": 2, "Cabo": 1, "Lingote": 2}
+    assert dict(expansao.brutos) == {"Madeira": 2, "Minerio": 20}
+    assert expansao.sobras == {"Lamina": 1, "Cabo": 1, "Lingote": 3}
+
+
+def test_estoque_abatido_em_qualquer_nivel(grafo):
+    expansao = grafo.expandir([("Espada", 3)], estoque={"Lamina": 3, "Lingote": 1, "Madeira": 100})
+    assert "Lamina" not in expansao.crafts
+    assert expansao.consumo == {"Lamina": 3, "Lingote": 1, "Madeira": 2}
+    assert expansao.crafts == {"Espada": 3, "Cabo": 1}
+    assert dict(expansao.brutos) == {}
+
+
+def test_item_sem_receita_e_materia_prima(grafo):
+    expansao = grafo.expandir([("Desconhecido", 4), ("Minerio", 1)])
+    assert dict(expansao.brutos) == {"Desconhecido": 4, "Minerio": 1}
+    assert not expansao.crafts
+
+
+def test_dependentes_e_materiais(grafo):
+    assert grafo.dependentes(["Lingote"]) == {"Lamina", "Cabo", "Espada"}
+    assert grafo.materiais(["Cabo"]) == {"Madeira", "Lingote", "Minerio"}
+    assert RecipeGraph.de(grafo) is grafo
+    assert dict(grafo) == RECEITAS
@@ -0,0 +1,80 @@
+"""Agenda de produção nas estações de craft (cogs/scheduler.py)."""
+import json
+
+import pytest
+
+from cogs.lot_packing import empacotar_lotes
+from cogs.recipe_graph import RecipeGraph
+from cogs.scheduler import Cronograma, Execucao, Tarefa, agendar_producao, expandir, formatar_linha_do_tempo
+
+
+@pytest.fixture(scope="module")
+def grafo(dados):
+    return RecipeGraph(dados["receitas_crafting"])
+
+
+def _necessidades(grafo, quantidade):
+    produto = sorted(grafo.produz)[0]
+    return grafo.expandir([{'name': produto, 'quantity': quantidade}]).intermediarios
+
+
+@pytest.mark.parametrize("estacoes", [1, 3])
+def test_tarefas_respeitam_dependencias_e_estacoes(grafo, dados, estacoes):
+    necessidades = _necessidades(grafo, 5000)
+    cronograma = agendar_producao(necessidades, grafo, dados["settings"]["craft-size"], estacoes)
+
+    assert len(cronograma.estacoes) == estacoes
+    fim_do_item = {}
+    for i in range(estacoes):
+        tarefas = cronograma.tarefas_da_estacao(i)
+        # Uma estação faz uma tarefa por vez
+        assert all(a.fim <= b.inicio + 1e-6 for a, b in zip(tarefas, tarefas[1:]))
+        for t in tarefas:
+            fim_do_item[t.item] = max(fim_do_item.get(t.item, 0.0), t.fim)
+    for t in cronograma.tarefas:
+        for material, _ in grafo.arestas[t.item]:
+            if material in fim_do_item:
+                assert fim_do_item[material] <= t.inicio + 1e-6
+    assert cronograma.duracao_total == pytest.approx(max(fim_do_item.values()))
+    assert cronograma.duracao_total >= cronograma.caminho_critico - 1e-6
+
+
+def test_repeticoes_seguidas_viram_uma_execucao(grafo, dados):
+    craft_size = dados["settings"]["craft-size"]
+    necessidades = _necessidades(grafo, 1_000_000)
+    etapas = empacotar_lotes(necessidades, grafo, craft_size)
+    cronograma = agendar_producao(necessidades, grafo, craft_size, 2, etapas=etapas)
+
+    execucoes = [e for estacao in cronograma.estacoes for e in estacao]
+    repeticoes = sum(s.repeticoes for etapa in etapas for s in etapa.solicitacoes)
+    assert sum(e.repeticoes for e in execucoes) == repeticoes
+    assert len(execucoes) < repeticoes
+    # O plano guarda as execuções, não uma tarefa por repetição
+    assert len(json.dumps(cronograma.para_dict())) < 20_000
+
+
+def test_ida_e_volta_do_dict(grafo, dados):
+    cronograma = agendar_producao(_necessidades(grafo, 20_000), grafo, dados["settings"]["craft-size"], 2)
+    copia = Cronograma.de_dict(json.loads(json.dumps(cronograma.para_dict())))
+    assert copia == cronograma
+    assert formatar_linha_do_tempo(copia) == formatar_linha_do_tempo(cronograma)
+
+
+def test_le_planos_salvos_com_uma_tarefa_por_repeticao():
+    antigo = {
+        'estacoes': [[["Prego", 2, 20, 0.0, 10.0], ["Prego", 2, 20, 10.0, 20.0]], []],
+        'duracao_total': 20.0,
+        'caminho_critico': 20.0,
+    }
+    cronograma = Cronograma.de_dict(antigo)
+    assert cronograma.tarefas == [Tarefa("Prego", 2, 20, 0.0, 10.0), Tarefa("Prego", 2, 20, 10.0, 20.0)]
+    assert "Estação 1:" in formatar_linha_do_tempo(cronograma)
+
+
+def test_expandir_repete_as_tarefas_da_solicitacao():
+    execucao = Execucao((Tarefa("A", 1, 1, 0.0, 2.0), Tarefa("B", 1, 1, 2.0, 5.0)), 3, 0.0, 15.0)
+    assert [(t.item, t.inicio, t.fim) for t in expandir(execucao)] == [
+        ("A", 0.0, 2.0), ("B", 2.0, 5.0),
+        ("A", 5.0, 7.0), ("B", 7.0, 10.0),
+        ("A", 10.0, 12.0), ("B", 12.0, 15.0),
+    ]
@@ -0,0 +1,30 @@
+"""Estado de inicialização persistido (startup_state.py)."""
+import json
+
+from startup_state import StartupState
+
+
+def test_estado_sobrevive_ao_restart(tmp_path):
+    caminho = str(tmp_path / "startup_state.json")
+    estado = StartupState(caminho)
+    assert estado.hash_comandos is None and estado.views == []
+    estado.hash_comandos = "abc"
+    assert estado.registrar_views(["EncomendaView"])
+    assert not estado.registrar_views(["EncomendaView"])
+
+    estado = StartupState(caminho)
+    assert (estado.hash_comandos, estado.views) == ("abc", ["EncomendaView"])
+
+
+def test_arquivo_corrompido_e_ignorado(tmp_path):
+    caminho = tmp_path / "startup_state.json"
+    caminho.write_text("{", encoding="utf-8")
+    assert StartupState(str(caminho)).hash_comandos is None
+
+
+def test_id_da_mensagem_de_versoes_antigas_e_descartado(tmp_path):
+    caminho = tmp_path / "startup_state.json"
+    caminho.write_text(json.dumps({"hash_comandos": "abc", "mensagem_encomenda": {"canal": 1, "id": 2}}), encoding="utf-8")
+    estado = StartupState(str(caminho))
+    estado.registrar_views(["EncomendaView"])
+    assert "mensagem_encomenda" not in json.loads(caminho.read_text(encoding="utf-8"))
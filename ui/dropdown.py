@@ -1,14 +1,22 @@
 import discord
+import metrics
 from ui.modals import NewOrder
 
+# Limite de opções de um select do Discord; catálogos maiores usam o comando /encomenda
+MAX_OPCOES = 25
+
 class ProdutoDropdown(discord.ui.Select):
     def __init__(self, bot, button_data, receitas, precos, index, selecionados):
+        produtos = list(receitas.keys())
         options = [
             discord.SelectOption(label=produto, value=produto)
-            for produto in receitas.keys()
+            for produto in produtos[:MAX_OPCOES]
         ]
+        placeholder = f"Escolha o produto #{index+1}..."
+        if len(produtos) > MAX_OPCOES:
+            placeholder += " (catálogo completo em /encomenda)"
         super().__init__(
-            placeholder=f"Escolha o produto #{index+1}...",
+            placeholder=placeholder,
             min_values=1,
             max_values=1,
             options=options,
@@ -27,6 +35,7 @@ class ProdutoDropdown(discord.ui.Select):
 
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True, thinking=False)
+        metrics.incrementar("gepeto_interaction_deferred_total", ramo="select_produto")
         self.view.selecoes[self.index] = self.values[0]
         try:
             await interaction.message.edit(view=self.view)
@@ -34,12 +43,14 @@ class ProdutoDropdown(discord.ui.Select):
             pass
 
 class ProdutoDropdownView(discord.ui.View):
-    def __init__(self, bot, button_data, receitas, precos, selecoes=None):
+    def __init__(self, bot, button_data, snapshot, selecoes=None):
         super().__init__(timeout=300)
         self.bot = bot
         self.button_data = button_data
-        self.receitas = receitas
-        self.precos = precos
+        # A encomenda inteira usa o snapshot de dados vigente quando ela começou
+        self.snapshot = snapshot
+        self.receitas = snapshot.grafo
+        self.precos = snapshot.precos
         self.selecoes = selecoes if selecoes is not None else {}
         if not self.selecoes:
             self.selecoes[0] = None
@@ -60,7 +71,7 @@ class ProdutoDropdownView(discord.ui.View):
         async def callback(self, interaction: discord.Interaction):
             if len(self.parent_view.selecoes) >= 4:
                 await interaction.response.send_message(
-                    "❌ Você atingiu o limite de 4 produtos por encomenda.",
+                    "❌ Você atingiu o limite de 4 produtos por encomenda. Use /encomenda para até 10.",
                     ephemeral=True,
                     delete_after=10
                 )
@@ -94,8 +105,7 @@ class ProdutoDropdownView(discord.ui.View):
             modal = NewOrder(
                 bot=self.parent_view.bot,
                 button_data=self.parent_view.button_data,
-                receitas=self.parent_view.receitas,
-                precos=self.parent_view.precos,
+                snapshot=self.parent_view.snapshot,
                 produtos_selecionados=produtos_selecionados
             )
             await interaction.response.send_modal(modal)
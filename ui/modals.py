@@ -1,15 +1,85 @@
 import discord
+import metrics
 from ui.embeds import ConfirmView
-from cogs.calculator import calcular_custo_minimo, find_price
+from cogs.order_plan import MAX_QUANTIDADE_TOTAL
+from cogs.scheduler import formatar_duracao
+from plan_cache import planejar_com_cache
+from workers import CalculoExcedeuPrazo, responder
 import re
 
+def _campos_do_plano(plano, estacoes):
+    """Campos da prévia que só dependem do plano (guardados com ele no cache de planos)."""
+    campos = []
+    if plano.cronograma and plano.cronograma.duracao_total:
+        campos.append((
+            '⏱️ Tempo Estimado de Produção',
+            f'```{formatar_duracao(plano.cronograma.duracao_total)} ({estacoes} estação(ões))```',
+        ))
+    valor_venda_str = f"$ {plano.valor_venda:.0f}" if plano.valor_venda is not None else "N/A"
+    campos.append(('💰 Custo Mínimo de Fabricação', f'```$ {plano.custo_min:.0f}```'))
+    campos.append(('💵 Valor de Venda Mínimo', f'```{valor_venda_str}```'))
+    if plano.consumo_estoque:
+        usado_str = "\n".join(f"🔹 {item}: {qtd:.0f}" for item, qtd in sorted(plano.consumo_estoque.items()))
+        campos.append(('🏷️ Usado do Estoque', f'```{usado_str[:1000]}```'))
+    return tuple(campos)
+
+async def enviar_previa(interaction, bot, button_data, snapshot, nome, pombo, prazo, produtos_list, ramo):
+    """
+    Calcula o plano, responde com a prévia (Confirmar/Cancelar) e guarda a
+    encomenda pendente. Usada pelo modal `NewOrder` e pelo comando /encomenda.
+    """
+    if sum(p['quantity'] for p in produtos_list) > MAX_QUANTIDADE_TOTAL:
+        await interaction.response.send_message(
+            f"❌ Quantidade total acima do limite de {MAX_QUANTIDADE_TOTAL:,}. Divida a encomenda.".replace(",", "."),
+            ephemeral=True
+        )
+        return
+
+    # O plano completo é calculado uma única vez aqui (ou vem do cache de planos) e guardado com a encomenda pendente
+    try:
+        plano, chave = await planejar_com_cache(interaction, bot, snapshot, produtos_list, ramo)
+    except CalculoExcedeuPrazo as e:
+        await responder(interaction, content=f"❌ {e}", ephemeral=True)
+        return
+
+    embed = discord.Embed(title='Confirmar Nova Encomenda!', color=discord.Colour.random())
+    produtos_str_list = [f"{p['name']}: {p['quantity']}" for p in produtos_list]
+    valor_venda_str = f"$ {plano.valor_venda:.0f}" if plano.valor_venda is not None else "N/A"
+
+    embed.add_field(name='🧑 Nome', value=f'```{nome}```', inline=False)
+    embed.add_field(name='🕊️ Pombo', value=f'```{pombo}```', inline=False)
+    embed.add_field(name='📦 Produtos e Quantidades', value=f'```🔹 {"\n".join(produtos_str_list)}```', inline=False)
+    embed.add_field(name='⏰ Prazo', value=f'```{prazo}```', inline=False)
+    for nome_campo, valor in bot.planos.campos(chave, plano, lambda p: _campos_do_plano(p, snapshot.estacoes)):
+        embed.add_field(name=nome_campo, value=valor, inline=False)
+    embed.add_field(name='👤 Criado por', value=f'{interaction.user.mention}', inline=False)
+
+    if plano.custo_min == 0:
+        embed.set_footer(text="Custo zerado. Verifique se todos os materiais base possuem preço.")
+
+    view = ConfirmView()
+    adiado = interaction.response.is_done()
+    message = await responder(interaction, embed=embed, view=view, ephemeral=True)
+    if not adiado:
+        metrics.registrar_prazo_de_interacao(interaction, ramo)
+    button_data[message.id] = {
+        'name': nome,
+        'pombo': pombo,
+        'produtos': produtos_list,
+        'prazo': prazo,
+        'venda': valor_venda_str,
+        'versao': snapshot.versao,
+        'plano': plano.para_dict()
+    }
+
 class NewOrder(discord.ui.Modal):
-    def __init__(self, bot, button_data, receitas, precos, produtos_selecionados: list):
+    def __init__(self, bot, button_data, snapshot, produtos_selecionados: list):
         super().__init__(title="Nova Encomenda")
         self.bot = bot
         self.button_data = button_data
-        self.receitas = receitas
-        self.precos = precos
+        self.snapshot = snapshot
+        self.receitas = snapshot.grafo
+        self.precos = snapshot.precos
 
         quantidades_default = "\n".join([f"{nome}: 1" for nome in produtos_selecionados])
 
@@ -29,10 +99,11 @@ class NewOrder(discord.ui.Modal):
         self.add_item(self.quantidades)
 
     async def on_submit(self, interaction: discord.Interaction):
+        with metrics.medir("gepeto_interaction_seconds", ramo="novo_pedido"):
+            await self._enviar_previa(interaction)
+
+    async def _enviar_previa(self, interaction: discord.Interaction):
         produtos_list = []
-        total_custo_min = 0
-        total_valor_venda = 0
-        has_valid_sale_price = False
 
         linhas = self.quantidades.value.strip().split('\n')
         for linha in linhas:
@@ -47,41 +118,16 @@ class NewOrder(discord.ui.Modal):
                 continue
 
             produtos_list.append({'name': produto_nome, 'quantity': quantidade})
-            custo_min_item = calcular_custo_minimo(produto_nome, quantidade, self.receitas, self.precos)
-            total_custo_min += custo_min_item
-            preco_venda_unitario, _ = find_price(produto_nome, self.precos)
-            if preco_venda_unitario is not None:
-                total_valor_venda += round(quantidade * preco_venda_unitario, 2)
-                has_valid_sale_price = True
 
         if not produtos_list:
             await interaction.response.send_message("❌ Nenhum produto com quantidade válida foi fornecido.", ephemeral=True)
             return
 
-        embed = discord.Embed(title='Confirmar Nova Encomenda!', color=discord.Colour.random())
-        produtos_str_list = [f"{p['name']}: {p['quantity']}" for p in produtos_list]
-        preco_min_str = f"$ {total_custo_min:.0f}"
-        valor_venda_str = f"$ {total_valor_venda:.0f}" if has_valid_sale_price else "N/A"
-
-        embed.add_field(name='🧑 Nome', value=f'```{self.name.value}```', inline=False)
-        embed.add_field(name='🕊️ Pombo', value=f'```{self.pombo.value}```', inline=False)
-        embed.add_field(name='📦 Produtos e Quantidades', value=f'```🔹 {"\n".join(produtos_str_list)}```', inline=False)
-        embed.add_field(name='⏰ Prazo', value=f'```{self.prazo.value}```', inline=False)
-        embed.add_field(name='💰 Custo Mínimo de Fabricação', value=f'```{preco_min_str}```', inline=False)
-        embed.add_field(name='💵 Valor de Venda Mínimo', value=f'```{valor_venda_str}```', inline=False)
-        embed.add_field(name='👤 Criado por', value=f'{interaction.user.mention}', inline=False)
-
-        if total_custo_min == 0:
-            embed.set_footer(text="Custo zerado. Verifique se todos os materiais base possuem preço.")
-
-        view = ConfirmView()
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
-
-        message = await interaction.original_response()
-        self.button_data[message.id] = {
-            'name': self.name.value,
-            'pombo': self.pombo.value,
-            'produtos': produtos_list,
-            'prazo': self.prazo.value,
-            'venda': valor_venda_str
-        }
+        # Nomes digitados sem acento ou com outra caixa viram o nome canônico do produto
+        for produto in produtos_list:
+            produto['name'] = self.snapshot.produtos.resolver(produto['name']) or produto['name']
+
+        await enviar_previa(
+            interaction, self.bot, self.button_data, self.snapshot,
+            self.name.value, self.pombo.value, self.prazo.value, produtos_list, "novo_pedido"
+        )
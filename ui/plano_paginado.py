@@ -0,0 +1,193 @@
+"""
+Mensagem pública de uma encomenda confirmada, paginada.
+
+A página 1 é o resumo (comprador, prazo, valores, produtos e materiais); as
+seguintes trazem a linha do tempo e o rateio completo, quantos campos
+forem necessários. Só a distribuição dos campos nas páginas é calculada na
+publicação; cada página vira embed apenas quando alguém navega até ela, e o
+resultado fica em cache no `PlanoPaginado`.
+
+Os botões carregam a página de destino no custom_id ("plano_pagina:3") e são
+tratados no on_interaction da cog, a partir do plano salvo no
+`PublishedOrderStore`: a navegação continua funcionando depois de um restart.
+"""
+import math
+from functools import cached_property
+
+import discord
+
+import metrics
+from cogs.order_plan import OrderPlan
+from cogs.rateio import dividir_em_blocos
+from cogs.scheduler import formatar_duracao, formatar_linha_do_tempo
+
+PREFIXO_PAGINA = "plano_pagina:"
+ID_PLANO_COMPLETO = "plano_arquivo"
+
+# Limites do Discord: 25 campos e 6000 caracteres por embed; fica uma folga para título e rodapé
+MAX_CAMPOS_POR_PAGINA = 24
+MAX_CARACTERES_POR_PAGINA = 5000
+# Tamanho máximo do texto de um campo, já descontadas as cercas de código
+MAX_CAMPO = 1018
+
+
+def formatar_valor(valor):
+    return f"$ {valor:.0f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _campos_divididos(titulo, texto):
+    partes = dividir_em_blocos(texto, MAX_CAMPO)
+    return [(titulo if i == 0 else f"{titulo} (cont.)", parte) for i, parte in enumerate(partes)]
+
+
+class PlanoPaginado:
+    """
+    Páginas de uma encomenda publicada. `entrada` é o dicionário salvo no
+    `PublishedOrderStore` (dados do comprador e o plano em `para_dict`).
+    """
+
+    def __init__(self, entrada):
+        self.entrada = entrada
+        self.plano = OrderPlan.de_dict(entrada['plano'])
+        self._renderizadas = {}
+
+    @cached_property
+    def _materiais(self):
+        return "\n".join(f"🔹 {item}: {math.ceil(quant)}" for item, quant in sorted(self.plano.materiais_exibicao.items()))
+
+    @cached_property
+    def _paginas_de_detalhe(self):
+        """Campos (título, texto) das páginas 2 em diante, já distribuídos por página."""
+        campos = []
+        if len(self._materiais) > MAX_CAMPO:
+            campos += _campos_divididos('Materiais Necessários (Total)', self._materiais)
+        cronograma = self.plano.cronograma
+        if cronograma and cronograma.duracao_total:
+            campos += _campos_divididos('⏱️ Linha do Tempo', formatar_linha_do_tempo(cronograma))
+        for titulo, conteudo in self.plano.blocos_rateio:
+            campos += _campos_divididos(titulo, conteudo)
+
+        paginas = []
+        atual, caracteres = [], 0
+        for titulo, texto in campos:
+            tamanho = len(titulo) + len(texto) + 6
+            if atual and (len(atual) >= MAX_CAMPOS_POR_PAGINA or caracteres + tamanho > MAX_CARACTERES_POR_PAGINA):
+                paginas.append(atual)
+                atual, caracteres = [], 0
+            atual.append((titulo, texto))
+            caracteres += tamanho
+        if atual:
+            paginas.append(atual)
+        return paginas
+
+    @property
+    def total(self):
+        return 1 + len(self._paginas_de_detalhe)
+
+    def pagina(self, numero):
+        """Embed da página `numero` (0 = resumo), renderizado uma vez e reaproveitado."""
+        numero = max(0, min(numero, self.total - 1))
+        dados = self._renderizadas.get(numero)
+        if dados is None:
+            metrics.incrementar("gepeto_plan_page_renders_total")
+            embed = self._resumo() if numero == 0 else self._detalhe(numero)
+            if self.total > 1:
+                embed.set_footer(
+                    text=f"{embed.footer.text} • Página {numero + 1}/{self.total}",
+                    icon_url=embed.footer.icon_url,
+                )
+            dados = self._renderizadas[numero] = embed.to_dict()
+        return discord.Embed.from_dict(dados)
+
+    def _rodape(self, embed):
+        embed.set_footer(text=f"Encomenda criada por {self.entrada.get('criado_por')}", icon_url=self.entrada.get('avatar'))
+
+    def _resumo(self):
+        entrada, plano = self.entrada, self.plano
+        custo_materiais_str = formatar_valor(plano.custo_min)
+        if round(plano.custo_max) > round(plano.custo_min):
+            custo_materiais_str += f" - {formatar_valor(plano.custo_max)}"
+        produtos_str = "\n".join(f"🔹 {nome}: {quantidade}" for nome, quantidade in plano.produtos)
+
+        embed = discord.Embed(title='Nova Encomenda Confirmada!', color=discord.Color.green())
+        embed.add_field(name='Nome', value=f"```{entrada.get('name')}```", inline=False)
+        embed.add_field(name='Pombo', value=f"```{entrada.get('pombo')}```", inline=False)
+        embed.add_field(name='Prazo', value=f"```{entrada.get('prazo')}```", inline=False)
+        if plano.cronograma and plano.cronograma.duracao_total:
+            estacoes_usadas = sum(1 for estacao in plano.cronograma.estacoes if estacao)
+            embed.add_field(
+                name='Previsão de Produção',
+                value=f'```{formatar_duracao(plano.cronograma.duracao_total)} em {estacoes_usadas} estação(ões)```',
+                inline=False,
+            )
+        embed.add_field(name='Valor Mínimo de Venda', value=f"```{entrada.get('venda')}```", inline=True)
+        embed.add_field(name='Custo dos Materiais', value=f'```{custo_materiais_str}```', inline=True)
+        embed.add_field(name='\u200B', value='', inline=False)
+        self._rodape(embed)
+
+        embed.add_field(name='Produtos', value=f'```{produtos_str[:MAX_CAMPO]}```', inline=False)
+        if self._materiais and len(self._materiais) <= MAX_CAMPO:
+            embed.add_field(name='Materiais Necessários (Total)', value=f"```{self._materiais}```", inline=False)
+            embed.add_field(name='\u200B', value='', inline=False)
+
+        movimentos_estoque = [f"➖ {item}: {qtd:.0f}" for item, qtd in sorted(plano.consumo_estoque.items())]
+        movimentos_estoque += [f"➕ {item}: {qtd:.0f}" for item, qtd in sorted(plano.sobras.items())]
+        if movimentos_estoque:
+            estoque_str = "\n".join(movimentos_estoque)
+            embed.add_field(name='Estoque (usado / sobras)', value=f"```{estoque_str[:1000]}```", inline=False)
+        return embed
+
+    def _detalhe(self, numero):
+        embed = discord.Embed(title=f"Encomenda de {self.entrada.get('name')} — Detalhes", color=discord.Color.green())
+        for titulo, texto in self._paginas_de_detalhe[numero - 1]:
+            embed.add_field(name=titulo, value=f"```{texto}```", inline=False)
+        self._rodape(embed)
+        return embed
+
+    def texto_completo(self):
+        """Plano inteiro em texto, para o anexo "Plano completo"."""
+        entrada, plano = self.entrada, self.plano
+        linhas = [
+            f"Encomenda de {entrada.get('name')} (pombo {entrada.get('pombo')}) - prazo: {entrada.get('prazo')}",
+            f"Custo dos materiais: {plano.custo_min:.2f} - {plano.custo_max:.2f}",
+            f"Valor mínimo de venda: {entrada.get('venda')}",
+            "",
+            "PRODUTOS",
+        ]
+        linhas += [f"  {nome}: {quantidade}" for nome, quantidade in plano.produtos]
+        linhas += ["", "MATERIAIS NECESSÁRIOS"]
+        linhas += [f"  {item}: {math.ceil(quant)}" for item, quant in sorted(plano.materiais_exibicao.items())]
+        if plano.consumo_estoque or plano.sobras:
+            linhas += ["", "ESTOQUE (usado / sobras)"]
+            linhas += [f"  - {item}: {qtd:.0f}" for item, qtd in sorted(plano.consumo_estoque.items())]
+            linhas += [f"  + {item}: {qtd:.0f}" for item, qtd in sorted(plano.sobras.items())]
+        if plano.cronograma and plano.cronograma.duracao_total:
+            linhas += ["", f"LINHA DO TEMPO ({formatar_duracao(plano.cronograma.duracao_total)})"]
+            linhas.append(formatar_linha_do_tempo(plano.cronograma))
+        for titulo, conteudo in plano.blocos_rateio:
+            linhas += ["", titulo, conteudo]
+        return "\n".join(linhas) + "\n"
+
+
+class PlanoPaginadoView(discord.ui.View):
+    """Navegação da mensagem pública. Os cliques são tratados na cog (on_interaction)."""
+
+    def __init__(self, pagina, total):
+        super().__init__(timeout=None)
+        if total > 1:
+            self.add_item(discord.ui.Button(
+                label="◀", style=discord.ButtonStyle.secondary,
+                custom_id=f"{PREFIXO_PAGINA}{pagina - 1}", disabled=pagina <= 0,
+            ))
+            self.add_item(discord.ui.Button(
+                label=f"{pagina + 1}/{total}", style=discord.ButtonStyle.secondary,
+                custom_id=f"{PREFIXO_PAGINA}indicador", disabled=True,
+            ))
+            self.add_item(discord.ui.Button(
+                label="▶", style=discord.ButtonStyle.secondary,
+                custom_id=f"{PREFIXO_PAGINA}{pagina + 1}", disabled=pagina >= total - 1,
+            ))
+        self.add_item(discord.ui.Button(label="📄 Plano completo", style=discord.ButtonStyle.primary, custom_id=ID_PLANO_COMPLETO))
+
+
+metrics.descrever("gepeto_plan_page_renders_total", "Páginas de encomendas publicadas renderizadas (fora do cache).")
@@ -1,19 +1,168 @@
+"""
+Servidor HTTP do bot, executado no próprio event loop via aiohttp.
+
+Rotas:
+    /         mensagem de boas-vindas
+    /healthz  liveness: o processo e o event loop estão respondendo
+    /readyz   readiness: gateway conectado e snapshot de dados carregado
+    /metrics  métricas no formato texto do Prometheus
+
+Por padrão (`python main.py`, o processo web do procfile) o bot sobe o
+servidor no `setup_hook`. Opcionalmente, para servir sob o gunicorn:
+    gunicorn webserver:gunicorn_app --worker-class aiohttp.GunicornWebWorker --workers 1 --bind 0.0.0.0:$PORT
+O `--workers 1` é obrigatório: cada worker sobe um bot com o mesmo token, e o
+Heroku define WEB_CONCURRENCY (que o gunicorn usa como número de workers).
+Mais de um worker abriria várias sessões no gateway e trataria cada
+encomenda mais de uma vez.
+"""
+import asyncio
+import math
 import os
-from flask import Flask
-from threading import Thread
 
+from aiohttp import web
+
+import metrics
+
+# Atraso do event loop acima do qual o /healthz passa a falhar
+LAG_MAXIMO = float(os.getenv("HEALTH_MAX_LOOP_LAG", "5"))
+
+CHAVE_BOT = web.AppKey("bot", object)
+CHAVE_MONITOR = web.AppKey("monitor", object)
+CHAVE_TAREFA_BOT = web.AppKey("tarefa_bot", asyncio.Task)
+
+
+class MonitorDoLoop:
+    """Mede periodicamente o atraso do event loop (quanto um sleep demora além do pedido)."""
+
+    def __init__(self, intervalo=0.5):
+        self.intervalo = intervalo
+        self.lag = 0.0
+        self._tarefa = None
+
+    def iniciar(self):
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            inicio = loop.time()
+            await asyncio.sleep(self.intervalo)
+            self.lag = max(0.0, loop.time() - inicio - self.intervalo)
+
+    def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+
+
+def _gateway_conectado(bot):
+    return bot.is_ready() and not bot.is_closed() and math.isfinite(bot.latency)
+
+
+def _bot_parou(app):
+    """No gunicorn, se a tarefa do bot terminou (falha no login ou no gateway)."""
+    tarefa = app.get(CHAVE_TAREFA_BOT)
+    return tarefa is not None and tarefa.done()
+
+
+def _estado(app):
+    bot = app[CHAVE_BOT]
+    snapshot = bot.dados.atual
+    return {
+        'bot_parado': _bot_parou(app),
+        'gateway_conectado': _gateway_conectado(bot),
+        'gateway_latencia': bot.latency if _gateway_conectado(bot) else None,
+        'versao_dados': snapshot.versao if snapshot else None,
+        'lag_event_loop': round(app[CHAVE_MONITOR].lag, 4),
+    }
+
+
+async def home(request):
+    return web.Response(text="Welcome to the Web Server!")
+
+
+async def healthz(request):
+    estado = _estado(request.app)
+    vivo = (
+        estado['lag_event_loop'] < LAG_MAXIMO
+        and not estado['bot_parado']
+        and not request.app[CHAVE_BOT].is_closed()
+    )
+    return web.json_response({'status': 'ok' if vivo else 'falha', **estado}, status=200 if vivo else 503)
+
+
+async def readyz(request):
+    estado = _estado(request.app)
+    pronto = estado['gateway_conectado'] and estado['versao_dados'] is not None and not estado['bot_parado']
+    return web.json_response({'status': 'ok' if pronto else 'indisponivel', **estado}, status=200 if pronto else 503)
+
+
+async def metricas(request):
+    return web.Response(text=metrics.renderizar(), headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+
+def criar_app(bot):
+    app = web.Application()
+    app[CHAVE_BOT] = bot
+    app[CHAVE_MONITOR] = monitor = MonitorDoLoop()
+    metrics.registrar_gauge("gepeto_event_loop_lag_seconds", lambda: monitor.lag, "Atraso medido do event loop.")
+
+    async def ao_iniciar(app):
+        monitor.iniciar()
+
+    async def ao_encerrar(app):
+        monitor.parar()
+
+    app.on_startup.append(ao_iniciar)
+    app.on_cleanup.append(ao_encerrar)
+    app.router.add_get('/', home)
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+    app.router.add_get('/metrics', metricas)
+    return app
+
+
+async def iniciar(bot):
+    """Sobe o servidor no event loop atual. Retorna o `AppRunner` para encerrá-lo depois."""
+    runner = web.AppRunner(criar_app(bot), access_log=None)
+    await runner.setup()
+    porta = int(os.getenv("PORT", 5000))
+    await web.TCPSite(runner, host='0.0.0.0', port=porta).start()
+    print(f"[WEB] Servidor HTTP rodando na porta {porta}.")
+    return runner
+
+
+def _ao_terminar_bot(tarefa):
+    if tarefa.cancelled():
+        return
+    erro = tarefa.exception()
+    if erro is not None:
+        print(f"[WEB] O bot parou com erro; /healthz e /readyz passam a falhar: {erro!r}")
+    else:
+        print("[WEB] O bot foi encerrado; /healthz e /readyz passam a falhar.")
+
+
+async def gunicorn_app():
+    """Fábrica para `aiohttp.GunicornWebWorker`: o bot roda no loop do worker."""
+    from dotenv import load_dotenv
+    from main import MyBot
+
+    load_dotenv()
+    token = os.getenv("API_KEY")
+    if not token:
+        raise RuntimeError("Variável de ambiente 'API_KEY' não encontrada.")
 
-app = Flask(__name__)
+    bot = MyBot(servidor_http=False)
+    app = criar_app(bot)
 
-@app.route('/')
-def home():
-    return "Welcome to the Web Server!"
+    async def iniciar_bot(app):
+        tarefa = app[CHAVE_TAREFA_BOT] = asyncio.create_task(bot.start(token))
+        tarefa.add_done_callback(_ao_terminar_bot)
 
-def run_server():
-    PORT = os.getenv("PORT", 5000)
-    app.run(host='0.0.0.0', port=PORT)
+    async def parar_bot(app):
+        await bot.close()
 
-def keep_alive():
-    thread = Thread(target=run_server)
-    thread.start()
-    print("Web server is running in the background...")
\ No newline at end of file
+    app.on_startup.append(iniciar_bot)
+    app.on_cleanup.append(parar_bot)
+    return app
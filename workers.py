@@ -0,0 +1,202 @@
+"""
+Pool de execução dos cálculos pesados de encomendas, fora do event loop.
+
+O modo é configurável por WORKER_MODE: "thread" (padrão) ou "processo". No
+modo de processos o snapshot de dados é serializado com pickle uma única vez
+por versão em um arquivo temporário; cada processo carrega o arquivo na
+primeira tarefa daquela versão e o mantém em cache, então as tarefas só
+transportam a versão e os argumentos.
+
+`executar_com_prazo` responde com defer se o cálculo passar do orçamento de
+latência (a primeira resposta de uma interação tem prazo de 3 segundos) e
+interrompe a espera com `CalculoExcedeuPrazo` se passar do timeout.
+
+O que acontece com o cálculo que estourou o timeout depende do modo. No de
+processos, os processos do pool são encerrados e o pool é recriado; as
+tarefas de outras interações que estavam nele são reenviadas uma vez ao pool
+novo (com o que resta do prazo delas). No de threads nada é cancelado: a
+thread continua calculando até o fim, ocupando uma das vagas do pool, e só o
+resultado é descartado.
+"""
+import asyncio
+import concurrent.futures
+import concurrent.futures.process
+import os
+import pickle
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import discord
+
+import metrics
+
+# Snapshots mantidos em cache em cada processo worker
+SNAPSHOTS_POR_WORKER = 3
+# Arquivos de snapshot mantidos no diretório temporário do pool
+ARQUIVOS_MANTIDOS = 5
+
+
+class CalculoExcedeuPrazo(TimeoutError):
+    """O cálculo não terminou dentro do timeout do pool."""
+
+
+_snapshots_do_worker = OrderedDict()
+
+
+def _chave_do_snapshot(snapshot):
+    # Snapshots de guilds com sobreposições compartilham a versão do catálogo base
+    return snapshot.particao, snapshot.versao
+
+
+def _snapshot_no_worker(chave, caminho):
+    snapshot = _snapshots_do_worker.get(chave)
+    if snapshot is None:
+        with open(caminho, "rb") as file:
+            snapshot = pickle.load(file)
+        _snapshots_do_worker[chave] = snapshot
+        while len(_snapshots_do_worker) > SNAPSHOTS_POR_WORKER:
+            _snapshots_do_worker.popitem(last=False)
+    else:
+        _snapshots_do_worker.move_to_end(chave)
+    return snapshot
+
+
+def _executar_no_worker(chave, caminho, funcao, args):
+    return funcao(_snapshot_no_worker(chave, caminho), *args)
+
+
+class WorkerPool:
+    def __init__(self, modo="thread", max_workers=None, timeout=20.0, orcamento=1.5):
+        if modo not in ("thread", "processo"):
+            raise ValueError(f"WORKER_MODE inválido: '{modo}' (use 'thread' ou 'processo').")
+        self.modo = modo
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        # Tempo máximo de espera antes de responder a interação com defer
+        self.orcamento = orcamento
+        self.timeouts = 0
+        self._diretorio = None
+        self._arquivos = OrderedDict()  # (particao, versao) -> caminho do pickle
+        self._executor = self._criar_executor()
+
+    @classmethod
+    def do_ambiente(cls):
+        """Cria o pool a partir de WORKER_MODE, WORKER_COUNT, WORKER_TIMEOUT e DEFER_BUDGET."""
+        return cls(
+            modo=os.getenv("WORKER_MODE", "thread"),
+            max_workers=int(os.getenv("WORKER_COUNT", "0")) or None,
+            timeout=float(os.getenv("WORKER_TIMEOUT", "20")),
+            orcamento=float(os.getenv("DEFER_BUDGET", "1.5")),
+        )
+
+    def _criar_executor(self):
+        if self.modo == "processo":
+            return concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="calculo")
+
+    def _arquivo_do_snapshot(self, snapshot):
+        chave = _chave_do_snapshot(snapshot)
+        caminho = self._arquivos.get(chave)
+        if caminho is not None:
+            return caminho
+        if self._diretorio is None:
+            self._diretorio = tempfile.mkdtemp(prefix="gepeto-snapshots-")
+        particao, versao = chave
+        caminho = os.path.join(self._diretorio, f"snapshot-{particao or 'base'}-{versao}.pickle")
+        with open(caminho, "wb") as file:
+            pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._arquivos[chave] = caminho
+        while len(self._arquivos) > ARQUIVOS_MANTIDOS:
+            _, antigo = self._arquivos.popitem(last=False)
+            try:
+                os.remove(antigo)
+            except OSError:
+                pass
+        return caminho
+
+    def _enviar(self, executor, snapshot, funcao, args):
+        loop = asyncio.get_running_loop()
+        if self.modo == "processo":
+            caminho = self._arquivo_do_snapshot(snapshot)
+            return loop.run_in_executor(
+                executor, _executar_no_worker, _chave_do_snapshot(snapshot), caminho, funcao, args
+            )
+        return loop.run_in_executor(executor, funcao, snapshot, *args)
+
+    async def executar(self, snapshot, funcao, *args):
+        """
+        Executa `funcao(snapshot, *args)` no pool. `funcao` deve ser uma função
+        de módulo (serializável) e os argumentos, serializáveis com pickle.
+        Levanta `CalculoExcedeuPrazo` se o cálculo passar do timeout ou se o
+        pool quebrar de novo depois de uma nova tentativa.
+        """
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + self.timeout
+        for tentativa in range(2):
+            executor = self._executor
+            futuro = self._enviar(executor, snapshot, funcao, args)
+            try:
+                return await asyncio.wait_for(futuro, max(0.0, limite - loop.time()))
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                metrics.incrementar("gepeto_worker_timeouts_total", funcao=funcao.__name__)
+                self._descartar_tarefas_presas(executor)
+                raise CalculoExcedeuPrazo(
+                    f"O cálculo levou mais de {self.timeout:.0f}s e foi interrompido. Reduza as quantidades ou divida a encomenda."
+                ) from None
+            except concurrent.futures.process.BrokenProcessPool:
+                # O pool foi recriado pelo timeout de outra tarefa (ou um processo morreu): tenta no pool novo
+                metrics.incrementar("gepeto_worker_pool_quebrado_total", funcao=funcao.__name__)
+                print(f"[WORKERS] Pool de processos quebrado durante '{funcao.__name__}' (tentativa {tentativa + 1}).")
+                self._descartar_tarefas_presas(executor)
+        raise CalculoExcedeuPrazo("O pool de cálculo foi reiniciado durante o cálculo. Tente novamente.")
+
+    def _descartar_tarefas_presas(self, executor):
+        """
+        No modo de processos, encerra os processos de `executor` e recria o pool
+        (se ele ainda for o atual). No de threads não faz nada: uma thread não
+        pode ser interrompida, então o cálculo preso segue até terminar.
+        """
+        if self.modo != "processo" or executor is not self._executor:
+            return
+        self._executor = self._criar_executor()
+        for processo in list((getattr(executor, "_processes", None) or {}).values()):
+            processo.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def fechar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._diretorio is not None:
+            shutil.rmtree(self._diretorio, ignore_errors=True)
+
+
+async def executar_com_prazo(interaction, pool, snapshot, funcao, *args, ramo, efemero=True):
+    """
+    Executa o cálculo no pool. Se ele passar de `pool.orcamento` segundos e a
+    interação ainda não tiver resposta, responde com defer para não perder o
+    prazo de 3 segundos do Discord. Quem chama deve usar `responder` em seguida.
+    """
+    tarefa = asyncio.ensure_future(pool.executar(snapshot, funcao, *args))
+    concluidas, _ = await asyncio.wait({tarefa}, timeout=pool.orcamento)
+    if not concluidas and not interaction.response.is_done():
+        if interaction.type == discord.InteractionType.component:
+            # Em botões o defer é de atualização: a mensagem é editada depois
+            await interaction.response.defer()
+        else:
+            await interaction.response.defer(ephemeral=efemero, thinking=True)
+        metrics.incrementar("gepeto_interaction_deferred_total", ramo=ramo)
+        metrics.registrar_prazo_de_interacao(interaction, ramo)
+    return await tarefa
+
+
+async def responder(interaction, **kwargs):
+    """Envia a resposta (ou o follow-up, se já houve defer) e retorna a mensagem enviada."""
+    if interaction.response.is_done():
+        return await interaction.followup.send(wait=True, **kwargs)
+    await interaction.response.send_message(**kwargs)
+    return await interaction.original_response()
+
+
+metrics.descrever("gepeto_worker_timeouts_total", "Cálculos interrompidos por exceder o timeout do pool.")
+metrics.descrever("gepeto_worker_pool_quebrado_total", "Cálculos que encontraram o pool de processos quebrado e foram reenviados.")